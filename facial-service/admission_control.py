@@ -0,0 +1,290 @@
+# Control de admisión adaptativo para Facial-Service
+# Limita la inferencia en curso según la carga real del servicio en lugar de cuotas fijas por IP
+
+import os
+import math
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from deepface.commons.latency_utils import LatencyRegistry, to_prometheus
+
+# Prioridades: menor número, antes se atiende. Las rutas baratas (/health, /user/exists,
+# /metrics) no pasan por el control de admisión: nunca esperan detrás de la inferencia.
+INTERACTIVE = 1
+BATCH = 2
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+
+class Rejected(Exception):
+    """Petición rechazada por carga: responder 503 con Retry-After"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Servicio saturado ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Plaza de inferencia concedida a una petición"""
+
+    __slots__ = ('priority', 'granted_at')
+
+    def __init__(self, priority, granted_at):
+        self.priority = priority
+        self.granted_at = granted_at
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'event', 'granted', 'cancelled')
+
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """Límite de concurrencia adaptativo con cola por prioridad y descarte por SLO.
+
+    - Como mucho `limit` peticiones de inferencia en curso; el resto espera en una cola
+      ordenada por prioridad (interactivas antes que lotes) y, dentro de ella, por llegada.
+      Al liberar una plaza se entrega directamente al siguiente en la cola
+    - Antes de encolar se predice la latencia (espera estimada + tiempo de servicio); si
+      supera `slo_ms` se rechaza de inmediato con Retry-After, sin ocupar memoria esperando
+    - El límite se ajusta con un gradiente de latencia (como Gradient2 de Netflix): mientras la
+      latencia reciente se mantiene cerca de la de referencia sube en ~sqrt(limit); cuando
+      crece por encima de `tolerance` veces la referencia o del SLO, baja proporcionalmente
+    - Si `memory_probe` supera `memory_limit_mb` la inferencia se serializa (se rechaza si ya hay
+      otra en curso) y el límite se reduce a la mitad; la memoria se consulta como mucho cada
+      `memory_check_interval` segundos
+    """
+
+    def __init__(self, enabled=True, slo_ms=3000, initial_limit=4, min_limit=1, max_limit=32,
+                 batch_max_wait_ms=30000, tolerance=1.5, smoothing=0.2,
+                 memory_probe=None, memory_limit_mb=None, memory_check_interval=1.0):
+        self.enabled = enabled
+        self.slo = slo_ms / 1000
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.batch_max_wait = batch_max_wait_ms / 1000
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.memory_probe = memory_probe
+        self.memory_limit_mb = memory_limit_mb
+        self.memory_check_interval = memory_check_interval
+
+        self.in_flight = 0
+        self.admitted = defaultdict(int)
+        self.shed = defaultdict(int)
+        self.queue_wait = LatencyRegistry()
+
+        # tiempo de servicio: media corta (reciente) y larga (referencia sin carga)
+        self.short_rtt = None
+        self.long_rtt = None
+
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._memory_checked_at = 0.0
+        self._memory_mb = None
+        self._memory_critical = False
+
+    @classmethod
+    def from_env(cls, workers, memory_probe=None, memory_limit_mb=None):
+        """Configuración desde FACE_ADMISSION_* (límites por defecto según los workers del pool)"""
+        return cls(
+            enabled=os.getenv('FACE_ADMISSION_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+            slo_ms=float(os.getenv('FACE_ADMISSION_SLO_MS', '3000')),
+            initial_limit=int(os.getenv('FACE_ADMISSION_INITIAL_LIMIT', str(workers * 2))),
+            min_limit=int(os.getenv('FACE_ADMISSION_MIN_LIMIT', '1')),
+            max_limit=int(os.getenv('FACE_ADMISSION_MAX_LIMIT', str(workers * 8))),
+            batch_max_wait_ms=float(os.getenv('FACE_ADMISSION_BATCH_WAIT_MS', '30000')),
+            memory_probe=memory_probe,
+            memory_limit_mb=memory_limit_mb
+        )
+
+    @property
+    def current_limit(self):
+        return max(self.min_limit, int(self.limit))
+
+    def acquire(self, priority=INTERACTIVE):
+        """Obtiene una plaza de inferencia, esperando en la cola si hace falta.
+
+        Retorna un Ticket (None si está deshabilitado) o lanza Rejected.
+        """
+        if not self.enabled:
+            return None
+        arrived = time.perf_counter()
+        self._check_memory(arrived)
+
+        with self._lock:
+            # con memoria crítica la inferencia se serializa: se rechaza sólo si ya hay otra en
+            # curso, para que un proceso cuyo RSS base ya supera el umbral siga atendiendo
+            if self._memory_critical and self.in_flight > 0:
+                self._reject('memory', priority)
+                raise Rejected('memory', retry_after=max(1, math.ceil(self.memory_check_interval)))
+
+            ahead = sum(1 for waiter in self._waiters if not waiter.cancelled and waiter.priority <= priority)
+            if ahead == 0 and self.in_flight < self.current_limit:
+                return self._grant(priority, arrived, arrived)
+
+            # espera estimada: rondas de `limit` peticiones hasta llegar a este turno
+            service = self.short_rtt or 0.0
+            predicted_wait = math.ceil((ahead + 1) / self.current_limit) * service
+            if priority == INTERACTIVE:
+                if predicted_wait + service > self.slo:
+                    self._reject('slo', priority)
+                    raise Rejected('slo', retry_after=max(1, math.ceil(predicted_wait)))
+                max_wait = max(0.0, self.slo - service)
+            else:
+                max_wait = self.batch_max_wait
+
+            waiter = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+
+        waiter.event.wait(max_wait)
+
+        with self._lock:
+            if waiter.granted:
+                self.queue_wait.record(PRIORITY_NAMES[priority], time.perf_counter() - arrived)
+                return Ticket(priority, time.perf_counter())
+            waiter.cancelled = True
+            self._reject('timeout', priority)
+        raise Rejected('timeout', retry_after=max(1, math.ceil(service or max_wait)))
+
+    def release(self, ticket, service_seconds=None):
+        """Libera la plaza y, para peticiones interactivas, ajusta el límite con su latencia"""
+        if ticket is None:
+            return
+        if service_seconds is None:
+            service_seconds = time.perf_counter() - ticket.granted_at
+        with self._lock:
+            # el límite se mide en el momento de terminar, con esta petición aún en curso
+            if ticket.priority == INTERACTIVE:
+                self._update_limit(service_seconds)
+            self.in_flight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE):
+        """`with admission.slot(): ...` ocupa una plaza durante el bloque (lanza Rejected si no hay)"""
+        ticket = self.acquire(priority)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _grant(self, priority, arrived, now):
+        self.in_flight += 1
+        self.admitted[PRIORITY_NAMES[priority]] += 1
+        self.queue_wait.record(PRIORITY_NAMES[priority], now - arrived)
+        return Ticket(priority, now)
+
+    def _reject(self, reason, priority):
+        self.shed[f"{PRIORITY_NAMES[priority]}:{reason}"] += 1
+
+    def _dispatch(self):
+        """Entrega plazas libres a los primeros de la cola (llamar con el lock tomado)"""
+        while self._waiters and self.in_flight < self.current_limit:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self.in_flight += 1
+            self.admitted[PRIORITY_NAMES[waiter.priority]] += 1
+            waiter.event.set()
+
+    def _update_limit(self, rtt):
+        if self.long_rtt is None:
+            self.short_rtt = self.long_rtt = rtt
+            return
+        self.short_rtt = 0.8 * self.short_rtt + 0.2 * rtt
+        self.long_rtt = 0.98 * self.long_rtt + 0.02 * rtt
+        # tras una subida sostenida, la referencia se recupera cuando la latencia vuelve a bajar
+        if self.long_rtt > 2 * self.short_rtt:
+            self.long_rtt *= 0.95
+
+        # con menos de la mitad de las plazas ocupadas la latencia no dice nada del límite
+        if self.in_flight < self.limit / 2:
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        if self.short_rtt > self.slo:
+            # por encima del SLO no se deja margen de cola: el límite baja hasta el mínimo
+            new_limit = self.limit * min(gradient, max(0.5, self.slo / self.short_rtt))
+        else:
+            new_limit = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        self._dispatch()
+
+    def _check_memory(self, now):
+        if self.memory_probe is None or self.memory_limit_mb is None:
+            return
+        if now - self._memory_checked_at < self.memory_check_interval:
+            return
+        self._memory_checked_at = now
+        try:
+            self._memory_mb = self.memory_probe()
+        except Exception:
+            return
+        critical = self._memory_mb > self.memory_limit_mb
+        with self._lock:
+            if critical:
+                self.limit = max(self.min_limit, self.limit / 2)
+            self._memory_critical = critical
+
+    def get_stats(self):
+        with self._lock:
+            stats = {
+                'enabled': self.enabled,
+                'limit': self.current_limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'in_flight': self.in_flight,
+                'waiting': sum(1 for waiter in self._waiters if not waiter.cancelled),
+                'slo_ms': self.slo * 1000,
+                'service_ms': round(self.short_rtt * 1000, 2) if self.short_rtt is not None else None,
+                'baseline_ms': round(self.long_rtt * 1000, 2) if self.long_rtt is not None else None,
+                'memory_mb': round(self._memory_mb, 1) if self._memory_mb is not None else None,
+                'memory_critical': self._memory_critical,
+                'admitted': dict(self.admitted),
+                'shed': dict(self.shed),
+            }
+        stats['queue_wait'] = self.queue_wait.get_stats()
+        return stats
+
+    def to_prometheus(self):
+        """Límite, peticiones en curso/en cola y descartes en formato de exposición de Prometheus"""
+        stats = self.get_stats()
+        lines = [
+            '# HELP facial_admission_limit Current adaptive concurrency limit of inference',
+            '# TYPE facial_admission_limit gauge',
+            f"facial_admission_limit {stats['limit']}",
+            '# HELP facial_admission_in_flight Inference requests holding a slot',
+            '# TYPE facial_admission_in_flight gauge',
+            f"facial_admission_in_flight {stats['in_flight']}",
+            '# HELP facial_admission_waiting Inference requests waiting for a slot',
+            '# TYPE facial_admission_waiting gauge',
+            f"facial_admission_waiting {stats['waiting']}",
+            '# HELP facial_admission_shed_total Requests rejected with 503',
+            '# TYPE facial_admission_shed_total counter',
+        ]
+        for key, count in sorted(stats['shed'].items()):
+            priority, reason = key.split(':', 1)
+            lines.append(f'facial_admission_shed_total{{priority="{priority}",reason="{reason}"}} {count}')
+        return '\n'.join(lines) + '\n' + to_prometheus(
+            self.queue_wait, 'facial_admission_queue_wait_seconds', 'priority',
+            'Time inference requests waited for a slot'
+        )
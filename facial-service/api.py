@@ -5,15 +5,23 @@ Usa DeepFace para verificación y registro facial con:
 - RWLock (múltiples lectores, un escritor)
 - Batch processing para operaciones masivas
 - Connection pooling optimizado
-- Rate limiting inteligente
+- Control de admisión adaptativo (503 + Retry-After) en lugar de cuotas fijas por IP
 - Procesamiento completamente thread-safe
 - OPTIMIZADO PARA MEMORIA LIMITADA (Render 512MB)
 """
-from flask import Flask, request, jsonify, has_request_context
+from flask import Flask, request, jsonify, has_request_context, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from deepface import DeepFace
+from deepface.commons.cache_utils import detection_cache
+from deepface.commons.logger import setup_async_logging, get_async_stats
+from deepface.commons.latency_utils import LatencyRegistry, stage_latency, to_prometheus
+from deepface.commons.model_pool import model_pool
+from deepface.detectors import DetectorWrapper
+from deepface.modules import modeling
+from deepface.models.Embedding import Embedding, json_default
 from functools import lru_cache
 from queue import Queue, Empty, PriorityQueue
 from threading import Thread, Lock, RLock, Semaphore, Condition, Event
@@ -23,8 +31,8 @@ import numpy as np
 import base64
 import os
 import tempfile
-import traceback
 import logging
+import atexit
 import time
 from datetime import datetime, timedelta
 import hashlib
@@ -33,37 +41,63 @@ import redis as redis_client
 from collections import defaultdict
 import uuid
 import gc
+import weakref
+from verification_engine import VerificationEngine
+from request_profiler import RequestProfiler
+from admission_control import AdmissionController, Rejected, INTERACTIVE, BATCH
+from write_behind import WriteBehindQueue
 
 # Importar Memory Optimizer
 try:
-    from memory_optimizer import MemoryOptimizer, ImageOptimizer, OPTIMAL_CONFIG
+    from memory_optimizer import MemoryOptimizer, MemoryGovernor, ImageOptimizer, OPTIMAL_CONFIG
     HAS_MEMORY_OPTIMIZER = True
 except ImportError:
     HAS_MEMORY_OPTIMIZER = False
     logger_temp = logging.getLogger(__name__)
     logger_temp.warning("Memory optimizer not available")
 
-# Configuración de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - [%(threadName)s] - %(name)s - %(levelname)s - %(message)s'
+# Configuración de logging: los hilos de petición sólo encolan registros sin formatear,
+# un único hilo los formatea y escribe (también los de deepface)
+# - LOG_LEVEL: nivel (INFO por defecto)
+# - LOG_FORMAT: text o json (una línea JSON por registro)
+# - LOG_SAMPLE_EVERY: de los registros DEBUG repetidos se escribe 1 de cada N
+# - LOG_QUEUE_SIZE: registros en espera; si se llena se descartan (nunca bloquea)
+log_listener = setup_async_logging(
+    level=logging.getLevelName(os.getenv('LOG_LEVEL', 'INFO').upper()),
+    structured=os.getenv('LOG_FORMAT', 'text').lower() == 'json',
+    sample_every=int(os.getenv('LOG_SAMPLE_EVERY', '10')),
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', '10000'))
 )
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # OPTIMIZACIONES PARA MEMORIA
 if HAS_MEMORY_OPTIMIZER:
     logger.info("🟢 Memory Optimizer activated")
     MemoryOptimizer.log_memory("startup")
-    MemoryOptimizer.monitor_memory_loop(check_interval=30)
+
+class EmbeddingJSONProvider(DefaultJSONProvider):
+    """Serializa objetos Embedding (float32) y valores NumPy como listas JSON"""
+    @staticmethod
+    def default(o):
+        try:
+            return json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
 
 app = Flask(__name__)
+app.json = EmbeddingJSONProvider(app)
 CORS(app)
 
-# Rate limiting - REDUCIDO PARA MEMORIA
+# Rate limiting por IP: sólo como protección anti-abuso opcional (RATE_LIMIT_DEFAULT, p. ej.
+# "1000 per hour;100 per minute"). La carga la regula el control de admisión adaptativo, que
+# no rechaza ráfagas legítimas detrás de un NAT cuando el servicio está ocioso.
+RATE_LIMIT_DEFAULT = [limit.strip() for limit in os.getenv('RATE_LIMIT_DEFAULT', '').split(';') if limit.strip()]
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
-    default_limits=["100 per day", "20 per hour"]  # Reducido
+    default_limits=RATE_LIMIT_DEFAULT
 )
 
 # ============ READER-WRITER LOCK (Para caché concurrente) ============
@@ -144,10 +178,10 @@ class ConcurrentEmbeddingCache:
                     persistent = self.persistent_store.get(hash_key)
                     if persistent:
                         self._record_hit()
-                        logger.debug(f"✓ Cache miss → Redis hit (hash: {hash_key[:8]}...)")
+                        logger.debug("✓ Cache miss → Redis hit (hash: %.8s...)", hash_key)
                         return persistent
                 except Exception as e:
-                    logger.warning(f"Redis get error: {str(e)}")
+                    logger.warning("Redis get error: %s", e)
             self._record_miss()
             return None
         
@@ -158,7 +192,7 @@ class ConcurrentEmbeddingCache:
                 embedding, timestamp = self.cache[hash_key]
                 if datetime.now() - timestamp < timedelta(seconds=self.ttl_seconds):
                     self._record_hit()
-                    logger.debug(f"✓ Cache hit en memoria (hash: {hash_key[:8]}...)")
+                    logger.debug("✓ Cache hit en memoria (hash: %.8s...)", hash_key)
                     return embedding
         finally:
             self.lock.release_read()
@@ -175,10 +209,10 @@ class ConcurrentEmbeddingCache:
                     finally:
                         self.lock.release_write()
                     self._record_hit()
-                    logger.debug(f"✓ Redis hit, restaurado en memoria (hash: {hash_key[:8]}...)")
+                    logger.debug("✓ Redis hit, restaurado en memoria (hash: %.8s...)", hash_key)
                     return persistent
             except Exception as e:
-                logger.warning(f"Redis error: {str(e)}")
+                logger.warning("Redis error: %s", e)
         
         self._record_miss()
         return None
@@ -189,37 +223,56 @@ class ConcurrentEmbeddingCache:
         
         if not self.enabled:
             if self.persistent_store:
-                try:
-                    self.persistent_store.set(hash_key, embedding)
-                except Exception as e:
-                    logger.warning(f"Persistent store set error: {str(e)}")
+                self.persistent_store.set(hash_key, embedding)
             return
         
-        # Escritura exclusiva: solo un escritor a la vez
+        # Escritura exclusiva: solo un escritor a la vez (max_size 0: caché vaciada por presión de memoria)
         self.lock.acquire_write()
         try:
             # Limpiar caché si alcanza tamaño máximo
-            if len(self.cache) >= self.max_size:
+            if self.cache and len(self.cache) >= self.max_size:
                 oldest_key = min(self.cache.keys(), 
                                key=lambda k: self.cache[k][1])
                 del self.cache[oldest_key]
-                logger.debug(f"Removido embedding antiguo, tamaño caché: {len(self.cache)}")
+                logger.debug("Removido embedding antiguo, tamaño caché: %d", len(self.cache))
             
-            self.cache[hash_key] = (embedding, datetime.now())
+            if self.max_size > 0:
+                self.cache[hash_key] = (embedding, datetime.now())
         finally:
             self.lock.release_write()
         
-        # Guardar en persistente de forma asíncrona (no bloquea)
+        # Guardar en persistente: el store encola la escritura (write-behind), no bloquea
         if self.persistent_store:
-            executor.submit(self.persistent_store.set, hash_key, embedding)
+            self.persistent_store.set(hash_key, embedding)
     
+    def resize(self, max_size):
+        """Cambia el tamaño máximo descartando las entradas más antiguas que no quepan"""
+        self.lock.acquire_write()
+        try:
+            self.max_size = max_size
+            excess = len(self.cache) - max(max_size, 0)
+            if excess > 0:
+                for key in sorted(self.cache, key=lambda k: self.cache[k][1])[:excess]:
+                    del self.cache[key]
+        finally:
+            self.lock.release_write()
+
+    def memory_bytes(self):
+        """Bytes aproximados de los embeddings en memoria (vector float32 + entrada del dict)"""
+        self.lock.acquire_read()
+        try:
+            return sum(getattr(getattr(embedding, 'values', None), 'nbytes', 8 * len(embedding)) + 200
+                       for embedding, _ in self.cache.values())
+        finally:
+            self.lock.release_read()
+
     def delete(self, hash_key):
         """Elimina entrada del caché"""
         self.lock.acquire_write()
         try:
             if hash_key in self.cache:
                 del self.cache[hash_key]
-                logger.debug(f"Eliminado del caché: {hash_key[:8]}...")
+                logger.debug("Eliminado del caché: %.8s...", hash_key)
                 return True
             return False
         finally:
@@ -281,7 +334,20 @@ if HAS_MEMORY_OPTIMIZER:
 else:
     optimal_workers = max(4, cpu_count * 2)
 
-executor = ThreadPoolExecutor(
+# Profiler de muestreo opt-in (FACE_PROFILER_ENABLED=1): guarda las pilas de las peticiones
+# que superan FACE_PROFILER_SLOW_MS o de una fracción FACE_PROFILER_SAMPLE_RATE
+request_profiler = RequestProfiler.from_env()
+if request_profiler.enabled:
+    logger.info(f"🔬 Profiler de peticiones activo: slow_ms={request_profiler.slow_ms}, sample_rate={request_profiler.sample_rate}")
+
+
+class ProfiledThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor cuyos workers se muestrean junto con la petición que les delega trabajo"""
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(request_profiler.bind(fn), *args, **kwargs)
+
+
+executor = ProfiledThreadPoolExecutor(
     max_workers=optimal_workers,
     thread_name_prefix='FacialWorker'
 )
@@ -290,36 +356,149 @@ logger.info(f"🚀 ThreadPoolExecutor inicializado con {optimal_workers} workers
 if HAS_MEMORY_OPTIMIZER:
     logger.info(f"   Memory optimization ENABLED - max workers reduced to {optimal_workers}")
 
+# Gobernador de memoria: mide el working set del cgroup (o el RSS) sin psutil ni gc.collect(),
+# despierta con los eventos de memory.events o cada FACE_MEMORY_CHECK_INTERVAL segundos y, bajo
+# presión, encoge las cachés, descarga los modelos de análisis y reduce el tamaño de los lotes
+memory_governor = MemoryGovernor.from_env() if HAS_MEMORY_OPTIMIZER else None
+
+# Control de admisión: limita la inferencia en curso con un límite adaptativo, rechaza con
+# 503 + Retry-After si la latencia prevista supera FACE_ADMISSION_SLO_MS, serializa la
+# inferencia mientras la memoria está en nivel crítico y atiende /verify y /register antes
+# que los lotes
+admission = AdmissionController.from_env(
+    optimal_workers,
+    memory_probe=memory_governor.read_usage_mb if memory_governor else None,
+    memory_limit_mb=memory_governor.critical_mb if memory_governor else None
+)
+logger.info(f"🚦 Control de admisión: enabled={admission.enabled}, limit={admission.current_limit}, slo_ms={admission.slo * 1000:.0f}")
+
 # ============ ESTADÍSTICAS DE PERFORMANCE ============
 class PerformanceStats:
-    """Registra estadísticas de performance de la API"""
+    """Registra estadísticas de performance de la API
+
+    La latencia de cada endpoint va a un histograma (p50/p95/p99/max) por hilo sin lock;
+    sólo los errores, poco frecuentes, se cuentan bajo lock.
+    """
     def __init__(self):
-        self.stats = defaultdict(lambda: {'count': 0, 'total_time': 0, 'errors': 0})
+        self.latency = LatencyRegistry()
+        self.errors = defaultdict(int)
         self.lock = Lock()
     
     def record(self, endpoint, duration, error=False):
         """Registra una operación"""
-        with self.lock:
-            stats = self.stats[endpoint]
-            stats['count'] += 1
-            stats['total_time'] += duration
-            if error:
-                stats['errors'] += 1
+        self.latency.record(endpoint, duration)
+        if error:
+            with self.lock:
+                self.errors[endpoint] += 1
     
     def get_stats(self):
         """Obtiene estadísticas actuales"""
         with self.lock:
-            result = {}
-            for endpoint, data in self.stats.items():
-                result[endpoint] = {
-                    'requests': data['count'],
-                    'avg_time_ms': round((data['total_time'] / data['count'] * 1000), 2) if data['count'] > 0 else 0,
-                    'errors': data['errors']
-                }
-            return result
+            errors = dict(self.errors)
+        result = {}
+        for endpoint, latency in self.latency.get_stats().items():
+            result[endpoint] = {
+                'requests': latency['count'],
+                'avg_time_ms': latency['mean_ms'],
+                'p50_ms': latency['p50_ms'],
+                'p95_ms': latency['p95_ms'],
+                'p99_ms': latency['p99_ms'],
+                'max_ms': latency['max_ms'],
+                'errors': errors.get(endpoint, 0)
+            }
+        return result
+
+    def to_prometheus(self):
+        """Latencias y errores por endpoint en formato de exposición de Prometheus"""
+        with self.lock:
+            errors = dict(self.errors)
+        lines = [
+            '# HELP facial_request_errors_total Requests that raised an exception',
+            '# TYPE facial_request_errors_total counter',
+        ] + [f'facial_request_errors_total{{endpoint="{endpoint}"}} {errors.get(endpoint, 0)}'
+             for endpoint in self.latency.names()]
+        return to_prometheus(
+            self.latency, 'facial_request_latency_seconds', 'endpoint', 'Latency of each endpoint'
+        ) + '\n'.join(lines) + '\n'
 
 perf_stats = PerformanceStats()
 
+# ============ MOTOR DE VERIFICACIÓN ============
+# Detector opencv en modo rápido: escala de grises una sola vez, escaneo reducido a
+# DEEPFACE_OPENCV_SCAN_WIDTH px y búsqueda de ojos sólo en la parte superior de cada cara
+FACE_OPENCV_FAST_MODE = os.getenv('FACE_OPENCV_FAST_MODE', 'true').lower() in ('1', 'true', 'yes')
+DetectorWrapper.configure('opencv', fast_mode=FACE_OPENCV_FAST_MODE)
+
+# Detector o cascada de detectores: "opencv>retinaface" usa opencv y sólo recurre a
+# retinaface cuando opencv no encuentra cara (o no alcanza DEEPFACE_CASCADE_MIN_CONFIDENCE)
+FACE_DETECTOR_BACKEND = os.getenv('FACE_DETECTOR_BACKEND', 'opencv')
+
+# Modelo de reconocimiento de todos los embeddings del servicio (registro, verificación, Redis)
+EMBEDDING_MODEL_NAME = 'Facenet512'
+
+# Umbral pre-ajustado por modelo/métrica; FACE_VERIFY_THRESHOLD sólo lo sobreescribe si se define
+FACE_VERIFY_METRIC = os.getenv('FACE_VERIFY_METRIC', 'cosine')
+_verify_threshold_env = os.getenv('FACE_VERIFY_THRESHOLD')
+verification_engine = VerificationEngine(
+    model_name=EMBEDDING_MODEL_NAME,
+    distance_metric=FACE_VERIFY_METRIC,
+    detector_backend=FACE_DETECTOR_BACKEND,
+    threshold=float(_verify_threshold_env) if _verify_threshold_env else None,
+    executor=executor
+)
+logger.info(f"🔐 Verificación: métrica={FACE_VERIFY_METRIC}, threshold={verification_engine.threshold}, detector={FACE_DETECTOR_BACKEND}")
+
+# ============ LOTES (/register/batch, /verify/batch) ============
+# Imágenes por inferencia del modelo y por pipeline de Redis
+BATCH_SIZE = max(1, int(os.getenv('FACE_BATCH_SIZE', '8')))
+BATCH_MAX_ITEMS = int(os.getenv('FACE_BATCH_MAX_ITEMS', '10000'))
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+
+# ============ POOL DE MODELOS ============
+# Presupuesto (DEEPFACE_MODEL_BUDGET_MB) y descarga por inactividad (DEEPFACE_MODEL_IDLE_SECONDS):
+# los modelos que no caben o llevan tiempo sin usarse se descargan y se reconstruyen al pedirlos
+model_pool.start_reaper()
+logger.info(f"🧩 Pool de modelos: presupuesto={f'{model_pool.budget_bytes // (1024 * 1024)}MB' if model_pool.budget_bytes else 'sin límite'}, inactividad={f'{model_pool.idle_seconds:.0f}s' if model_pool.idle_seconds else 'sin límite'}")
+
+# ============ PRESIÓN DE MEMORIA ============
+# Modelos que carga DeepFace.analyze en /register (tres troncos VGG): bajo presión se descargan
+# los que llevan FACE_ANALYSIS_UNLOAD_IDLE_SECONDS sin usarse; los recientes se mantienen (cada
+# registro los usa todos) y la ráfaga la frena el control de admisión
+ANALYSIS_MODELS = ['Age', 'Gender', 'Race', 'Emotion']
+ANALYSIS_UNLOAD_IDLE_SECONDS = float(os.getenv('FACE_ANALYSIS_UNLOAD_IDLE_SECONDS', '120'))
+CACHE_SIZES = {'embedding': embedding_cache.max_size, 'detection': detection_cache.max_size}
+
+def shrink_caches(level):
+    """Cachés a la mitad en warning, vacías en critical y con su tamaño original en normal"""
+    factor = {MemoryGovernor.NORMAL: 1, MemoryGovernor.WARNING: 0.5, MemoryGovernor.CRITICAL: 0}[level]
+    embedding_cache.resize(int(CACHE_SIZES['embedding'] * factor))
+    detection_cache.resize(int(CACHE_SIZES['detection'] * factor))
+
+def unload_analysis_models(level):
+    """En critical descarga los modelos de análisis inactivos; el de embeddings se mantiene"""
+    if level != MemoryGovernor.CRITICAL:
+        return
+    unloaded = modeling.unload_models(ANALYSIS_MODELS, idle_seconds=ANALYSIS_UNLOAD_IDLE_SECONDS)
+    if unloaded:
+        # los modelos de Keras tienen ciclos de referencias: una colección dirigida, no periódica
+        gc.collect()
+        logger.warning("🧹 Modelos descargados por presión de memoria: %s", ', '.join(unloaded))
+
+def track_image(img):
+    """Cuenta los bytes de una imagen decodificada mientras siga viva"""
+    if memory_governor is not None:
+        memory_governor.add('images', img.nbytes)
+        weakref.finalize(img, memory_governor.add, 'images', -img.nbytes)
+    return img
+
+if memory_governor is not None:
+    memory_governor.on_pressure('caches', shrink_caches)
+    memory_governor.on_pressure('analysis_models', unload_analysis_models)
+    memory_governor.register_reporter('models', model_pool.memory_bytes)
+    memory_governor.register_reporter('embedding_cache', embedding_cache.memory_bytes)
+    memory_governor.start()
+    logger.info(f"🧠 Gobernador de memoria: fuente={memory_governor.source}, warning={memory_governor.warning_mb:.0f}MB, critical={memory_governor.critical_mb:.0f}MB")
+
 
 USE_REDIS = os.getenv('USE_REDIS', 'true').lower() in ('1', 'true', 'yes')
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -327,8 +506,16 @@ API_AUTH_TOKEN = os.getenv('API_AUTH_TOKEN', None)
 
 
 class RedisEmbeddingStore:
-    """Almacena embeddings en Redis como JSON (clave = hash_key)"""
-    def __init__(self, url=REDIS_URL, ttl_seconds=3600):
+    """Almacena embeddings en Redis como JSON (clave = hash_key)
+
+    El vector se guarda como base64 de sus bytes float32 (`embedding_f32`), sin listas de
+    floats de Python; las entradas antiguas con `embedding` (lista JSON) se siguen leyendo.
+
+    `set` y `set_user` no esperan a Redis: encolan la escritura en `writer` (WriteBehindQueue),
+    que la vuelca por lotes en su propio hilo. Las lecturas consultan antes lo pendiente de la
+    cola y los borrados lo cancelan. Si la cola rechaza un `set_user` (llena), se escribe en línea.
+    """
+    def __init__(self, url=REDIS_URL, ttl_seconds=3600, writer=None):
         self.url = url
         self.ttl_seconds = ttl_seconds
         try:
@@ -337,49 +524,89 @@ class RedisEmbeddingStore:
         except Exception as e:
             logger.error(f"No se pudo conectar a Redis en {self.url}: {str(e)}")
             self.client = None
+        self.writer = writer if writer is not None else WriteBehindQueue.from_env(self.write_many)
+        if self.client:
+            self.writer.start()
+
+    def write_many(self, items):
+        """Escribe (clave, payload, ttl) en un pipeline; lanza la excepción si falla (la cola reintenta)"""
+        pipe = self.client.pipeline(transaction=False)
+        for key, payload, ttl in items:
+            pipe.set(key, payload, ex=ttl)
+        with stage_latency.time('redis'):
+            pipe.execute()
+        logger.debug("✓ %d escrituras diferidas volcadas a Redis", len(items))
+
+    def _read(self, key):
+        """Payload de una clave: primero lo pendiente de la cola (leer lo propio), luego Redis"""
+        pending = self.writer.pending(key)
+        if pending is not None:
+            return pending
+        with stage_latency.time('redis'):
+            return self.client.get(key)
+
+    @staticmethod
+    def _dumps(embedding, created_at=None):
+        """Payload JSON de un embedding: base64 float32, modelo y fecha de creación"""
+        embedding = Embedding.from_any(embedding, model_name=EMBEDDING_MODEL_NAME)
+        return json.dumps({
+            'embedding_f32': embedding.to_base64(),
+            'model': embedding.model_name or EMBEDDING_MODEL_NAME,
+            'created_at': created_at or datetime.now().isoformat()
+        })
+
+    @staticmethod
+    def _loads(raw):
+        """Embedding guardado en un payload JSON (formato float32 o lista heredada)"""
+        data = json.loads(raw)
+        model_name = data.get('model', EMBEDDING_MODEL_NAME)
+        if data.get('embedding_f32'):
+            return Embedding.from_base64(data['embedding_f32'], model_name=model_name)
+        if data.get('embedding'):
+            return Embedding(data['embedding'], model_name=model_name)
+        return None
 
     def get(self, hash_key):
         try:
             if not self.client:
                 return None
-            raw = self.client.get(hash_key)
+            raw = self._read(hash_key)
             if not raw:
                 return None
-            data = json.loads(raw)
-            return data.get('embedding')
+            return self._loads(raw)
         except Exception as e:
-            logger.warning(f"Redis get error: {str(e)}")
+            logger.warning("Redis get error: %s", e)
             return None
 
     def set(self, hash_key, embedding):
+        """Encola el embedding de una imagen; prescindible (es caché): con la cola llena se descarta"""
         try:
             if not self.client:
                 raise RuntimeError('Redis client no inicializado')
             caller = request.remote_addr if has_request_context() else 'local'
-            payload = json.dumps({
-                'embedding': embedding,
-                'created_at': datetime.now().isoformat()
-            })
-            # Set with expiration (TTL)
-            self.client.set(hash_key, payload, ex=self.ttl_seconds)
-            logger.info(f"✓ Embedding guardado en Redis (hash: {hash_key[:8]}...) caller={caller}")
+            if self.writer.put(hash_key, self._dumps(embedding), self.ttl_seconds, droppable=True):
+                logger.info("✓ Embedding encolado para Redis (hash: %.8s...) caller=%s", hash_key, caller)
+            else:
+                logger.warning("Cola de escritura llena: embedding no persistido (hash: %.8s...)", hash_key)
         except Exception as e:
-            logger.warning(f"Redis set error: {str(e)}")
+            logger.warning("Redis set error: %s", e)
 
     def delete(self, hash_key):
         """Elimina la entrada indicada por hash_key. Retorna True si existía y fue eliminada."""
         try:
             if not self.client:
                 raise RuntimeError('Redis client no inicializado')
-            removed = self.client.delete(hash_key)
+            cancelled = self.writer.discard(hash_key)
+            with stage_latency.time('redis'):
+                removed = self.client.delete(hash_key) or cancelled
             caller = request.remote_addr if has_request_context() else 'local'
             if removed:
-                logger.info(f"✓ Embedding eliminado de Redis (hash: {hash_key[:8]}...) caller={caller}")
+                logger.info("✓ Embedding eliminado de Redis (hash: %.8s...) caller=%s", hash_key, caller)
             else:
-                logger.info(f"ℹ️ No se encontró embedding en Redis para (hash: {hash_key[:8]}...) caller={caller}")
+                logger.info("ℹ️ No se encontró embedding en Redis para (hash: %.8s...) caller=%s", hash_key, caller)
             return bool(removed)
         except Exception as e:
-            logger.warning(f"Redis delete error: {str(e)}")
+            logger.warning("Redis delete error: %s", e)
             return False
 
     def set_user(self, user_id, embedding):
@@ -388,32 +615,76 @@ class RedisEmbeddingStore:
             if not self.client:
                 raise RuntimeError('Redis client no inicializado')
             key = f"user:{user_id}"
-            payload = json.dumps({
-                'embedding': embedding,
-                'created_at': datetime.now().isoformat()
-            })
-            self.client.set(key, payload, ex=self.ttl_seconds)
+            payload = self._dumps(embedding)
+            caller = request.remote_addr if has_request_context() else 'local'
+            if self.writer.put(key, payload, self.ttl_seconds):
+                logger.info("✓ Embedding encolado para usuario %s en Redis caller=%s", user_id, caller)
+                return
+            # cola llena: un registro no se descarta, se escribe en línea
+            with stage_latency.time('redis'):
+                self.client.set(key, payload, ex=self.ttl_seconds)
+            logger.info("✓ Embedding guardado para usuario %s en Redis caller=%s", user_id, caller)
+        except Exception as e:
+            logger.warning("Redis set_user error: %s", e)
+
+    def set_users_many(self, items, chunk_size=500):
+        """Guarda varios embeddings user:{user_id} con pipelines (un round-trip por bloque).
+
+        `items` es una lista de tuplas (user_id, embedding). Retorna True si todo se escribió.
+        """
+        try:
+            if not self.client:
+                raise RuntimeError('Redis client no inicializado')
+            created_at = datetime.now().isoformat()
+            for start in range(0, len(items), chunk_size):
+                pipe = self.client.pipeline(transaction=False)
+                for user_id, embedding in items[start:start + chunk_size]:
+                    # una escritura diferida anterior no debe pisar la de este lote
+                    self.writer.discard(f"user:{user_id}")
+                    payload = self._dumps(embedding, created_at)
+                    pipe.set(f"user:{user_id}", payload, ex=self.ttl_seconds)
+                with stage_latency.time('redis'):
+                    pipe.execute()
+            caller = request.remote_addr if has_request_context() else 'local'
+            logger.info("✓ %d embeddings de usuario guardados en Redis (pipeline) caller=%s", len(items), caller)
+            return True
+        except Exception as e:
+            logger.warning("Redis set_users_many error: %s", e)
+            return False
+
+    def get_users_many(self, user_ids):
+        """Obtiene los embeddings de varios user_id con un solo MGET (dict user_id -> embedding o None)"""
+        result = {user_id: None for user_id in user_ids}
+        try:
+            if not self.client or not user_ids:
+                return result
+            with stage_latency.time('redis'):
+                raws = self.client.mget([f"user:{user_id}" for user_id in user_ids])
+            for user_id, raw in zip(user_ids, raws):
+                raw = self.writer.pending(f"user:{user_id}") or raw
+                if raw:
+                    result[user_id] = self._loads(raw)
             caller = request.remote_addr if has_request_context() else 'local'
-            logger.info(f"✓ Embedding guardado para usuario {user_id} en Redis caller={caller}")
+            logger.info("ℹ️ Redis get_users_many for %d users caller=%s", len(user_ids), caller)
         except Exception as e:
-            logger.warning(f"Redis set_user error: {str(e)}")
+            logger.warning("Redis get_users_many error: %s", e)
+        return result
 
     def get_user(self, user_id):
         """Obtiene el embedding guardado para un user_id, o None si no existe"""
         try:
             if not self.client:
                 return None
-            key = f"user:{user_id}"
-            raw = self.client.get(key)
+            raw = self._read(f"user:{user_id}")
             if not raw:
                 return None
-            data = json.loads(raw)
+            embedding = self._loads(raw)
             # Log read access for auditing
             caller = request.remote_addr if has_request_context() else 'local'
-            logger.info(f"ℹ️ Redis get_user for user={user_id} caller={caller}")
-            return data.get('embedding')
+            logger.info("ℹ️ Redis get_user for user=%s caller=%s", user_id, caller)
+            return embedding
         except Exception as e:
-            logger.warning(f"Redis get_user error: {str(e)}")
+            logger.warning("Redis get_user error: %s", e)
             return None
 
     def delete_user(self, user_id):
@@ -421,15 +692,17 @@ class RedisEmbeddingStore:
             if not self.client:
                 raise RuntimeError('Redis client no inicializado')
             key = f"user:{user_id}"
-            removed = self.client.delete(key)
+            cancelled = self.writer.discard(key)
+            with stage_latency.time('redis'):
+                removed = self.client.delete(key) or cancelled
             caller = request.remote_addr if has_request_context() else 'local'
             if removed:
-                logger.info(f"✓ Embedding de usuario {user_id} eliminado de Redis caller={caller}")
+                logger.info("✓ Embedding de usuario %s eliminado de Redis caller=%s", user_id, caller)
             else:
-                logger.info(f"ℹ️ No se encontró embedding de usuario {user_id} en Redis caller={caller}")
+                logger.info("ℹ️ No se encontró embedding de usuario %s en Redis caller=%s", user_id, caller)
             return bool(removed)
         except Exception as e:
-            logger.warning(f"Redis delete_user error: {str(e)}")
+            logger.warning("Redis delete_user error: %s", e)
             return False
 
 
@@ -441,6 +714,8 @@ if USE_REDIS:
         redis_store = RedisEmbeddingStore(url=REDIS_URL, ttl_seconds=3600)
         if redis_store.client:
             embedding_cache.persistent_store = redis_store
+            # al apagar, lo encolado se vuelca antes de salir
+            atexit.register(redis_store.writer.close)
             logger.info(f"Redis inicializado y store inyectado desde {REDIS_URL}")
         else:
             logger.error(f"Redis no disponible en {REDIS_URL}")
@@ -460,23 +735,141 @@ def base64_to_image(base64_string):
     Devuelve una imagen compatible con DeepFace (numpy array). No crea archivos.
     """
     try:
-        # Remover el prefijo data:image si existe
-        if ',' in base64_string:
-            base64_string = base64_string.split(',')[1]
+        with stage_latency.time('decode'):
+            # Remover el prefijo data:image si existe
+            if ',' in base64_string:
+                base64_string = base64_string.split(',')[1]
 
-        # Decodificar Base64 a bytes
-        image_data = base64.b64decode(base64_string)
+            # Decodificar Base64 a bytes
+            image_data = base64.b64decode(base64_string)
 
-        # Convertir bytes a numpy array y decodificar con opencv
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Convertir bytes a numpy array y decodificar con opencv
+            nparr = np.frombuffer(image_data, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         if img is None:
             raise Exception('cv2.imdecode devolvió None')
 
-        return img
+        return track_image(img)
     except Exception as e:
         raise Exception(f"Error decodificando imagen Base64: {str(e)}")
 
+def bytes_to_image(image_bytes):
+    """Decodifica los bytes de una imagen (p.ej. parte multipart) a un array numpy (BGR)"""
+    with stage_latency.time('decode'):
+        img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise Exception('cv2.imdecode devolvió None')
+    return track_image(img)
+
+def load_batch_image(image):
+    """Carga la imagen de un item de lote: Base64 (JSON/NDJSON) o bytes (multipart)"""
+    if isinstance(image, (bytes, bytearray)):
+        return bytes_to_image(image)
+    return base64_to_image(image)
+
+def iter_batch_items():
+    """Itera los items de un lote sin cargar todo el cuerpo de la petición en memoria.
+
+    Formatos aceptados:
+    - NDJSON: un objeto {"user_id": "...", "image": "<base64>"} por línea
+    - multipart/form-data: campos `user_id` y archivos `image` en el mismo orden
+    - JSON: {"items": [{"user_id": "...", "image": "<base64>"}, ...]}
+    Cada item lleva su `index`; los inválidos llevan además `error`.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        index = 0
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError('item no es un objeto JSON')
+                yield {'index': index, 'user_id': item.get('user_id'), 'image': item.get('image')}
+            except ValueError:
+                yield {'index': index, 'error': 'Línea NDJSON inválida'}
+            index += 1
+    elif request.mimetype == 'multipart/form-data':
+        user_ids = request.form.getlist('user_id')
+        for index, image_file in enumerate(request.files.getlist('image')):
+            yield {
+                'index': index,
+                'user_id': user_ids[index] if index < len(user_ids) else None,
+                'image': image_file.read()
+            }
+    else:
+        data = request.get_json(silent=True) or {}
+        for index, item in enumerate(data.get('items') or []):
+            if not isinstance(item, dict):
+                yield {'index': index, 'error': 'Item inválido'}
+                continue
+            yield {'index': index, 'user_id': item.get('user_id'), 'image': item.get('image')}
+
+def stream_batch(process_batch):
+    """Procesa los items del lote en bloques de BATCH_SIZE y emite una línea NDJSON por item
+    a medida que cada bloque termina, más una línea final con el resumen.
+
+    Bajo presión de memoria los bloques se reducen (la mitad en warning, 1 imagen en critical)."""
+    def generate():
+        start_time = time.time()
+        summary = {'total': 0, 'succeeded': 0, 'failed': 0}
+        batch = []
+
+        def flush():
+            # cada bloque ocupa una plaza de inferencia con prioridad baja: las peticiones
+            # interactivas que llegan mientras tanto pasan antes que el siguiente bloque
+            try:
+                with admission.slot(BATCH):
+                    results = process_batch(batch)
+            except Rejected as e:
+                results = [{'index': item['index'], 'user_id': item.get('user_id'), 'success': False,
+                            'error': 'Servicio saturado, reintenta más tarde', 'retry_after': e.retry_after}
+                           for item in batch]
+            for result in results:
+                summary['total'] += 1
+                summary['succeeded' if result.get('success') else 'failed'] += 1
+                yield json.dumps(result) + '\n'
+            batch.clear()
+
+        try:
+            for item in iter_batch_items():
+                if item['index'] >= BATCH_MAX_ITEMS:
+                    yield json.dumps({'success': False, 'error': f'Máximo {BATCH_MAX_ITEMS} items por lote'}) + '\n'
+                    break
+                if 'error' not in item and not item.get('image'):
+                    item['error'] = 'Se requiere una imagen'
+                elif 'error' not in item and not item.get('user_id'):
+                    item['error'] = 'Se requiere `user_id`'
+                batch.append(item)
+                if len(batch) >= (memory_governor.batch_size(BATCH_SIZE) if memory_governor else BATCH_SIZE):
+                    yield from flush()
+            yield from flush()
+        except Exception as e:
+            logger.exception("Error procesando lote: %s", e)
+            yield json.dumps({'success': False, 'error': 'Error procesando lote'}) + '\n'
+
+        summary['processing_time_ms'] = round((time.time() - start_time) * 1000)
+        logger.info("📦 Lote completado: %s", summary)
+        yield json.dumps({'summary': summary}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def batch_embeddings(items):
+    """Embeddings de los items válidos de un bloque (dict index -> embedding o resultado de error)"""
+    embeddings = verification_engine.represent_many([item['image'] for item in items], loader=load_batch_image)
+    resolved = {}
+    for item, embedding in zip(items, embeddings):
+        if isinstance(embedding, ValueError):
+            resolved[item['index']] = {'success': False, 'face_detected': False,
+                                       'error': 'No se detectó una cara en la imagen.'}
+        elif isinstance(embedding, Exception) or not embedding:
+            logger.warning("Error generando embedding del item %s: %s", item['index'], embedding)
+            resolved[item['index']] = {'success': False, 'error': 'Error al procesar imagen'}
+        else:
+            resolved[item['index']] = embedding
+    return resolved
+
 def cleanup_temp_files(*file_paths):
     """Funciona como no-op: ya no usamos archivos temporales en disco."""
     return
@@ -494,23 +887,58 @@ def require_write_auth():
     token = auth.split(' ', 1)[1]
     return token == API_AUTH_TOKEN
 
+def require_admin_auth():
+    """Como `require_write_auth`, pero exige que `API_AUTH_TOKEN` esté configurado:
+    sin token los endpoints de diagnóstico quedan cerrados.
+    """
+    return bool(API_AUTH_TOKEN) and require_write_auth()
+
+# ============ CONTROL DE ADMISIÓN ============
+def admission_gate(priority=INTERACTIVE):
+    """Decorador: la petición ocupa una plaza de inferencia o recibe 503 con Retry-After"""
+    def decorator(f):
+        def wrapper(*args, **kwargs):
+            try:
+                ticket = admission.acquire(priority)
+            except Rejected as e:
+                logger.debug("🚦 %s rechazada (%s), Retry-After=%ss", request.path, e.reason, e.retry_after)
+                response = jsonify({
+                    'success': False,
+                    'error': 'Servicio saturado, reintenta más tarde',
+                    'reason': e.reason,
+                    'retry_after': e.retry_after
+                })
+                response.status_code = 503
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+            try:
+                return f(*args, **kwargs)
+            finally:
+                admission.release(ticket)
+        wrapper.__name__ = f.__name__
+        return wrapper
+    return decorator
+
 # ============ DECORADORES DE PROFILING ============
 def profile_endpoint(endpoint_name):
     """Decorador para profiling automático de endpoints"""
     def decorator(f):
         def wrapper(*args, **kwargs):
             start_time = time.time()
+            profile = request_profiler.start(endpoint_name)
             try:
                 result = f(*args, **kwargs)
                 duration = time.time() - start_time
                 perf_stats.record(endpoint_name, duration, error=False)
-                logger.debug(f"✓ {endpoint_name} completado en {duration*1000:.2f}ms")
+                logger.debug("✓ %s completado en %.2fms", endpoint_name, duration * 1000)
                 return result
             except Exception as e:
                 duration = time.time() - start_time
                 perf_stats.record(endpoint_name, duration, error=True)
-                logger.error(f"✗ {endpoint_name} error en {duration*1000:.2f}ms: {str(e)}")
+                logger.error("✗ %s error en %.2fms: %s", endpoint_name, duration * 1000, e)
                 raise
+            finally:
+                request_profiler.stop(profile, time.time() - start_time)
         wrapper.__name__ = f.__name__
         return wrapper
     return decorator
@@ -527,7 +955,9 @@ def health():
         'concurrency': {
             'thread_pool_workers': optimal_workers,
             'thread_pool_active': sum(1 for t in executor._threads if t.is_alive()),
-            'queue_size': executor._work_queue.qsize() if hasattr(executor, '_work_queue') else 'N/A'
+            'queue_size': executor._work_queue.qsize() if hasattr(executor, '_work_queue') else 'N/A',
+            'admission_limit': admission.current_limit,
+            'inference_in_flight': admission.in_flight
         },
         'timestamp': datetime.now().isoformat()
     }), 200
@@ -550,15 +980,91 @@ def metrics():
             'read_write_lock': 'Enabled (multiple readers, single writer)'
         },
         'performance': perf,
+        'admission': admission.get_stats(),
+        'memory': memory_governor.get_stats() if memory_governor else None,
+        'stages': stage_latency.get_stats(),
+        'logging': get_async_stats(),
+        'profiler': {key: value for key, value in request_profiler.get_stats().items() if key != 'profiles'},
+        'detection_cache': detection_cache.get_stats(),
+        'models': model_pool.get_stats(),
+        'detector': {
+            'backend': FACE_DETECTOR_BACKEND,
+            'cascade': DetectorWrapper.get_cascade_stats()
+        },
         'redis': {
             'enabled': USE_REDIS,
-            'available': embedding_cache.persistent_store.client is not None if embedding_cache.persistent_store else False
+            'available': embedding_cache.persistent_store.client is not None if embedding_cache.persistent_store else False,
+            'write_behind': redis_store.writer.get_stats() if redis_store else None
         },
         'timestamp': datetime.now().isoformat()
     }), 200
 
+@app.route('/metrics/prometheus', methods=['GET'])
+@limiter.exempt
+def metrics_prometheus():
+    """Métricas en formato de exposición de Prometheus (text/plain 0.0.4) para scraping.
+
+    - facial_stage_latency_seconds: decode, detection, alignment, embedding, redis, distance
+    - facial_request_latency_seconds / facial_request_errors_total: por endpoint
+    - facial_cache_*_total: aciertos y fallos de la caché de embeddings y de detecciones
+    - facial_admission_*: límite adaptativo, peticiones en curso/en cola, descartes y espera
+    - facial_memory_*: uso, nivel de presión y memoria por subsistema
+    - facial_model_*: memoria de cada modelo cargado, cargas y descargas del pool de modelos
+    - facial_write_behind_*: escrituras a Redis en cola, volcadas y descartadas, y latencia de volcado
+    """
+    cache_stats = (('embedding', embedding_cache.get_stats()), ('detection', detection_cache.get_stats()))
+    cache_lines = []
+    for counter in ('hits', 'misses'):
+        cache_lines.append(f'# HELP facial_cache_{counter}_total Cache {counter}')
+        cache_lines.append(f'# TYPE facial_cache_{counter}_total counter')
+        for cache, stats in cache_stats:
+            cache_lines.append(f'facial_cache_{counter}_total{{cache="{cache}"}} {stats.get(counter, 0)}')
+
+    pool_stats = model_pool.get_stats()
+    model_lines = [
+        '# HELP facial_model_memory_bytes Estimated memory of each loaded model',
+        '# TYPE facial_model_memory_bytes gauge',
+    ]
+    for model, stats in sorted(pool_stats['models'].items()):
+        model_lines.append(f'facial_model_memory_bytes{{model="{model}"}} {stats["bytes"]}')
+    for counter in ('loads', 'evictions', 'unloads'):
+        model_lines.append(f'# HELP facial_model_{counter}_total Model pool {counter}')
+        model_lines.append(f'# TYPE facial_model_{counter}_total counter')
+        model_lines.append(f'facial_model_{counter}_total {pool_stats[counter]}')
+
+    body = (
+        to_prometheus(stage_latency, 'facial_stage_latency_seconds', 'stage',
+                      'Latency of each pipeline stage, per image')
+        + perf_stats.to_prometheus()
+        + admission.to_prometheus()
+        + (memory_governor.to_prometheus() if memory_governor else '')
+        + (redis_store.writer.to_prometheus() if redis_store else '')
+        + '\n'.join(cache_lines) + '\n'
+        + '\n'.join(model_lines) + '\n'
+    )
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/debug/profiles', methods=['GET'])
+@limiter.exempt
+def debug_profiles():
+    """Perfiles de muestreo de peticiones lentas (requiere Authorization: Bearer API_AUTH_TOKEN)
+
+    - Por defecto: pilas colapsadas en texto (`pila muestras` por línea), listas para
+      flamegraph.pl o speedscope. Filtros opcionales `endpoint` e `id`
+    - `format=json`: configuración del profiler y resumen de los perfiles guardados
+    """
+    if not require_admin_auth():
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+    if request.args.get('format') == 'json':
+        return jsonify({'success': True, 'profiler': request_profiler.get_stats()}), 200
+    collapsed = request_profiler.collapsed(
+        endpoint=request.args.get('endpoint'),
+        profile_id=request.args.get('id')
+    )
+    return Response(collapsed, content_type='text/plain; charset=utf-8')
+
 @app.route('/register', methods=['POST'])
-@limiter.limit("10 per minute")
+@admission_gate()
 @profile_endpoint('register')
 def register():
     """
@@ -584,17 +1090,17 @@ def register():
         image_base64 = data['image']
         user_id = data.get('user_id', 'unknown')
         
-        logger.info(f"📸 Registro iniciado para usuario: {user_id}")
-        logger.info(f"   DEBUG: user_id type={type(user_id)}, len={len(user_id) if isinstance(user_id, str) else 'N/A'}")
-        logger.info(f"   DEBUG: persistent_store exists={embedding_cache.persistent_store is not None}")
+        logger.info("📸 Registro iniciado para usuario: %s", user_id)
+        logger.debug("user_id type=%s, len=%s", type(user_id), len(user_id) if isinstance(user_id, str) else 'N/A')
+        logger.debug("persistent_store exists=%s", embedding_cache.persistent_store is not None)
         if embedding_cache.persistent_store:
-            logger.info(f"   DEBUG: persistent_store type={type(embedding_cache.persistent_store).__name__}")
-            logger.info(f"   DEBUG: has set_user method={hasattr(embedding_cache.persistent_store, 'set_user')}")
+            logger.debug("persistent_store type=%s", type(embedding_cache.persistent_store).__name__)
+            logger.debug("has set_user method=%s", hasattr(embedding_cache.persistent_store, 'set_user'))
         
         # PASO 1: Verificar caché
         cached_embedding = embedding_cache.get(image_base64)
         if cached_embedding:
-            logger.info(f"   DEBUG: Embedding encontrado en caché")
+            logger.debug("Embedding encontrado en caché")
             return jsonify({
                 'success': True,
                 'message': 'Cara registrada exitosamente (desde caché)',
@@ -608,7 +1114,7 @@ def register():
         try:
             image_array = base64_to_image(image_base64)
         except Exception as e:
-            logger.error(f"Error al convertir imagen: {str(e)}")
+            logger.error("Error al convertir imagen: %s", e)
             return jsonify({
                 'success': False,
                 'error': 'Error al procesar imagen Base64'
@@ -619,13 +1125,14 @@ def register():
             result = DeepFace.analyze(
                 img_path=image_array,
                 actions=['age', 'gender', 'race', 'emotion'],
+                detector_backend=FACE_DETECTOR_BACKEND,
                 enforce_detection=True
             )
-            logger.info(f"✓ Cara detectada para {user_id}")
+            logger.info("✓ Cara detectada para %s", user_id)
             
         except ValueError:
             # no temp files to cleanup
-            logger.warning(f"No se detectó cara para {user_id}")
+            logger.warning("No se detectó cara para %s", user_id)
             return jsonify({
                 'success': False,
                 'error': 'No se detectó una cara en la imagen.',
@@ -636,29 +1143,30 @@ def register():
         try:
             embedding = DeepFace.represent(
                 img_path=image_array,
-                model_name='Facenet512',
+                model_name=EMBEDDING_MODEL_NAME,
+                detector_backend=FACE_DETECTOR_BACKEND,
                 enforce_detection=True
             )
             
             embedding_data = embedding[0]['embedding'] if embedding else None
-            logger.info(f"   DEBUG: Embedding generado, dimensiones={len(embedding_data) if embedding_data else 0}")
+            logger.debug("Embedding generado, dimensiones=%d", len(embedding_data) if embedding_data else 0)
 
             # PASO 5: Cachear embedding
             embedding_cache.set(image_base64, embedding_data)
-            logger.info(f"✓ Embedding generado y cacheado para {user_id}")
+            logger.info("✓ Embedding generado y cacheado para %s", user_id)
 
             # Si viene user_id, guardar también el embedding bajo user:{user_id} en el store persistente
             try:
-                logger.info(f"   DEBUG: Intentando guardar por user_id...")
-                logger.info(f"   DEBUG: user_id={user_id}, persistent_store={embedding_cache.persistent_store is not None}")
+                logger.debug("Intentando guardar por user_id...")
+                logger.debug("user_id=%s, persistent_store=%s", user_id, embedding_cache.persistent_store is not None)
                 if user_id and user_id != 'unknown' and embedding_cache.persistent_store and hasattr(embedding_cache.persistent_store, 'set_user'):
-                    logger.info(f"   DEBUG: Llamando set_user({user_id}, embedding_data)")
+                    logger.debug("Llamando set_user(%s, embedding_data)", user_id)
                     embedding_cache.persistent_store.set_user(user_id, embedding_data)
-                    logger.info(f"   DEBUG: set_user completado sin excepción")
+                    logger.debug("set_user completado sin excepción")
                 else:
-                    logger.warning(f"   DEBUG: No se pudo guardar - user_id={user_id}, has_store={embedding_cache.persistent_store is not None}, has_method={hasattr(embedding_cache.persistent_store, 'set_user') if embedding_cache.persistent_store else False}")
+                    logger.warning("No se pudo guardar por user_id - user_id=%s, has_store=%s, has_method=%s", user_id, embedding_cache.persistent_store is not None, hasattr(embedding_cache.persistent_store, 'set_user') if embedding_cache.persistent_store else False)
             except Exception as e:
-                logger.error(f"❌ Error en set_user: {str(e)}\n{traceback.format_exc()}")
+                logger.exception("❌ Error en set_user: %s", e)
             
             # no temp files to cleanup
             
@@ -672,21 +1180,21 @@ def register():
             }), 200
             
         except Exception as e:
-            logger.error(f"Error generando embedding: {str(e)}")
+            logger.error("Error generando embedding: %s", e)
             return jsonify({
                 'success': False,
                 'error': 'Error al generar embeddings'
             }), 500
             
     except Exception as e:
-        logger.error(f"Error en /register: {str(e)}\n{traceback.format_exc()}")
+        logger.exception("Error en /register: %s", e)
         return jsonify({
             'success': False,
             'error': f'Error procesando registro facial'
         }), 500
 
 @app.route('/verify', methods=['POST'])
-@limiter.limit("10 per minute")
+@admission_gate()
 @profile_endpoint('verify')
 def verify():
     """
@@ -717,7 +1225,7 @@ def verify():
         img2_base64 = data['img2']
         user_id = data.get('user_id', 'unknown')
 
-        logger.info(f"🔍 Verificación (persistente) iniciada para usuario: {user_id}")
+        logger.info("🔍 Verificación (persistente) iniciada para usuario: %s", user_id)
 
         def get_or_persist_embedding(image_base64):
             try:
@@ -726,12 +1234,11 @@ def verify():
                     logger.info("✓ Embedding obtenido desde persistente para verificación")
                     return emb
             except Exception as e:
-                logger.warning(f"Error accediendo a embedding en persistent store: {e}")
+                logger.warning("Error accediendo a embedding en persistent store: %s", e)
 
             try:
                 img_array_local = base64_to_image(image_base64)
-                rep = DeepFace.represent(img_path=img_array_local, model_name='Facenet512', enforce_detection=True)
-                new_embedding = rep[0]['embedding'] if rep else None
+                new_embedding = verification_engine.represent(img_array_local)
                 if new_embedding:
                     embedding_cache.set(image_base64, new_embedding)
                     logger.info("✓ Embedding calculado y persistido para verificación")
@@ -739,13 +1246,13 @@ def verify():
             except ValueError:
                 raise
             except Exception as e:
-                logger.error(f"Error generando embedding para verificación: {e}")
+                logger.error("Error generando embedding para verificación: %s", e)
                 return None
 
-        emb1 = get_or_persist_embedding(img1_base64)
-        emb2 = get_or_persist_embedding(img2_base64)
+        # Ambas imágenes se procesan concurrentemente en el pool de workers
+        result = verification_engine.verify(img1_base64, img2_base64, resolver=get_or_persist_embedding)
 
-        if not emb1 or not emb2:
+        if result is None:
             return jsonify({
                 'success': False,
                 'verified': False,
@@ -753,31 +1260,15 @@ def verify():
                 'face_detected': False
             }), 400
 
-        def cosine_distance(a, b):
-            try:
-                import math
-                dot = sum(x * y for x, y in zip(a, b))
-                na = math.sqrt(sum(x * x for x in a))
-                nb = math.sqrt(sum(y * y for y in b))
-                if na == 0 or nb == 0:
-                    return 1.0
-                return 1.0 - (dot / (na * nb))
-            except Exception:
-                return 1.0
-
-        distance = cosine_distance(emb1, emb2)
-        threshold = float(os.getenv('FACE_VERIFY_THRESHOLD', '0.4'))
-        verified = distance <= threshold
+        verified = result['verified']
+        distance = result['distance']
 
         log_status = "✓ VERIFICADO" if verified else "✗ NO VERIFICADO"
-        logger.info(f"{log_status} para {user_id} (distancia: {distance:.4f}) [via Redis]")
+        logger.info("%s para %s (distancia: %.4f) [via Redis]", log_status, user_id, distance)
 
         return jsonify({
             'success': True,
-            'verified': verified,
-            'distance': float(distance),
-            'threshold': float(threshold),
-            'confidence': float(1 - min(distance / threshold, 1.0)) if verified else 0.0,
+            **result,
             'processing_time_ms': round((time.time() - start_time) * 1000)
         }), 200
     except ValueError:
@@ -789,7 +1280,7 @@ def verify():
             'face_detected': False
         }), 400
     except Exception as e:
-        logger.error(f"Error en /verify: {str(e)}\n{traceback.format_exc()}")
+        logger.exception("Error en /verify: %s", e)
         return jsonify({
             'success': False,
             'verified': False,
@@ -798,7 +1289,7 @@ def verify():
 
 
 @app.route('/verify/user', methods=['POST'])
-@limiter.limit("10 per minute")
+@admission_gate()
 @profile_endpoint('verify_user')
 def verify_user():
     """Verifica si la imagen corresponde al usuario registrado (máxima concurrencia)
@@ -814,69 +1305,139 @@ def verify_user():
         return jsonify({'success': False, 'verified': False, 'error': 'Se requieren `image` y `user_id`.'}), 400
 
     try:
-        logger.info(f"🔍 Verificación por usuario iniciada")
-        logger.info(f"   DEBUG: user_id={user_id}, user_id type={type(user_id)}")
-        logger.info(f"   DEBUG: persistent_store exists={embedding_cache.persistent_store is not None}")
+        logger.info("🔍 Verificación por usuario iniciada")
+        logger.debug("user_id=%s, user_id type=%s", user_id, type(user_id))
+        logger.debug("persistent_store exists=%s", embedding_cache.persistent_store is not None)
 
         # Obtener embedding guardado para el usuario
         stored = None
         if embedding_cache.persistent_store and hasattr(embedding_cache.persistent_store, 'get_user'):
             try:
-                logger.info(f"   DEBUG: Llamando get_user({user_id})")
+                logger.debug("Llamando get_user(%s)", user_id)
                 stored = embedding_cache.persistent_store.get_user(user_id)
-                logger.info(f"   DEBUG: get_user retornó: stored={stored is not None}")
+                logger.debug("get_user retornó: stored=%s", stored is not None)
                 if stored is None:
-                    logger.warning(f"   DEBUG: ❌ get_user retornó None para user_id={user_id}")
+                    logger.debug("❌ get_user retornó None para user_id=%s", user_id)
             except Exception as e:
-                logger.error(f"   DEBUG: ❌ Error en get_user: {str(e)}\n{traceback.format_exc()}")
+                logger.exception("❌ Error en get_user: %s", e)
 
         if not stored:
-            logger.warning(f"❌ Usuario {user_id} no tiene registro facial en Redis")
+            logger.warning("❌ Usuario %s no tiene registro facial en Redis", user_id)
             return jsonify({'success': True, 'verified': False, 'error': 'Usuario no registrado'}), 200
 
         # Generar embedding de la imagen enviada (en memoria)
         try:
             img_array = base64_to_image(image_base64)
-            emb = DeepFace.represent(img_path=img_array, model_name='Facenet512', enforce_detection=True)
-            new_embedding = emb[0]['embedding'] if emb else None
+            new_embedding = verification_engine.represent(img_array)
         except ValueError:
             return jsonify({'success': False, 'verified': False, 'error': 'No se detectó una cara en la imagen.'}), 400
 
         if not new_embedding:
             return jsonify({'success': False, 'verified': False, 'error': 'No se pudo generar embedding de la imagen.'}), 400
 
-        # Comparar embeddings usando distancia coseno
-        def cosine_distance(a, b):
-            try:
-                import math
-                dot = sum(x * y for x, y in zip(a, b))
-                na = math.sqrt(sum(x * x for x in a))
-                nb = math.sqrt(sum(y * y for y in b))
-                if na == 0 or nb == 0:
-                    return 1.0
-                return 1.0 - (dot / (na * nb))
-            except Exception:
-                return 1.0
-
-        distance = cosine_distance(new_embedding, stored)
-        threshold = float(os.getenv('FACE_VERIFY_THRESHOLD', '0.4'))
-        verified = distance <= threshold
-
-        logger.info(f"✓ VERIFICACION POR USUARIO para {user_id} => {'✓ VERIFICADO' if verified else '❌ NO VERIFICADO'} (distancia: {distance:.4f}, threshold: {threshold})")
+        # Comparar embeddings con el motor de verificación (vectorizado, umbral por modelo)
+        result = verification_engine.compare(new_embedding, stored)
+        verified = result['verified']
+        distance = result['distance']
+        threshold = result['threshold']
 
-        return jsonify({
-            'success': True,
-            'verified': bool(verified),
-            'distance': float(distance),
-            'threshold': threshold,
-            'confidence': float(1 - min(distance / threshold, 1.0)) if verified else 0.0
-        }), 200
+        logger.info("✓ VERIFICACION POR USUARIO para %s => %s (distancia: %.4f, threshold: %s)", user_id, '✓ VERIFICADO' if verified else '❌ NO VERIFICADO', distance, threshold)
+
+        return jsonify({'success': True, **result}), 200
 
     except Exception as e:
-        logger.error(f"Error en /verify/user: {str(e)}\n{traceback.format_exc()}")
+        logger.exception("Error en /verify/user: %s", e)
         return jsonify({'success': False, 'verified': False, 'error': 'Error procesando verificación por usuario'}), 500
 
 
+@app.route('/register/batch', methods=['POST'])
+@profile_endpoint('register_batch')
+def register_batch():
+    """
+    Registro masivo de caras en una sola conexión (backfills, re-registro tras cambio de modelo)
+    - Entrada NDJSON / multipart / JSON con `user_id` e `image` por item
+    - Detección concurrente en el pool e inferencia por lotes de FACE_BATCH_SIZE imágenes
+    - Escritura en Redis por pipeline (un round-trip por lote)
+    - Respuesta NDJSON en streaming: una línea por item y una línea final de resumen
+    """
+    if not require_write_auth():
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+    store = embedding_cache.persistent_store
+    if not store or not hasattr(store, 'set_users_many'):
+        return jsonify({
+            'success': False,
+            'error': 'Redis requerido para /register/batch. Habilita USE_REDIS=1 y REDIS_URL.'
+        }), 503
+
+    def process(batch):
+        valid = [item for item in batch if 'error' not in item]
+        resolved = batch_embeddings(valid) if valid else {}
+
+        to_store = [item for item in valid if isinstance(resolved[item['index']], Embedding)]
+        stored = store.set_users_many([(item['user_id'], resolved[item['index']]) for item in to_store])
+
+        results = []
+        for item in batch:
+            result = {'index': item['index'], 'user_id': item.get('user_id')}
+            outcome = resolved.get(item['index'])
+            if 'error' in item:
+                result.update({'success': False, 'error': item['error']})
+            elif isinstance(outcome, dict):
+                result.update(outcome)
+            elif stored:
+                result.update({'success': True, 'face_detected': True})
+            else:
+                result.update({'success': False, 'face_detected': True,
+                               'error': 'No se pudo guardar el embedding en Redis'})
+            results.append(result)
+        return results
+
+    logger.info("📦 Registro por lotes iniciado")
+    return stream_batch(process)
+
+
+@app.route('/verify/batch', methods=['POST'])
+@profile_endpoint('verify_batch')
+def verify_batch():
+    """
+    Verificación masiva contra usuarios registrados (equivalente a /verify/user por item)
+    - Entrada NDJSON / multipart / JSON con `user_id` e `image` por item
+    - Embeddings registrados leídos de Redis con un MGET por lote
+    - Respuesta NDJSON en streaming: una línea por item y una línea final de resumen
+    """
+    store = embedding_cache.persistent_store
+    if not store or not hasattr(store, 'get_users_many'):
+        return jsonify({
+            'success': False,
+            'error': 'Redis requerido para /verify/batch. Habilita USE_REDIS=1 y REDIS_URL.'
+        }), 503
+
+    def process(batch):
+        valid = [item for item in batch if 'error' not in item]
+        stored = store.get_users_many(list({item['user_id'] for item in valid}))
+        registered = [item for item in valid if stored.get(item['user_id'])]
+        resolved = batch_embeddings(registered) if registered else {}
+
+        results = []
+        for item in batch:
+            result = {'index': item['index'], 'user_id': item.get('user_id')}
+            outcome = resolved.get(item['index'])
+            if 'error' in item:
+                result.update({'success': False, 'verified': False, 'error': item['error']})
+            elif not stored.get(item['user_id']):
+                result.update({'success': True, 'verified': False, 'error': 'Usuario no registrado'})
+            elif isinstance(outcome, dict):
+                result.update({'verified': False, **outcome})
+            else:
+                result.update({'success': True, **verification_engine.compare(outcome, stored[item['user_id']])})
+            results.append(result)
+        return results
+
+    logger.info("📦 Verificación por lotes iniciada")
+    return stream_batch(process)
+
+
 @app.route('/user/exists', methods=['GET'])
 def user_exists():
     """Consulta ligera para saber si hay un embedding registrado para `user_id`.
@@ -894,11 +1455,11 @@ def user_exists():
             try:
                 stored = embedding_cache.persistent_store.get_user(user_id)
             except Exception as e:
-                logger.warning(f"Error consultando embedding de usuario en exists: {str(e)}")
+                logger.warning("Error consultando embedding de usuario en exists: %s", e)
 
         return jsonify({'success': True, 'exists': bool(stored)}), 200
     except Exception as e:
-        logger.error(f"Error en /user/exists: {str(e)}\n{traceback.format_exc()}")
+        logger.exception("Error en /user/exists: %s", e)
         return jsonify({'success': False, 'error': 'Error procesando consulta de existencia de usuario'}), 500
 
 
@@ -917,11 +1478,11 @@ def user_delete(user_id):
             try:
                 removed = embedding_cache.persistent_store.delete_user(user_id)
             except Exception as e:
-                logger.warning(f"Error eliminando embedding de usuario: {str(e)}")
+                logger.warning("Error eliminando embedding de usuario: %s", e)
 
         return jsonify({'success': True, 'removed': bool(removed)}), 200
     except Exception as e:
-        logger.error(f"Error en /user/<user_id> DELETE: {str(e)}\n{traceback.format_exc()}")
+        logger.exception("Error en /user/<user_id> DELETE: %s", e)
         return jsonify({'success': False, 'error': 'Error eliminando registro de usuario'}), 500
 
 @app.route('/cache/clear', methods=['POST'])
@@ -991,7 +1552,7 @@ def delete_registration():
 
         return jsonify({'success': True, 'removed': removed, 'hash': hash_key}), 200
     except Exception as e:
-        logger.error(f"Error en /register/delete: {str(e)}\n{traceback.format_exc()}")
+        logger.exception("Error en /register/delete: %s", e)
         return jsonify({'success': False, 'error': 'Error eliminando registro facial'}), 500
 
 if __name__ == '__main__':
@@ -1002,7 +1563,8 @@ if __name__ == '__main__':
     logger.info(f"  ├─ Caché concurrente: RWLock (múltiples lectores, escritor único)")
     logger.info(f"  ├─ Tamaño caché: {embedding_cache.max_size} items, TTL: {embedding_cache.ttl_seconds}s")
     logger.info(f"  ├─ Redis: {'✓ Habilitado' if USE_REDIS else '✗ Deshabilitado'}")
-    logger.info(f"  ├─ Rate limiting: Habilitado (10 req/min por endpoint)")
+    logger.info(f"  ├─ Control de admisión: {'✓ Habilitado' if admission.enabled else '✗ Deshabilitado'} (límite={admission.current_limit}, slo_ms={admission.slo * 1000:.0f})")
+    logger.info(f"  ├─ Rate limiting por IP: {'; '.join(RATE_LIMIT_DEFAULT) or '✗ Deshabilitado'}")
     logger.info(f"  └─ Profiling: Habilitado (métricas en /metrics)")
     logger.info("=" * 70)
     logger.info("📊 MONITOREO:")
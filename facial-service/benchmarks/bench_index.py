@@ -0,0 +1,145 @@
+# Benchmark de índices de búsqueda (flat / ivf / hnsw / pq / sq8) de deepface.modules.indexing
+# Mide tiempo de construcción, latencia de consulta y recall@k frente a la búsqueda exacta.
+# Para los índices comprimidos reporta además bytes por embedding y si la decisión
+# verificado/no verificado del mejor candidato coincide con la búsqueda exacta.
+#
+# Uso:
+#   python benchmarks/bench_index.py --sizes 10000 100000 1000000 --output index.json
+#   python benchmarks/bench_index.py --sizes 100000 --nprobe 4 8 16 --ef-search 32 64 128
+#   python benchmarks/bench_index.py --sizes 100000 --pq-m 32 64 128 --skip-hnsw
+
+import argparse
+import time
+
+from common import percentiles, synthetic_embeddings, timed, write_results
+
+from deepface.modules import indexing, verification
+
+
+def recall_at_k(results, truth, k):
+    """Fracción de los k vecinos exactos recuperados por el índice aproximado"""
+    hits = 0
+    for approx, exact in zip(results, truth):
+        hits += len({key for key, _ in approx[:k]} & {key for key, _ in exact[:k]})
+    return hits / (k * len(truth))
+
+
+def decision_agreement(results, truth, threshold):
+    """Fracción de consultas cuyo mejor candidato recibe la misma decisión que con búsqueda exacta"""
+    agree = 0
+    for approx, exact in zip(results, truth):
+        approx_verified = len(approx) > 0 and approx[0][1] <= threshold
+        agree += approx_verified == (exact[0][1] <= threshold)
+    return agree / len(truth)
+
+
+def bench_queries(index, queries, k):
+    """Lanza las consultas de una en una, como hace recognition.find, y mide cada latencia"""
+    results, latencies = [], []
+    for query in queries:
+        result, elapsed = timed(index.search, query, k)
+        results.append(result[0])
+        latencies.append(elapsed)
+    return results, latencies
+
+
+def bench_compressed(index, lookup, queries, truth, k, threshold):
+    """Mide un índice comprimido sin y con re-ranking exacto de los candidatos"""
+    rows = []
+    for rerank in (False, True):
+        index.set_refine_source((lambda keys: [lookup[key] for key in keys]) if rerank else None)
+        results, latencies = bench_queries(index, queries, k)
+        rows.append({'rerank': rerank,
+                     'bytes_per_embedding': round(index.memory_bytes() / len(index), 1),
+                     'recall': recall_at_k(results, truth, k),
+                     'decision_agreement': decision_agreement(results, truth, threshold),
+                     **percentiles(latencies)})
+    return rows
+
+
+def run(size, dims, queries_count, k, metric, nlist, nprobes, ef_searches, skip_hnsw, pq_ms):
+    embeddings, _ = synthetic_embeddings(size, dims=dims, seed=size)
+    keys = [f"face_{i}" for i in range(size)]
+    # consultas: caras de la galería con ruido, como una nueva foto de una persona registrada
+    queries, _ = synthetic_embeddings(queries_count, dims=dims, seed=size + 1)
+    queries = embeddings[:queries_count] + 0.1 * queries
+
+    rows = []
+    flat = indexing.build_index('flat', dims, metric)
+    _, build_ms = timed(flat.add, keys, embeddings)
+    truth, latencies = bench_queries(flat, queries, k)
+    rows.append({'size': size, 'index': 'flat', 'build_ms': round(build_ms, 2),
+                 'recall': 1.0, **percentiles(latencies)})
+    print(f"📊 n={size} flat p50={rows[-1]['p50_ms']}ms")
+
+    ivf = indexing.build_index('ivf', dims, metric, nlist=nlist or max(16, int(size ** 0.5)))
+    _, build_ms = timed(ivf.add, keys, embeddings)
+    for nprobe in nprobes:
+        ivf.set_params(nprobe=nprobe)
+        results, latencies = bench_queries(ivf, queries, k)
+        rows.append({'size': size, 'index': 'ivf', 'nlist': ivf.nlist, 'nprobe': nprobe,
+                     'build_ms': round(build_ms, 2), 'recall': recall_at_k(results, truth, k),
+                     **percentiles(latencies)})
+        print(f"📊 n={size} ivf nprobe={nprobe} recall={rows[-1]['recall']:.3f} "
+              f"p50={rows[-1]['p50_ms']}ms")
+
+    threshold = verification.find_threshold('Facenet512', metric)
+    lookup = dict(zip(keys, embeddings))
+    compressed = [('pq', {'m': m}) for m in pq_ms if dims % m == 0] + [('sq8', {})]
+    for index_type, params in compressed:
+        index = indexing.build_index(index_type, dims, metric, **params)
+        _, build_ms = timed(index.add, keys, embeddings)
+        for row in bench_compressed(index, lookup, queries, truth, k, threshold):
+            rows.append({'size': size, 'index': index_type, **params,
+                         'build_ms': round(build_ms, 2), **row})
+            print(f"📊 n={size} {index_type} {params} rerank={row['rerank']} "
+                  f"bytes={row['bytes_per_embedding']} recall={row['recall']:.3f} "
+                  f"decisiones={row['decision_agreement']:.3f} p50={row['p50_ms']}ms")
+
+    if not skip_hnsw:
+        try:
+            hnsw = indexing.build_index('hnsw', dims, metric)
+        except ImportError as e:
+            print(f"⚠️ HNSW omitido: {e}")
+            return rows
+        _, build_ms = timed(hnsw.add, keys, embeddings)
+        for ef_search in ef_searches:
+            hnsw.set_params(ef_search=ef_search)
+            results, latencies = bench_queries(hnsw, queries, k)
+            rows.append({'size': size, 'index': 'hnsw', 'ef_search': ef_search,
+                         'build_ms': round(build_ms, 2), 'recall': recall_at_k(results, truth, k),
+                         **percentiles(latencies)})
+            print(f"📊 n={size} hnsw ef_search={ef_search} recall={rows[-1]['recall']:.3f} "
+                  f"p50={rows[-1]['p50_ms']}ms")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de índices de embeddings faciales')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dims', type=int, default=512)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--metric', default='cosine',
+                        choices=['cosine', 'euclidean', 'euclidean_l2'])
+    parser.add_argument('--nlist', type=int, default=None,
+                        help='Listas IVF (por defecto sqrt(n))')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--pq-m', type=int, nargs='+', default=[64, 128],
+                        help='Subespacios PQ (bytes por embedding)')
+    parser.add_argument('--skip-hnsw', action='store_true')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    args = parser.parse_args()
+
+    started = time.time()
+    results = []
+    for size in args.sizes:
+        results += run(size, args.dims, args.queries, args.k, args.metric, args.nlist,
+                       args.nprobe, args.ef_search, args.skip_hnsw, args.pq_m)
+    write_results(results, args.output)
+    print(f"⏱️ Benchmark completado en {time.time() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,358 @@
+# Prueba de carga reproducible de los endpoints de Facial-Service
+# Mide latencia p50/p95/p99, throughput, RSS y CPU de /register, /verify, /verify/user y
+# /user/exists, y compara contra una ejecución guardada para probar cada cambio de rendimiento.
+#
+# Uso:
+#   python benchmarks/bench_load.py --concurrency 1 4 8 --duration 20 --output load.json
+#   python benchmarks/bench_load.py --rates 5 10 20 --duration 20        # lazo abierto (Poisson)
+#   python benchmarks/bench_load.py --baseline load.json --output new.json --fail-on-regression
+#   python benchmarks/bench_load.py --url http://localhost:5001 --pid 1234  # servicio ya levantado
+#
+# Sin --url la API se levanta en este proceso con un servidor WSGI local, sin rate limiting,
+# contra --redis-url o, si no se indica, contra fakeredis. Las caras son sintéticas
+# (common.synthetic_face): cada identidad tiene varias fotos que difieren en ruido e iluminación.
+#
+# Lazo cerrado: N clientes envían una petición tras otra. Lazo abierto: las peticiones llegan
+# según un proceso de Poisson a la tasa indicada y la latencia se mide desde la llegada
+# programada, de modo que la cola de espera cuenta (sin omisión coordinada).
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+from common import percentiles, synthetic_face, write_results
+
+ENDPOINTS = ('register', 'verify', 'verify_user', 'user_exists')
+
+
+def encode(img):
+    """Imagen BGR -> JPEG en Base64, como la envía el frontend"""
+    return base64.b64encode(cv2.imencode('.jpg', img)[1]).decode('ascii')
+
+
+class FacePool:
+    """Fotos sintéticas por identidad, codificadas una sola vez antes de medir"""
+
+    def __init__(self, identities, variants, seed=0):
+        self.identities = identities
+        self.variants = variants
+        self.images = [
+            [encode(synthetic_face(seed + identity, variant)) for variant in range(variants)]
+            for identity in range(identities)
+        ]
+
+    def photo(self, n):
+        """n-ésima foto del ciclo identidad x variante"""
+        identity = n % self.identities
+        return identity, self.images[identity][(n // self.identities) % self.variants]
+
+
+def start_local_service(redis_url=None):
+    """Importa la API en este proceso y la sirve con werkzeug en un puerto libre"""
+    os.environ.setdefault('USE_REDIS', '1')
+    if redis_url:
+        os.environ['REDIS_URL'] = redis_url
+    else:
+        import fakeredis
+        import redis
+
+        server = fakeredis.FakeServer()
+        redis.from_url = lambda *args, **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True)
+
+    import api
+    from werkzeug.serving import make_server
+
+    # el rate limiting por IP (RATE_LIMIT_DEFAULT) frenaría a todos los clientes, que comparten IP
+    api.limiter.enabled = False
+    server = make_server('127.0.0.1', 0, api.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='BenchServer', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", os.getpid(), server
+
+
+class Client:
+    """Conexión HTTP keep-alive de un hilo cliente"""
+
+    def __init__(self, base_url, token=None):
+        parsed = urlparse(base_url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.headers = {'Content-Type': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f"Bearer {token}"
+        self.connection = None
+
+    def request(self, method, path, payload=None):
+        """Envía la petición y devuelve el código de estado (0 si falló la conexión)"""
+        body = json.dumps(payload) if payload is not None else None
+        for attempt in range(2):
+            try:
+                if self.connection is None:
+                    self.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+                self.connection.request(method, path, body=body, headers=self.headers)
+                response = self.connection.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                # el servidor pudo cerrar la conexión keep-alive: se reintenta una vez
+                self.connection = None
+                if attempt == 1:
+                    return 0
+        return 0
+
+
+def build_request(endpoint, n, pool):
+    """(método, ruta, cuerpo) de la n-ésima petición a `endpoint`"""
+    identity, image = pool.photo(n)
+    if endpoint == 'register':
+        return 'POST', '/register', {'image': image, 'user_id': f"bench-{identity}"}
+    if endpoint == 'verify':
+        other = pool.images[identity][(n + 1) % pool.variants]
+        return 'POST', '/verify', {'img1': image, 'img2': other}
+    if endpoint == 'verify_user':
+        return 'POST', '/verify/user', {'image': image, 'user_id': f"bench-{identity}"}
+    if endpoint == 'user_exists':
+        return 'GET', f"/user/exists?user_id=bench-{identity}", None
+    raise ValueError(f"Endpoint desconocido: {endpoint}")
+
+
+class ResourceSampler:
+    """Muestrea RSS y CPU de un proceso cada `interval` segundos mientras dura una medición"""
+
+    def __init__(self, pid, interval=0.5):
+        import psutil
+
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.rss_mb, self.cpu = [], []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.process.cpu_percent(None)
+        self._thread = threading.Thread(target=self._loop, name='ResourceSampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.rss_mb.append(self.process.memory_info().rss / (1024 * 1024))
+            self.cpu.append(self.process.cpu_percent(None))
+
+    def summary(self):
+        if not self.rss_mb:
+            return {}
+        return {
+            'rss_mb_max': round(max(self.rss_mb), 1),
+            'rss_mb_mean': round(float(np.mean(self.rss_mb)), 1),
+            'cpu_percent_mean': round(float(np.mean(self.cpu)), 1),
+            'cpu_percent_max': round(max(self.cpu), 1),
+        }
+
+
+def closed_loop(base_url, endpoint, pool, concurrency, duration, token):
+    """`concurrency` clientes envían peticiones seguidas durante `duration` segundos"""
+    samples = []
+    lock = threading.Lock()
+    counter = iter(range(sys.maxsize))
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        client = Client(base_url, token)
+        local = []
+        while time.perf_counter() < deadline:
+            with lock:
+                n = next(counter)
+            method, path, payload = build_request(endpoint, n, pool)
+            start = time.perf_counter()
+            status = client.request(method, path, payload)
+            local.append(((time.perf_counter() - start) * 1000, status))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def open_loop(base_url, endpoint, pool, rate, duration, token, max_inflight, seed=0):
+    """Llegadas de Poisson a `rate` peticiones/s; la latencia incluye la espera en cola"""
+    rng = np.random.default_rng(seed)
+    arrivals = np.cumsum(rng.exponential(1.0 / rate, size=int(rate * duration * 2) + 1))
+    arrivals = arrivals[arrivals < duration]
+    local = threading.local()
+    samples = []
+    lock = threading.Lock()
+
+    def send(n, scheduled):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client(base_url, token)
+        method, path, payload = build_request(endpoint, n, pool)
+        status = client.request(method, path, payload)
+        with lock:
+            samples.append(((time.perf_counter() - scheduled) * 1000, status))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix='BenchClient') as clients:
+        for n, offset in enumerate(arrivals):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            clients.submit(send, n, scheduled)
+    return samples
+
+
+def summarize(endpoint, mode, level, samples, elapsed, resources):
+    latencies = [latency for latency, _ in samples]
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+    return {
+        'endpoint': endpoint,
+        'mode': mode,
+        'level': level,
+        'requests': len(samples),
+        'errors': errors,
+        'status': statuses,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed > 0 else 0,
+        'latency': percentiles(latencies),
+        'resources': resources,
+    }
+
+
+def run(base_url, endpoint, pool, mode, level, args, pid):
+    sampler = ResourceSampler(pid) if pid else None
+    start = time.perf_counter()
+    if sampler:
+        sampler.__enter__()
+    try:
+        if mode == 'closed':
+            samples = closed_loop(base_url, endpoint, pool, level, args.duration, args.token)
+        else:
+            samples = open_loop(base_url, endpoint, pool, level, args.duration, args.token,
+                                args.max_inflight, seed=args.seed)
+    finally:
+        if sampler:
+            sampler.__exit__(None, None, None)
+    elapsed = time.perf_counter() - start
+    return summarize(endpoint, mode, level, samples, elapsed, sampler.summary() if sampler else {})
+
+
+def result_key(result):
+    return f"{result['endpoint']}/{result['mode']}/{result['level']}"
+
+
+def compare(results, baseline_path, tolerance):
+    """Compara con una ejecución guardada; devuelve la lista de regresiones (> tolerance)"""
+    with open(baseline_path) as f:
+        baseline = {result_key(result): result for result in json.load(f)['results']}
+
+    regressions = []
+    print(f"\n📐 Comparación contra {baseline_path} (tolerancia {tolerance:.0%})")
+    for result in results:
+        key = result_key(result)
+        before = baseline.get(key)
+        if before is None:
+            print(f"   {key}: sin referencia")
+            continue
+        deltas = {}
+        # latencias: subir es peor; throughput: bajar es peor
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            old, new = before['latency'].get(metric), result['latency'].get(metric)
+            if old:
+                deltas[metric] = (new - old) / old
+        old_rps = before['throughput_rps']
+        if old_rps:
+            deltas['throughput_rps'] = (old_rps - result['throughput_rps']) / old_rps
+        worse = [metric for metric, delta in deltas.items() if delta > tolerance]
+        result['baseline_delta'] = {metric: round(delta, 4) for metric, delta in deltas.items()}
+        flag = '❌' if worse else '✅'
+        print(f"   {flag} {key}: " + ', '.join(
+            f"{metric} {'+' if delta > 0 else ''}{delta:.1%}" for metric, delta in deltas.items()
+        ) + ' (positivo = peor)')
+        if worse:
+            regressions.append({'key': key, 'metrics': worse})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de Facial-Service')
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4],
+                        help='Clientes en lazo cerrado')
+    parser.add_argument('--rates', type=float, nargs='+', default=[],
+                        help='Peticiones/s en lazo abierto (Poisson)')
+    parser.add_argument('--duration', type=float, default=10, help='Segundos por medición')
+    parser.add_argument('--warmup', type=int, default=3, help='Peticiones por endpoint sin medir')
+    parser.add_argument('--identities', type=int, default=20)
+    parser.add_argument('--variants', type=int, default=3, help='Fotos por identidad')
+    parser.add_argument('--max-inflight', type=int, default=64, help='Peticiones simultáneas en lazo abierto')
+    parser.add_argument('--url', default=None, help='Servicio ya levantado (por defecto, API en este proceso)')
+    parser.add_argument('--pid', type=int, default=None, help='PID del servicio para medir RSS/CPU con --url')
+    parser.add_argument('--redis-url', default=None, help='Redis local (por defecto fakeredis)')
+    parser.add_argument('--token', default=os.getenv('API_AUTH_TOKEN'), help='Bearer token de escritura')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=None, help='JSON de una ejecución anterior')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Empeoramiento tolerado (0.10 = 10%%)')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url, pid = args.url.rstrip('/'), args.pid
+    else:
+        base_url, pid, server = start_local_service(args.redis_url)
+    print(f"🎯 Servicio: {base_url}")
+
+    pool = FacePool(args.identities, args.variants, seed=args.seed)
+
+    # registro previo de las identidades para /verify/user y /user/exists, y carga de modelos
+    setup_client = Client(base_url, args.token)
+    registered = sum(
+        setup_client.request(*build_request('register', identity, pool)) == 200
+        for identity in range(args.identities)
+    )
+    print(f"👤 Identidades registradas: {registered}/{args.identities}")
+    for endpoint in args.endpoints:
+        for n in range(args.warmup):
+            setup_client.request(*build_request(endpoint, n, pool))
+
+    levels = [('closed', level) for level in args.concurrency] + [('open', rate) for rate in args.rates]
+    results = []
+    for endpoint in args.endpoints:
+        for mode, level in levels:
+            result = run(base_url, endpoint, pool, mode, level, args, pid)
+            results.append(result)
+            print(f"📊 {result_key(result)}: {result['throughput_rps']} req/s "
+                  f"p50={result['latency'].get('p50_ms')}ms p99={result['latency'].get('p99_ms')}ms "
+                  f"errores={result['errors']}")
+
+    regressions = compare(results, args.baseline, args.tolerance) if args.baseline else []
+    write_results(results, args.output)
+    if server is not None:
+        server.shutdown()
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
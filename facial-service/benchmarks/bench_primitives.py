@@ -0,0 +1,285 @@
+# Micro-benchmarks de las primitivas de deepface, etapa por etapa
+# Cronometra con entradas fijas (caras sintéticas de common.synthetic_face o imágenes propias):
+#   - load_image: desde archivo, Base64 y ndarray, por tamaño de imagen
+#   - detect_faces: por backend de detección, tamaño de imagen y número de caras
+#   - align_face: por tamaño del recorte de la cara
+#   - resize_image / normalize_input: por tamaño de entrada y técnica de normalización
+#   - forward: por modelo de reconocimiento y tamaño de lote (forward_batch)
+#   - find_distance: por métrica, dimensión y tipo de entrada (list / ndarray / Embedding)
+#
+# Uso:
+#   python benchmarks/bench_primitives.py --output antes.json
+#   python benchmarks/bench_primitives.py --primitives detect_faces --detectors opencv ssd yunet
+#   python benchmarks/bench_primitives.py --primitives forward --models Facenet512 ArcFace --batch-sizes 1 8 32
+#   python benchmarks/bench_primitives.py --compare antes.json despues.json --report informe.md
+#
+# Para comparar dos commits: ejecutar en cada uno con --output y luego --compare. Cada archivo
+# guarda el commit en `environment`. Los casos que no pueden correr (pesos no descargados,
+# dependencia opcional ausente) quedan en los resultados con `error` en lugar de cronometrarse.
+
+import argparse
+import base64
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from common import percentiles, synthetic_embeddings, synthetic_face, timed, write_results
+
+from deepface.commons import image_utils
+from deepface.commons.cache_utils import detection_cache
+from deepface.detectors import DetectorWrapper
+from deepface.models.Embedding import Embedding
+from deepface.modules import detection, modeling, preprocessing, verification
+
+PRIMITIVES = ('load_image', 'detect_faces', 'align_face', 'resize_image', 'normalize_input',
+              'forward', 'find_distance')
+
+# (ancho, alto) de foto de cámara web, foto de móvil reducida y foto de móvil completa
+IMAGE_SIZES = {'vga': (640, 480), 'hd': (1280, 720), 'full': (1920, 1440)}
+
+NORMALIZATIONS = ('base', 'raw', 'Facenet', 'Facenet2018', 'VGGFace', 'VGGFace2', 'ArcFace')
+
+METRICS = ('cosine', 'euclidean', 'euclidean_l2')
+
+
+def group_photo(faces, size, image=None):
+    """Foto de `size` con `faces` caras en cuadrícula (o la imagen propia redimensionada)"""
+    width, height = size
+    if image is not None:
+        return cv2.resize(image, size)
+    if faces <= 1:
+        return synthetic_face(0, size=size)
+    cols = int(np.ceil(np.sqrt(faces)))
+    rows = int(np.ceil(faces / cols))
+    cell_w, cell_h = width // cols, height // rows
+    canvas = np.full((height, width, 3), 190, dtype=np.uint8)
+    for n in range(faces):
+        row, col = divmod(n, cols)
+        canvas[row * cell_h:(row + 1) * cell_h, col * cell_w:(col + 1) * cell_w] = \
+            synthetic_face(n, size=(cell_w, cell_h))
+    return canvas
+
+
+def measure(func, repeat, warmup=2):
+    """Latencias (ms) de `repeat` llamadas a `func` tras `warmup` llamadas sin medir"""
+    for _ in range(warmup):
+        func()
+    return [timed(func)[1] for _ in range(repeat)]
+
+
+def case(primitive, params, func, repeat):
+    """Cronometra un caso; si no puede ejecutarse lo registra con el error"""
+    try:
+        latencies = measure(func, repeat)
+    except Exception as err:  # pylint: disable=broad-except
+        print(f"⚠️ {primitive} {params}: {err}")
+        return {'primitive': primitive, 'params': params, 'error': str(err)}
+    result = {'primitive': primitive, 'params': params, **percentiles(latencies)}
+    print(f"📊 {primitive} {params}: p50={result['p50_ms']}ms p99={result['p99_ms']}ms")
+    return result
+
+
+def bench_load_image(args, image, workdir):
+    results = []
+    for name, size in IMAGE_SIZES.items():
+        img = group_photo(1, size, image)
+        path = os.path.join(workdir, f"{name}.jpg")
+        cv2.imwrite(path, img)
+        encoded = 'data:image/jpeg;base64,' + base64.b64encode(cv2.imencode('.jpg', img)[1]).decode()
+        for source, value in (('file', path), ('base64', encoded), ('ndarray', img)):
+            results.append(case('load_image', {'size': name, 'source': source},
+                                lambda value=value: image_utils.load_image(value), args.repeat))
+    return results
+
+
+def bench_detect_faces(args, image):
+    results = []
+    # cada repetición usa la misma imagen: sin esto se mediría la caché de detecciones
+    cache_size, detection_cache.max_size = detection_cache.max_size, 0
+    try:
+        for detector in args.detectors:
+            for name, size in IMAGE_SIZES.items():
+                for faces in args.faces:
+                    img = group_photo(faces, size, image)
+                    result = case('detect_faces', {'detector': detector, 'size': name, 'faces': faces},
+                                  lambda img=img, detector=detector:
+                                  DetectorWrapper.detect_faces(detector, img), args.repeat)
+                    if 'error' not in result:
+                        result['found'] = len(DetectorWrapper.detect_faces(detector, img))
+                    results.append(result)
+    finally:
+        detection_cache.max_size = cache_size
+    return results
+
+
+def bench_align_face(args, image):
+    results = []
+    for side in (112, 224, 448):
+        face = group_photo(1, (side, side), image)
+        left_eye, right_eye = (int(side * 0.65), int(side * 0.42)), (int(side * 0.35), int(side * 0.38))
+        results.append(case('align_face', {'face': side},
+                            lambda face=face, left_eye=left_eye, right_eye=right_eye:
+                            detection.align_face(face, left_eye, right_eye), args.repeat))
+    return results
+
+
+def bench_resize_image(args, image):
+    results = []
+    for side in (112, 224, 448):
+        face = group_photo(1, (side, side), image)
+        for target in ((160, 160), (224, 224)):
+            results.append(case('resize_image', {'face': side, 'target': list(target)},
+                                lambda face=face, target=target:
+                                preprocessing.resize_image(face, target), args.repeat))
+    return results
+
+
+def bench_normalize_input(args, image):
+    results = []
+    face = preprocessing.resize_image(group_photo(1, (224, 224), image), (160, 160))
+    for batch in args.batch_sizes:
+        imgs = np.repeat(face, batch, axis=0)
+        for normalization in NORMALIZATIONS:
+            results.append(case('normalize_input', {'normalization': normalization, 'batch': batch},
+                                lambda imgs=imgs, normalization=normalization:
+                                preprocessing.normalize_input(imgs.copy(), normalization),
+                                args.repeat))
+    return results
+
+
+def bench_forward(args, image):
+    results = []
+    face = group_photo(1, (224, 224), image)
+    for model_name in args.models:
+        try:
+            model = modeling.build_model(model_name)
+        except Exception as err:  # pylint: disable=broad-except
+            print(f"⚠️ forward {model_name}: {err}")
+            results.append({'primitive': 'forward', 'params': {'model': model_name}, 'error': str(err)})
+            continue
+        resized = preprocessing.resize_image(face, model.input_shape)
+        for batch in args.batch_sizes:
+            imgs = np.repeat(resized, batch, axis=0)
+            results.append(case('forward', {'model': model_name, 'batch': batch},
+                                lambda model=model, imgs=imgs: model.forward_batch(imgs),
+                                args.repeat))
+    return results
+
+
+def bench_find_distance(args, _image):
+    results = []
+    for dims in (128, 512):
+        embeddings, _ = synthetic_embeddings(2, dims=dims)
+        inputs = {
+            'list': (embeddings[0].tolist(), embeddings[1].tolist()),
+            'ndarray': (embeddings[0], embeddings[1]),
+            'Embedding': (Embedding(embeddings[0]), Embedding(embeddings[1])),
+        }
+        for metric in METRICS:
+            for kind, (alpha, beta) in inputs.items():
+                results.append(case('find_distance', {'metric': metric, 'dims': dims, 'input': kind},
+                                    lambda alpha=alpha, beta=beta, metric=metric:
+                                    verification.find_distance(alpha, beta, metric),
+                                    args.repeat * 10))
+    return results
+
+
+def case_key(result):
+    return result['primitive'] + ' ' + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(before_path, after_path, tolerance):
+    """Informe markdown del cambio de p50/p95/p99 de cada caso entre dos ejecuciones"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    old = {case_key(result): result for result in before['results']}
+
+    lines = [
+        f"# Micro-benchmarks: {before['environment'].get('commit')} -> {after['environment'].get('commit')}",
+        '',
+        f"Tolerancia {tolerance:.0%}; positivo = más lento.",
+        '',
+        '| primitiva | caso | p50 antes (ms) | p50 después (ms) | Δp50 | Δp95 | Δp99 | |',
+        '|---|---|---|---|---|---|---|---|',
+    ]
+    regressions = 0
+    for result in after['results']:
+        key = case_key(result)
+        previous = old.get(key)
+        params = json.dumps(result['params'], sort_keys=True)
+        if previous is None or 'error' in result or 'error' in previous:
+            note = result.get('error') or (previous or {}).get('error') or 'sin referencia'
+            lines.append(f"| {result['primitive']} | {params} | | | | | | {note} |")
+            continue
+        deltas = [
+            (result[metric] - previous[metric]) / previous[metric] if previous[metric] else 0.0
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms')
+        ]
+        worse = deltas[0] > tolerance
+        regressions += worse
+        lines.append(
+            f"| {result['primitive']} | {params} | {previous['p50_ms']} | {result['p50_ms']} | "
+            + ' | '.join(f"{delta:+.1%}" for delta in deltas)
+            + f" | {'❌' if worse else '✅'} |"
+        )
+    lines += ['', f"Regresiones de p50: {regressions}"]
+    return '\n'.join(lines) + '\n', regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks de las primitivas de deepface')
+    parser.add_argument('--primitives', nargs='+', default=list(PRIMITIVES), choices=PRIMITIVES)
+    parser.add_argument('--detectors', nargs='+', default=['opencv'])
+    parser.add_argument('--models', nargs='+', default=['Facenet512'])
+    parser.add_argument('--faces', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--repeat', type=int, default=30, help='Mediciones por caso')
+    parser.add_argument('--image', default=None, help='Foto propia en lugar de las caras sintéticas')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DESPUES'), default=None,
+                        help='Compara dos archivos de resultados en lugar de medir')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Empeoramiento tolerado (0.10 = 10%%)')
+    parser.add_argument('--report', default=None, help='Archivo markdown del informe de --compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        report, regressions = compare(*args.compare, args.tolerance)
+        print(report)
+        if args.report:
+            with open(args.report, 'w') as f:
+                f.write(report)
+            print(f"✅ Informe guardado en {args.report}")
+        return
+
+    image = None
+    if args.image:
+        image = cv2.imread(args.image)
+        if image is None:
+            raise ValueError(f"No se pudo leer {args.image}")
+
+    benches = {
+        'detect_faces': bench_detect_faces,
+        'align_face': bench_align_face,
+        'resize_image': bench_resize_image,
+        'normalize_input': bench_normalize_input,
+        'forward': bench_forward,
+        'find_distance': bench_find_distance,
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for primitive in args.primitives:
+            if primitive == 'load_image':
+                results += bench_load_image(args, image, workdir)
+            else:
+                results += benches[primitive](args, image)
+
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# Benchmark por frame del detector SSD (deepface.detectors.Ssd)
+# Casos de uso:
+#   - streaming: frames 640x480 de cámara, una detección por frame
+#   - registro: fotos 1280x960, una detección por imagen
+#
+# Modos:
+#   - postprocess: la red se sustituye por detecciones sintéticas (200 filas, como la salida
+#     real del SSD) para aislar el post-procesado; el filtrado y escalado de cajas en NumPy
+#     (Ssd.scale_detections) se compara con la versión previa en pandas, tras comprobar que
+#     ambas devuelven las mismas cajas y confianzas
+#   - full: red real (requiere los pesos en ~/.deepface/weights o conexión para descargarlos)
+#     y una imagen con cara (--image, obligatoria en este modo)
+#
+# Uso:
+#   python benchmarks/bench_ssd.py --frames 500 --output ssd.json
+#   python benchmarks/bench_ssd.py --mode full --image ruta/a/foto_con_cara.jpg
+
+import argparse
+import threading
+
+import cv2
+import numpy as np
+
+from common import percentiles, timed, write_results
+
+from deepface.detectors import OpenCv, Ssd
+
+SCENARIOS = {
+    'streaming': (640, 480),
+    'registro': (1280, 960),
+}
+
+
+class RecordedNet:
+    """Red falsa que devuelve siempre las mismas detecciones crudas (1, 1, N, 7)"""
+
+    def __init__(self, detections):
+        self.detections = detections
+
+    def setInput(self, blob):  # pylint: disable=invalid-name
+        pass
+
+    def forward(self):
+        return self.detections
+
+
+def synthetic_detections(rows=200, faces=1, seed=0):
+    """Salida típica del SSD: pocas caras con confianza alta y el resto ruido de baja confianza"""
+    rng = np.random.default_rng(seed)
+    detections = np.zeros((rows, 7), dtype=np.float32)
+    detections[:, 1] = 1
+    detections[:, 2] = rng.uniform(0.0, 0.2, rows)
+    corners = np.sort(rng.uniform(0, 1, (rows, 2, 2)), axis=1)
+    detections[:, 3:5] = corners[:, 0]
+    detections[:, 5:7] = corners[:, 1]
+    detections[:faces, 2] = 0.99
+    detections[:faces, 3:7] = [0.35, 0.25, 0.65, 0.75]
+    return detections[np.newaxis, np.newaxis]
+
+
+def pandas_postprocess(detections, img_shape):
+    """Filtrado y escalado previo basado en pandas (referencia para comparar): (x, y, w, h, confianza)"""
+    import pandas as pd
+
+    ssd_labels = ["img_id", "is_face", "confidence", "left", "top", "right", "bottom"]
+    detections_df = pd.DataFrame(detections[0][0], columns=ssd_labels)
+    detections_df = detections_df[detections_df["is_face"] == 1]
+    detections_df = detections_df[detections_df["confidence"] >= 0.90]
+    for column in ("left", "bottom", "right", "top"):
+        detections_df[column] = (detections_df[column] * 300).astype(int)
+    boxes = []
+    for _, instance in detections_df.iterrows():
+        x = int(instance["left"] * img_shape[1] / 300)
+        y = int(instance["top"] * img_shape[0] / 300)
+        w = int(instance["right"] * img_shape[1] / 300) - x
+        h = int(instance["bottom"] * img_shape[0] / 300) - y
+        boxes.append((x, y, w, h, float(instance["confidence"])))
+    return boxes
+
+
+def numpy_postprocess(detections, img_shape):
+    """Filtrado y escalado actual del detector (mismo formato que pandas_postprocess)"""
+    return Ssd.scale_detections(detections[0][0], img_shape)
+
+
+def build_client(mode, detections):
+    if mode == 'full':
+        return Ssd.SsdClient()
+    client = Ssd.SsdClient.__new__(Ssd.SsdClient)
+    client._lock = threading.Lock()
+    client.model = {'face_detector': RecordedNet(detections), 'opencv_module': OpenCv.OpenCvClient()}
+    return client
+
+
+def load_frame(image_path, size):
+    if image_path:
+        img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError(f"No se pudo leer {image_path}")
+    else:
+        img = np.random.default_rng(0).integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    return cv2.resize(img, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark por frame del detector SSD')
+    parser.add_argument('--mode', choices=['postprocess', 'full'], default='postprocess')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--image', default=None,
+                        help='Imagen con cara (obligatoria en modo full; por defecto ruido)')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    args = parser.parse_args()
+    if args.mode == 'full' and not args.image:
+        parser.error('--image es obligatoria en modo full')
+
+    detections = synthetic_detections()
+    client = build_client(args.mode, detections)
+
+    results = []
+    for scenario, size in SCENARIOS.items():
+        frame = load_frame(args.image, size)
+        client.detect_faces(frame)  # calentamiento
+
+        latencies = [timed(client.detect_faces, frame)[1] for _ in range(args.frames)]
+        results.append({'scenario': scenario, 'mode': args.mode, 'implementation': 'numpy',
+                        'size': list(size), **percentiles(latencies)})
+        print(f"📊 {scenario} {size} detect_faces p50={results[-1]['p50_ms']}ms")
+
+        if args.mode == 'postprocess':
+            expected = pandas_postprocess(detections, frame.shape)
+            actual = numpy_postprocess(detections, frame.shape)
+            assert actual == expected, f"NumPy y pandas difieren: {actual} != {expected}"
+
+            for implementation, postprocess in (('numpy', numpy_postprocess),
+                                                ('pandas (anterior)', pandas_postprocess)):
+                latencies = [timed(postprocess, detections, frame.shape)[1]
+                             for _ in range(args.frames)]
+                results.append({'scenario': scenario, 'mode': 'postprocess-only',
+                                'implementation': implementation, 'size': list(size),
+                                **percentiles(latencies)})
+                print(f"📊 {scenario} {size} filtrado {implementation} p50={results[-1]['p50_ms']}ms")
+
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# Benchmark del modo de streaming sin pantalla (deepface.modules.streaming.headless_analysis)
+# Mide el throughput del pipeline captura -> detección -> embedding sobre un video local
+#
+# Uso:
+#   python benchmarks/bench_streaming.py --video clip.mp4 --intervals 1 5 --output stream.json
+#   python benchmarks/bench_streaming.py --image cara.jpg --frames 300   # genera un clip sintético
+#
+# Sin --video se genera un clip 640x480 en un directorio temporal: con --image la cara se
+# desplaza por el frame; sin imagen los frames son ruido (mide sólo captura y detección)
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from common import percentiles, write_results
+
+from deepface.commons.cache_utils import detection_cache
+from deepface.detectors import DetectorWrapper
+from deepface.modules import streaming
+
+# mismo detector opencv que el servicio (modo rápido, ver api.py)
+DetectorWrapper.configure('opencv', fast_mode=True)
+
+
+def synthetic_video(path, frames, image=None, size=(640, 480), fps=30):
+    """Escribe un clip MJPG con una cara que se desplaza (o ruido si no hay imagen)"""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    rng = np.random.default_rng(0)
+    face = None
+    if image:
+        face = cv2.imread(image)
+        if face is None:
+            raise ValueError(f"No se pudo leer {image}")
+        # la cara ocupa ~1/3 del alto: supera el umbral de tamaño de grab_facial_areas
+        scale = 1.5 * height / face.shape[0]
+        face = cv2.resize(face, (int(face.shape[1] * scale), int(face.shape[0] * scale)))
+        crop_w = min(face.shape[1], width * 2 // 3)
+        face = face[:height, (face.shape[1] - crop_w) // 2 :][:, :crop_w]
+    for idx in range(frames):
+        frame = rng.integers(0, 40, (height, width, 3), dtype=np.uint8)
+        if face is not None:
+            shift = (idx * 2) % (width - face.shape[1] + 1)
+            frame[: face.shape[0], shift : shift + face.shape[1]] = face
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def run(video, interval, args):
+    # los frames se repiten entre ejecuciones: sin limpiar, la caché de detección falsea la medida
+    detection_cache.clear()
+    latencies = []
+    faces = 0
+    last = None
+    start = time.perf_counter()
+    for result in streaming.headless_analysis(
+        source=video,
+        db_path=args.db_path,
+        model_name=args.model,
+        detector_backend=args.detector,
+        enable_face_analysis=args.attributes,
+        detection_interval=interval,
+        queue_size=args.queue_size,
+        drop_frames=args.drop_frames,
+    ):
+        latencies.append(result['latency_ms'])
+        faces += len(result['faces'])
+        last = result
+        if args.jsonl:
+            print(json.dumps(result))
+    elapsed = time.perf_counter() - start
+    return {
+        'detection_interval': interval,
+        'detector': args.detector,
+        'drop_frames': args.drop_frames,
+        'frames_analyzed': len(latencies),
+        'frames_dropped': last['dropped_frames'] if last else 0,
+        'faces': faces,
+        'fps': round(len(latencies) / elapsed, 2) if elapsed > 0 else 0,
+        'latency': percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del streaming sin pantalla')
+    parser.add_argument('--video', default=None, help='Video local (por defecto clip sintético)')
+    parser.add_argument('--image', default=None, help='Cara para el clip sintético')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1, 5])
+    parser.add_argument('--detector', default='opencv')
+    parser.add_argument('--model', default='Facenet512')
+    parser.add_argument('--db-path', default='', help='Galería para reconocimiento (opcional)')
+    parser.add_argument('--attributes', action='store_true', help='Edad, género y emoción')
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--drop-frames', action='store_true',
+                        help='Descartar frames bajo presión (por defecto se procesan todos)')
+    parser.add_argument('--jsonl', action='store_true', help='Imprimir el resultado de cada frame')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video or synthetic_video(os.path.join(tmp, 'clip.avi'), args.frames, args.image)
+        results = []
+        for interval in args.intervals:
+            results.append(run(video, interval, args))
+            print(f"📊 intervalo={interval} {results[-1]['fps']} fps "
+                  f"p50={results[-1]['latency'].get('p50_ms')}ms")
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
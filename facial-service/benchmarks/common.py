@@ -0,0 +1,128 @@
+# Utilidades compartidas por los benchmarks de Facial-Service
+# Cronometraje, percentiles y volcado de resultados a JSON
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Permite ejecutar los benchmarks como scripts desde facial-service/
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+
+def timed(func, *args, **kwargs):
+    """Ejecuta `func` y devuelve (resultado, milisegundos)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def percentiles(samples_ms):
+    """Resume una lista de latencias (ms) en media y percentiles p50/p95/p99"""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if samples.size == 0:
+        return {'count': 0}
+    return {
+        'count': int(samples.size),
+        'mean_ms': round(float(samples.mean()), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'max_ms': round(float(samples.max()), 4),
+    }
+
+
+def synthetic_embeddings(count, dims=512, identities=None, noise=0.35, seed=0):
+    """Genera embeddings float32 agrupados por identidad, similares a los de un modelo facial"""
+    rng = np.random.default_rng(seed)
+    identities = identities or max(1, count // 10)
+    centers = rng.standard_normal((identities, dims), dtype=np.float32)
+    labels = rng.integers(0, identities, size=count)
+    embeddings = centers[labels] + noise * rng.standard_normal((count, dims), dtype=np.float32)
+    return embeddings, labels
+
+
+def synthetic_face(identity, variant=0, size=(480, 640)):
+    """Dibuja una cara sintética BGR que detecta el detector opencv (ojos incluidos).
+
+    La geometría y los colores dependen de `identity`; `variant` cambia sólo el ruido, la
+    iluminación y un pequeño desplazamiento, como dos fotos de la misma persona.
+    """
+    import cv2
+
+    rng = np.random.default_rng(identity)
+    width, height = size
+    img = np.full((height, width, 3), rng.integers(150, 230, 3), dtype=np.uint8)
+    cx, cy = width // 2 + int(rng.integers(-20, 20)), height // 2
+    fw, fh = int(width * rng.uniform(0.26, 0.32)), int(height * rng.uniform(0.30, 0.36))
+    skin = tuple(int(c) for c in rng.integers([90, 120, 160], [150, 180, 230]))
+    shade = tuple(int(c * 0.6) for c in skin)
+    ex, ey = int(fw * rng.uniform(0.35, 0.45)), cy - int(fh * 0.15)
+    er = max(6, int(fw * 0.12))
+
+    # pelo, cara, cuencas de los ojos (más oscuras que las mejillas, como espera Haar)
+    cv2.ellipse(img, (cx, cy), (fw, fh), 0, 0, 360, (40, 40, 40), -1)
+    cv2.ellipse(img, (cx, cy + fh // 10), (int(fw * 0.9), int(fh * 0.9)), 0, 0, 360, skin, -1)
+    for side in (-1, 1):
+        cv2.ellipse(img, (cx + side * ex, ey - er // 3), (int(er * 1.9), int(er * 1.2)),
+                    0, 0, 360, shade, -1)
+    for side in (-1, 1):
+        x = cx + side * ex
+        cv2.ellipse(img, (x, ey), (er, er // 2 + 2), 0, 0, 360, (200, 200, 200), -1)
+        cv2.circle(img, (x, ey), er // 2, (30, 20, 20), -1)
+        cv2.line(img, (x - er, ey - int(er * 1.4)), (x + er, ey - int(er * 1.6)),
+                 (30, 30, 30), max(3, er // 3))
+    cv2.line(img, (cx, ey + er), (cx - er // 2, cy + int(fh * 0.15)),
+             tuple(int(c * 0.75) for c in skin), 3)
+    cv2.ellipse(img, (cx, cy + int(fh * 0.42)), (int(fw * 0.35), int(fh * 0.07)),
+                0, 0, 180, (40, 40, 140), -1)
+    img = cv2.GaussianBlur(img, (0, 0), 3.0)
+
+    variant_rng = np.random.default_rng((identity, variant))
+    shift = variant_rng.integers(-8, 9, size=2) if variant else (0, 0)
+    img = np.roll(img, (int(shift[0]), int(shift[1])), axis=(0, 1))
+    gain = variant_rng.uniform(0.9, 1.1) if variant else 1.0
+    noise = variant_rng.normal(0, 6, img.shape)
+    return np.clip(img * gain + noise, 0, 255).astype(np.uint8)
+
+
+def environment():
+    """Datos del entorno para poder comparar resultados entre máquinas"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'commit': git_commit(),
+    }
+
+
+def git_commit():
+    """Commit actual del repositorio (con sufijo -dirty si hay cambios sin commitear)"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=SERVICE_DIR, capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(results, output=None):
+    """Imprime los resultados y los guarda en JSON si se indica `output`"""
+    payload = {'environment': environment(), 'results': results}
+    text = json.dumps(payload, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+        print(f"✅ Resultados guardados en {output}")
+    else:
+        print(text)
+    return payload
@@ -79,11 +79,11 @@ def verify(
     Args:
         img1_path (str or np.ndarray or List[float]): Path to the first image.
             Accepts exact image path as a string, numpy array (BGR), base64 encoded images
-            or pre-calculated embeddings.
+            or pre-calculated embeddings (Embedding, list or 1-D array of floats).
 
         img2_path (str or np.ndarray or List[float]): Path to the second image.
             Accepts exact image path as a string, numpy array (BGR), base64 encoded images
-            or pre-calculated embeddings.
+            or pre-calculated embeddings (Embedding, list or 1-D array of floats).
 
         model_name (str): Model for face recognition. Options: VGG-Face, Facenet, Facenet512,
             OpenFace, DeepFace, DeepID, Dlib, ArcFace, SFace and GhostFaceNet (default is VGG-Face).
@@ -261,6 +261,8 @@ def find(
     normalization: str = "base",
     silent: bool = False,
     refresh_database: bool = True,
+    index_type: str = "flat",
+    index_params: Optional[Dict[str, Any]] = None,
 ) -> List[pd.DataFrame]:
     """
     Identify individuals in a database
@@ -304,6 +306,13 @@ def find(
         directory/db files, if set to false, it will ignore any file changes inside the db_path
         (default is True).
 
+        index_type (string): nearest neighbour index to search the database with. Options: 'flat'
+            for exact brute force search, 'ivf' or 'hnsw' for approximate search on large
+            databases, 'pq' or 'sq8' for compressed search (default is flat).
+
+        index_params (dict): tunable parameters of the index, e.g. k, nlist, nprobe, M,
+            ef_construction, ef_search, m or rerank (default is None).
+
     Returns:
         results (List[pd.DataFrame]): A list of pandas dataframes. Each dataframe corresponds
             to the identity information for an individual detected in the source image.
@@ -335,6 +344,8 @@ def find(
         normalization=normalization,
         silent=silent,
         refresh_database=refresh_database,
+        index_type=index_type,
+        index_params=index_params,
     )
 
 
@@ -379,9 +390,10 @@ def represent(
         results (List[Dict[str, Any]]): A list of dictionaries, each containing the
             following fields:
 
-        - embedding (List[float]): Multidimensional vector representing facial features.
+        - embedding (Embedding): Multidimensional float32 vector representing facial features.
             The number of dimensions varies based on the reference model
             (e.g., FaceNet returns 128 dimensions, VGG-Face returns 4096 dimensions).
+            It behaves as a list of floats, call to_list for a plain list.
 
         - facial_area (dict): Detected facial area by face detection in dictionary format.
             Contains 'x' and 'y' as the left-corner point, and 'w' and 'h'
@@ -411,6 +423,7 @@ def stream(
     source: Any = 0,
     time_threshold: int = 5,
     frame_threshold: int = 5,
+    detection_interval: int = 1,
 ) -> None:
     """
     Run real time face recognition and facial attribute analysis
@@ -437,6 +450,9 @@ def stream(
         time_threshold (int): The time threshold (in seconds) for face recognition (default is 5).
 
         frame_threshold (int): The frame threshold for face recognition (default is 5).
+
+        detection_interval (int): Run the face detector every detection_interval frames and
+            track faces in the frames between (default is 1, detect on every frame).
     Returns:
         None
     """
@@ -453,6 +469,7 @@ def stream(
         source=source,
         time_threshold=time_threshold,
         frame_threshold=frame_threshold,
+        detection_interval=detection_interval,
     )
 
 
@@ -1,14 +1,30 @@
 # 3rd parth dependencies
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider
 from deepface import DeepFace
 from deepface.api.src.modules.core.routes import blueprint
 from deepface.commons import logger as log
+from deepface.models.Embedding import json_default
 
 logger = log.get_singletonish_logger()
 
 
+class JSONProvider(DefaultJSONProvider):
+    """
+    Serialize embeddings and numpy values in responses as plain JSON lists and numbers
+    """
+
+    @staticmethod
+    def default(o):
+        try:
+            return json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
+
 def create_app():
     app = Flask(__name__)
+    app.json = JSONProvider(app)
     app.register_blueprint(blueprint)
     logger.info(f"Welcome to DeepFace API v{DeepFace.__version__}!")
     return app
@@ -1,4 +1,3 @@
-from typing import List
 import os
 import bz2
 import gdown
@@ -23,7 +22,7 @@ class DlibClient(FacialRecognition):
         self.input_shape = (150, 150)
         self.output_shape = 128
 
-    def forward(self, img: np.ndarray) -> List[float]:
+    def forward(self, img: np.ndarray) -> np.ndarray:
         """
         Find embeddings with Dlib model.
             This model necessitates the override of the forward method
@@ -31,7 +30,7 @@ class DlibClient(FacialRecognition):
         Args:
             img (np.ndarray): pre-loaded image in BGR
         Returns
-            embeddings (list): multi-dimensional vector
+            embeddings (np.ndarray): multi-dimensional vector
         """
         # return self.model.predict(img)[0].tolist()
 
@@ -49,9 +48,7 @@ class DlibClient(FacialRecognition):
         img = img.astype(np.uint8)
 
         img_representation = self.model.model.compute_face_descriptor(img)
-        img_representation = np.array(img_representation)
-        img_representation = np.expand_dims(img_representation, axis=0)
-        return img_representation[0].tolist()
+        return np.asarray(img_representation, dtype=np.float32)
 
 
 class DlibResNet:
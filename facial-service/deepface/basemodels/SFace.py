@@ -1,6 +1,6 @@
 # built-in dependencies
 import os
-from typing import Any, List
+from typing import Any
 
 # 3rd party dependencies
 import numpy as np
@@ -28,7 +28,7 @@ class SFaceClient(FacialRecognition):
         self.input_shape = (112, 112)
         self.output_shape = 128
 
-    def forward(self, img: np.ndarray) -> List[float]:
+    def forward(self, img: np.ndarray) -> np.ndarray:
         """
         Find embeddings with SFace model
             This model necessitates the override of the forward method
@@ -36,7 +36,7 @@ class SFaceClient(FacialRecognition):
         Args:
             img (np.ndarray): pre-loaded image in BGR
         Returns
-            embeddings (list): multi-dimensional vector
+            embeddings (np.ndarray): multi-dimensional vector
         """
         # return self.model.predict(img)[0].tolist()
 
@@ -45,7 +45,7 @@ class SFaceClient(FacialRecognition):
 
         embeddings = self.model.model.feature(input_blob)
 
-        return embeddings[0].tolist()
+        return embeddings[0]
 
 
 def load_model(
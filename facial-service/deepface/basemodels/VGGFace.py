@@ -1,4 +1,3 @@
-from typing import List
 import os
 import gdown
 import numpy as np
@@ -47,7 +46,7 @@ class VggFaceClient(FacialRecognition):
         self.input_shape = (224, 224)
         self.output_shape = 4096
 
-    def forward(self, img: np.ndarray) -> List[float]:
+    def forward(self, img: np.ndarray) -> np.ndarray:
         """
         Generates embeddings using the VGG-Face model.
             This method incorporates an additional normalization layer,
@@ -56,16 +55,15 @@ class VggFaceClient(FacialRecognition):
         Args:
             img (np.ndarray): pre-loaded image in BGR
         Returns
-            embeddings (list): multi-dimensional vector
+            embeddings (np.ndarray): multi-dimensional vector
         """
         # model.predict causes memory issue when it is called in a for loop
         # embedding = model.predict(img, verbose=0)[0].tolist()
 
         # having normalization layer in descriptor troubles for some gpu users (e.g. issue 957, 966)
         # instead we are now calculating it with traditional way not with keras backend
-        embedding = self.model(img, training=False).numpy()[0].tolist()
-        embedding = verification.l2_normalize(embedding)
-        return embedding.tolist()
+        embedding = self.model(img, training=False).numpy()[0]
+        return verification.l2_normalize(embedding)
 
 
 def base_model() -> Sequential:
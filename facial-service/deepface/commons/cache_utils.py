@@ -0,0 +1,118 @@
+# built-in dependencies
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# 3rd party dependencies
+import numpy as np
+
+
+def image_digest(img: np.ndarray) -> str:
+    """
+    Find the digest of a decoded image's pixels
+        the same frame decoded twice gets the same digest regardless of its source
+    Args:
+        img (np.ndarray): pre-loaded image
+    Returns:
+        digest (str): blake2b digest of pixels, shape and dtype
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{img.shape}-{img.dtype}".encode("utf-8"))
+    hasher.update(memoryview(np.ascontiguousarray(img)).cast("B"))
+    return hasher.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread safe, bounded least recently used cache with hit statistics.
+    Each entry keeps the milliseconds it cost to compute, hits add them to saved_ms.
+    """
+
+    def __init__(self, max_size: int = 256):
+        """
+        Args:
+            max_size (int): max number of entries, 0 disables the cache
+        """
+        self.max_size = max_size
+        self._entries: "OrderedDict[Any, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        """
+        Get the value stored for a key and mark it as recently used
+        Args:
+            key (Any): entry key
+        Returns:
+            value (Any): stored value or None if missing
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_ms += entry[1]
+            return entry[0]
+
+    def put(self, key: Any, value: Any, cost_ms: float = 0.0) -> None:
+        """
+        Store a value, evicting the least recently used entry if the cache is full
+        Args:
+            key (Any): entry key
+            value (Any): value to store
+            cost_ms (float): milliseconds spent computing the value
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, cost_ms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def resize(self, max_size: int) -> None:
+        """
+        Change the max number of entries, evicting the least recently used ones that no longer fit
+        Args:
+            max_size (int): new max number of entries, 0 disables the cache
+        """
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > max(max_size, 0):
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            stats (dict): size, max_size, hits, misses, hit_rate and saved_ms
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0,
+                "saved_ms": round(self.saved_ms, 2),
+            }
+
+
+# facial areas found by detectors, keyed by image digest and detection options
+detection_cache = LRUCache(max_size=int(os.getenv("DEEPFACE_DETECTOR_CACHE_SIZE", "256")))
@@ -1,7 +1,7 @@
 # built-in dependencies
 import os
 import io
-from typing import List, Union, Tuple
+from typing import Dict, List, Optional, Union, Tuple
 import hashlib
 import base64
 from pathlib import Path
@@ -12,6 +12,13 @@ import numpy as np
 import cv2
 from PIL import Image
 
+# project dependencies
+from deepface.commons import logger as log
+
+logger = log.get_singletonish_logger()
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
 
 def list_images(path: str) -> List[str]:
     """
@@ -38,6 +45,142 @@ def list_images(path: str) -> List[str]:
     return images
 
 
+def scan_images(path: str) -> Dict[str, Tuple[int, int, int]]:
+    """
+    List images in a given path with their file properties in a single directory scan
+        unlike list_images, images are trusted by their extension instead of being opened
+    Args:
+        path (str): path's location
+    Returns:
+        manifest (dict): exact image paths mapped to their size, modification time (ns)
+            and inode
+    """
+    manifest = {}
+    pending = [path]
+    while len(pending) > 0:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=True):
+                    pending.append(entry.path)
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS:
+                    continue
+                try:
+                    stats = entry.stat()
+                except OSError:
+                    continue
+                manifest[entry.path] = (stats.st_size, stats.st_mtime_ns, stats.st_ino)
+    return manifest
+
+
+class DirectoryTracker:
+    """
+    Track added, removed and replaced images of a directory tree with a manifest of
+    (size, mtime, inode) per image. With inotify (optional inotify_simple package, linux
+    only) an unchanged directory is detected without scanning it at all.
+    """
+
+    def __init__(self, path: str, use_inotify: bool = True):
+        """
+        Args:
+            path (str): directory to track
+            use_inotify (bool): watch the directory with inotify if it is available
+        """
+        self.path = path
+        self.manifest: Optional[Dict[str, Tuple[int, int, int]]] = None
+        self.inotify = self.__build_inotify() if use_inotify else None
+
+    def __build_inotify(self):
+        try:
+            import inotify_simple
+        except ModuleNotFoundError:
+            logger.debug(
+                "inotify_simple is an optional dependency to watch db_path for changes,"
+                " scanning it instead. You can install it as pip install inotify_simple"
+            )
+            return None
+        try:
+            return inotify_simple.INotify()
+        except OSError as err:
+            logger.debug(f"inotify is not available, scanning {self.path} instead - {err}")
+            return None
+
+    def __watch(self) -> None:
+        """
+        Watch every directory of the tree, new ones included
+        """
+        import inotify_simple
+
+        flags = inotify_simple.flags
+        mask = (
+            flags.CREATE
+            | flags.DELETE
+            | flags.CLOSE_WRITE
+            | flags.MOVED_FROM
+            | flags.MOVED_TO
+            | flags.ATTRIB
+            | flags.DELETE_SELF
+        )
+        for root, _, _ in os.walk(self.path):
+            try:
+                self.inotify.add_watch(root, mask)
+            except OSError:
+                continue
+
+    def is_dirty(self) -> bool:
+        """
+        Check whether the directory might have changed since the last scan
+        Returns:
+            result (bool): False only if the directory is known to be unchanged
+        """
+        if self.manifest is None or self.inotify is None:
+            return True
+        import inotify_simple
+
+        # events are consumed here, the caller is expected to scan when dirty.
+        # other files such as representation pickles written into the directory are ignored
+        for event in self.inotify.read(timeout=0):
+            if (
+                event.mask & (inotify_simple.flags.ISDIR | inotify_simple.flags.Q_OVERFLOW)
+                or event.name == ""
+                or os.path.splitext(event.name)[1].lower() in IMAGE_EXTENSIONS
+            ):
+                return True
+        return False
+
+    def scan(self) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Scan the directory and compare it with the previous manifest
+        Returns:
+            result (tuple): added, removed and replaced image paths. Every image is
+                reported as added on the first scan.
+        """
+        if self.inotify is not None:
+            # watch first, so that changes made during the scan are seen by the next check
+            self.__watch()
+
+        previous = self.manifest or {}
+        current = scan_images(self.path)
+        self.manifest = current
+
+        added = [path for path in current if path not in previous]
+        removed = [path for path in previous if path not in current]
+        replaced = [
+            path for path, props in current.items() if path in previous and previous[path] != props
+        ]
+        return added, removed, replaced
+
+    def invalidate(self) -> None:
+        """
+        Forget the manifest, the next check scans the directory from scratch
+        """
+        self.manifest = None
+
+
 def find_image_hash(file_path: str) -> str:
     """
     Find the hash of given image file with its properties
@@ -128,7 +271,7 @@ def load_image_from_base64(uri: str) -> np.ndarray:
         if file_type not in ["jpeg", "png"]:
             raise ValueError(f"input image can be jpg or png, but it is {file_type}")
 
-    nparr = np.fromstring(decoded_bytes, np.uint8)
+    nparr = np.frombuffer(decoded_bytes, np.uint8)
     img_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
     # img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
     return img_bgr
@@ -0,0 +1,282 @@
+# built-in dependencies
+import itertools
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# 3rd party dependencies
+import numpy as np
+
+# values are recorded in microseconds with 2 significant digits (max relative error < 1%),
+# as in HdrHistogram: each power of two range is split into SUB_BUCKET_HALF_COUNT buckets
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF_COUNT = SUB_BUCKET_COUNT >> 1
+
+# longer values are clamped, a request never legitimately takes more than this
+MAX_TRACKABLE_US = 120 * 1000 * 1000
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# shards of each histogram, threads are spread over them so that they rarely share a lock
+SHARD_COUNT = 16
+
+
+def _bucket_index(value_us: int) -> int:
+    """
+    Find the histogram bucket of a value
+    Args:
+        value_us (int): non negative value in microseconds
+    Returns:
+        index (int): flat bucket index
+    """
+    shift = max(0, value_us.bit_length() - SUB_BUCKET_BITS)
+    return shift * SUB_BUCKET_HALF_COUNT + (value_us >> shift)
+
+
+def _bucket_upper_bound(index: int) -> int:
+    """
+    Find the highest value in microseconds a bucket holds
+    Args:
+        index (int): flat bucket index
+    Returns:
+        value_us (int): upper bound of the bucket
+    """
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_HALF_COUNT - 1
+    sub_bucket = index - shift * SUB_BUCKET_HALF_COUNT
+    return ((sub_bucket + 1) << shift) - 1
+
+
+BUCKET_COUNT = _bucket_index(MAX_TRACKABLE_US) + 1
+
+
+class _Shard:
+    """
+    Counts recorded by the threads assigned to a shard
+    """
+
+    __slots__ = ("counts", "total_us", "max_us", "count", "lock")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.total_us = 0
+        self.max_us = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+
+class LatencyHistogram:
+    """
+    Log-linear (HdrHistogram style) latency histogram with p50/p95/p99/max.
+    Threads record into one of SHARD_COUNT shards, each with its own lock, so that
+    concurrent records rarely contend. Readers merge the shards. Shards are created on
+    first use and never outnumber SHARD_COUNT, however many threads come and go.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Optional[_Shard]] = [None] * SHARD_COUNT
+        self._shards_lock = threading.Lock()
+        # round robin over the shards: thread idents are aligned addresses, a modulo of
+        # them would pile threads up on a few shards
+        self._next_slot = itertools.count()
+
+    def _shard(self) -> _Shard:
+        slot = getattr(self._local, "slot", None)
+        if slot is None:
+            slot = next(self._next_slot) % SHARD_COUNT
+            self._local.slot = slot
+        shard = self._shards[slot]
+        if shard is None:
+            with self._shards_lock:
+                shard = self._shards[slot]
+                if shard is None:
+                    shard = _Shard()
+                    self._shards[slot] = shard
+        return shard
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        """
+        Record a latency
+        Args:
+            seconds (float): measured latency
+            count (int): number of times to record it, e.g. the average latency
+                of each item of a batch
+        """
+        value_us = min(max(int(seconds * 1_000_000), 0), MAX_TRACKABLE_US)
+        shard = self._shard()
+        with shard.lock:
+            shard.counts[_bucket_index(value_us)] += count
+            shard.total_us += value_us * count
+            shard.count += count
+            if value_us > shard.max_us:
+                shard.max_us = value_us
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """
+        Record the duration of the enclosed block
+        """
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - tic)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Merge the shards
+        Returns:
+            snapshot (dict): counts (np.ndarray of each bucket), count, sum_us and max_us
+        """
+        counts = np.zeros(BUCKET_COUNT, dtype=np.int64)
+        total_us = max_us = count = 0
+        for shard in self._shards:
+            if shard is None:
+                continue
+            with shard.lock:
+                counts += np.asarray(shard.counts, dtype=np.int64)
+                total_us += shard.total_us
+                count += shard.count
+                max_us = max(max_us, shard.max_us)
+        return {"counts": counts, "count": count, "sum_us": total_us, "max_us": max_us}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            stats (dict): count, mean_ms, p50_ms, p95_ms, p99_ms and max_ms
+        """
+        snapshot = self.snapshot()
+        count = snapshot["count"]
+        stats: Dict[str, Any] = {"count": count}
+        stats["mean_ms"] = round(snapshot["sum_us"] / count / 1000, 3) if count > 0 else 0.0
+        for quantile, value_us in zip(QUANTILES, quantiles(snapshot, QUANTILES)):
+            stats[f"p{int(quantile * 100)}_ms"] = round(value_us / 1000, 3)
+        stats["max_ms"] = round(snapshot["max_us"] / 1000, 3)
+        return stats
+
+
+def quantiles(snapshot: Dict[str, Any], targets: tuple) -> List[int]:
+    """
+    Find quantiles of a histogram snapshot
+    Args:
+        snapshot (dict): see LatencyHistogram.snapshot
+        targets (tuple): quantiles between 0 and 1
+    Returns:
+        values_us (list): upper bound of the bucket holding each quantile, in microseconds.
+            Never above the max recorded value.
+    """
+    count = snapshot["count"]
+    if count == 0:
+        return [0 for _ in targets]
+    cumulative = np.cumsum(snapshot["counts"])
+    values = []
+    for target in targets:
+        rank = max(1, int(np.ceil(target * count)))
+        index = int(np.searchsorted(cumulative, rank))
+        values.append(min(_bucket_upper_bound(index), snapshot["max_us"]))
+    return values
+
+
+class LatencyRegistry:
+    """
+    Named latency histograms, created on first use
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name: str, seconds: float, count: int = 1) -> None:
+        """
+        Record a latency of a named histogram
+        Args:
+            name (str): histogram name
+            seconds (float): measured latency
+            count (int): number of times to record it
+        """
+        self.histogram(name).record(seconds, count)
+
+    def time(self, name: str):
+        """
+        Record the duration of the enclosed block into a named histogram
+        Args:
+            name (str): histogram name
+        """
+        return self.histogram(name).time()
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._histograms.keys())
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            stats (dict): stats of each histogram, see LatencyHistogram.get_stats
+        """
+        return {name: self.histogram(name).get_stats() for name in self.names()}
+
+
+def to_prometheus(
+    registry: LatencyRegistry,
+    metric: str,
+    label: str,
+    help_text: str,
+    extra_labels: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    Render the histograms of a registry in Prometheus text exposition format
+        as a summary with p50/p95/p99 quantiles plus a max gauge
+    Args:
+        registry (LatencyRegistry): histograms to render
+        metric (str): metric name, such as facial_stage_latency_seconds
+        label (str): label holding the histogram name, such as stage
+        help_text (str): HELP line of the metric
+        extra_labels (dict): constant labels added to every sample
+    Returns:
+        text (str): exposition lines ending with a new line
+    """
+    lines = [
+        f"# HELP {metric} {help_text}",
+        f"# TYPE {metric} summary",
+    ]
+    max_lines = [
+        f"# HELP {metric}_max Max of {metric}",
+        f"# TYPE {metric}_max gauge",
+    ]
+    for name in registry.names():
+        snapshot = registry.histogram(name).snapshot()
+        labels = {**(extra_labels or {}), label: name}
+        for quantile, value_us in zip(QUANTILES, quantiles(snapshot, QUANTILES)):
+            lines.append(
+                f"{metric}{_labels({**labels, 'quantile': str(quantile)})} {value_us / 1e6:.6f}"
+            )
+        lines.append(f"{metric}_sum{_labels(labels)} {snapshot['sum_us'] / 1e6:.6f}")
+        lines.append(f"{metric}_count{_labels(labels)} {snapshot['count']}")
+        max_lines.append(f"{metric}_max{_labels(labels)} {snapshot['max_us'] / 1e6:.6f}")
+    return "\n".join(lines + max_lines) + "\n"
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    """
+    Render labels as {key="value",...} escaping backslashes, quotes and new lines
+    """
+    items = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        items.append(f'{key}="{value}"')
+    return "{" + ",".join(items) + "}"
+
+
+# latency of pipeline stages: decode, detection, alignment, embedding, redis and distance
+stage_latency = LatencyRegistry()
@@ -1,44 +1,67 @@
 import os
+import sys
+import json
+import queue
 import logging
-from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+
+# deepface messages are sent to this standard library logger. Until the application
+# configures its own sink with setup_async_logging, they are printed to stdout as before.
+LOGGER_NAME = "deepface"
+
+# set by setup_async_logging, loggers created afterwards must not print by themselves
+sink_configured = False
+
 
 # pylint: disable=broad-except
 class Logger:
     def __init__(self, module=None):
         self.module = module
         log_level = os.environ.get("DEEPFACE_LOG_LEVEL", str(logging.INFO))
+        self._logger = logging.getLogger(LOGGER_NAME)
+        if not sink_configured and not self._logger.handlers:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(
+                logging.Formatter("%(asctime)s - %(message)s", datefmt="%y-%m-%d %H:%M:%S")
+            )
+            self._logger.addHandler(handler)
+            self._logger.propagate = False
         try:
             self.log_level = int(log_level)
         except Exception as err:
+            self.log_level = logging.INFO
             self.dump_log(
                 f"Exception while parsing $DEEPFACE_LOG_LEVEL."
                 f"Expected int but it is {log_level} ({str(err)})."
                 "Setting app log level to info."
             )
-            self.log_level = logging.INFO
+        self._logger.setLevel(self.log_level)
 
-    def info(self, message):
+    # messages are formatted lazily: logger.info("found %s faces", n) builds the string
+    # only if the record is emitted, and in the logging thread with setup_async_logging
+    def info(self, message, *args):
         if self.log_level <= logging.INFO:
-            self.dump_log(f"{message}")
+            self._logger.info(message, *args)
 
-    def debug(self, message):
+    def debug(self, message, *args):
         if self.log_level <= logging.DEBUG:
-            self.dump_log(f"🕷️ {message}")
+            self._logger.debug(f"🕷️ {message}", *args)
 
-    def warn(self, message):
+    def warn(self, message, *args):
         if self.log_level <= logging.WARNING:
-            self.dump_log(f"⚠️ {message}")
+            self._logger.warning(f"⚠️ {message}", *args)
 
-    def error(self, message):
+    def error(self, message, *args):
         if self.log_level <= logging.ERROR:
-            self.dump_log(f"🔴 {message}")
+            self._logger.error(f"🔴 {message}", *args)
 
-    def critical(self, message):
+    def critical(self, message, *args):
         if self.log_level <= logging.CRITICAL:
-            self.dump_log(f"💥 {message}")
+            self._logger.critical(f"💥 {message}", *args)
 
     def dump_log(self, message):
-        print(f"{str(datetime.now())[2:-7]} - {message}")
+        self._logger.log(max(self.log_level, logging.INFO), message)
 
 
 def get_singletonish_logger():
@@ -52,3 +75,142 @@ def get_singletonish_logger():
         model_obj["logger"] = Logger(module="Singleton")
 
     return model_obj["logger"]
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks the calling thread.
+        Records are enqueued unformatted, the listener thread merges their arguments.
+        If the queue is full, the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # render the traceback now, its frames may change once the caller returns
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep the first and then every n-th record of each message template at or below
+        max_level. Warnings and errors always pass.
+    """
+
+    def __init__(self, every: int = 10, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.every = max(1, every)
+        self.max_level = max_level
+        self.counts: Dict[Tuple[str, Any], int] = {}
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno > self.max_level:
+            return True
+        key = (record.name, record.msg)
+        # not locked: a lost increment under contention only shifts the sampling phase
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        if count % self.every == 0:
+            record.sampled_every = self.every
+            return True
+        self.suppressed += 1
+        return False
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line, with extra record attributes as fields
+    """
+
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_async_logging(
+    level: int = logging.INFO,
+    structured: bool = False,
+    sample_every: int = 10,
+    queue_size: int = 10000,
+    fmt: str = "%(asctime)s - [%(threadName)s] - %(name)s - %(levelname)s - %(message)s",
+    stream: Optional[Any] = None,
+) -> QueueListener:
+    """
+    Send every record of the process, deepface's included, through a bounded queue
+        to a single listener thread writing to stream. Request threads only enqueue.
+    Args:
+        level (int): root log level
+        structured (bool): write JSON lines instead of fmt
+        sample_every (int): keep 1 of each sample_every debug records with the same template
+        queue_size (int): max records waiting to be written, newer ones are dropped
+        fmt (str): text format of records if not structured
+        stream (Any): output stream, stdout by default
+    Returns:
+        listener (QueueListener): started listener, stop it to flush pending records
+    """
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(StructuredFormatter() if structured else logging.Formatter(fmt))
+
+    queue_handler = AsyncQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(SamplingFilter(every=sample_every))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # deepface records go to the same sink instead of their own stdout handler
+    deepface_logger = logging.getLogger(LOGGER_NAME)
+    for existing in list(deepface_logger.handlers):
+        deepface_logger.removeHandler(existing)
+    deepface_logger.propagate = True
+
+    global sink_configured
+    sink_configured = True
+
+    listener = QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def get_async_stats() -> Dict[str, int]:
+    """
+    Returns:
+        stats (dict): records dropped because the queue was full, records suppressed
+            by sampling and records waiting in the queue
+    """
+    stats = {"dropped": 0, "sampled_out": 0, "queued": 0}
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, AsyncQueueHandler):
+            stats["dropped"] += handler.dropped
+            stats["queued"] += handler.queue.qsize()
+            for log_filter in handler.filters:
+                if isinstance(log_filter, SamplingFilter):
+                    stats["sampled_out"] += log_filter.suppressed
+    return stats
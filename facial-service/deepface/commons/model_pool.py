@@ -0,0 +1,377 @@
+# built-in dependencies
+import os
+import time
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# project dependencies
+from deepface.commons import logger as log
+
+logger = log.get_singletonish_logger()
+
+
+def read_rss_bytes() -> int:
+    """
+    Read the resident set size of this process without psutil
+    Returns:
+        rss (int): resident bytes, 0 if /proc is not available
+    """
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def estimate_model_bytes(client: Any) -> Optional[int]:
+    """
+    Estimate the memory held by the weights of a built model client
+    Args:
+        client (Any): model client whose `model` attribute is a keras model
+    Returns:
+        nbytes (int): bytes of its float32 parameters, None if unknown
+    """
+    count_params = getattr(getattr(client, "model", None), "count_params", None)
+    if not callable(count_params):
+        return None
+    try:
+        return int(count_params()) * 4
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+class ModelUnloadedError(RuntimeError):
+    """A model was dropped from the pool and reload on demand is disabled"""
+
+
+class _Entry:
+    __slots__ = ("model", "nbytes", "refs", "last_used", "loaded_at", "build_ms", "lock", "dropped")
+
+    def __init__(self, model: Any, nbytes: int, build_ms: float):
+        self.model = model
+        self.nbytes = nbytes
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.loaded_at = self.last_used
+        self.build_ms = build_ms
+        # guards refs and dropped: holding a model never waits on the pool lock
+        self.lock = threading.Lock()
+        self.dropped = False
+
+    def hold(self) -> bool:
+        """Take a reference, False if the entry was dropped in the meantime"""
+        with self.lock:
+            if self.dropped:
+                return False
+            self.refs += 1
+            self.last_used = time.monotonic()
+            return True
+
+
+class ModelPool:
+    """
+    Thread safe pool of built models with a memory budget.
+    Models are built on first use, once: concurrent callers of a model that is being built
+    wait on the same future instead of building it again. Lookups of built models take no
+    lock. When the pool goes over its budget, or a model stays idle for idle_seconds, the
+    least recently used models that nobody holds are dropped. A model held with
+    acquire / use is never dropped. Dropped models are built again on next use unless
+    reload is disabled.
+    """
+
+    def __init__(self, budget_mb: float = 0, idle_seconds: float = 0, reload: bool = True):
+        """
+        Args:
+            budget_mb (float): max memory of the built models in MB, 0 for no limit
+            idle_seconds (float): drop models unused for this long, 0 to keep them
+            reload (bool): build a dropped model again on next use, otherwise raise
+                ModelUnloadedError
+        """
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.idle_seconds = idle_seconds
+        self.reload = reload
+        # replaced, never mutated while readers may hold it: lookups read it without the lock
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._building: Dict[Hashable, Future] = {}
+        self._unloaded: set = set()
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self.memory_bytes_total = 0
+        self.loads = 0
+        self.shared_builds = 0
+        self.build_errors = 0
+        self.evictions = 0
+        self.unloads = 0
+        self.over_budget = 0
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Get a built model, building it if it is not in the pool
+            the model is not held, so a later eviction may drop it from the pool
+        Args:
+            key (Hashable): model key
+            factory (Callable): builds the model when it is missing
+        Returns:
+            model (Any): built model
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.last_used = time.monotonic()
+            return entry.model
+        return self._build(key, factory).model
+
+    def acquire(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Get a built model and hold it until release, a held model is never dropped
+        Args:
+            key (Hashable): model key
+            factory (Callable): builds the model when it is missing
+        Returns:
+            model (Any): built model
+        """
+        while True:
+            entry = self._entries.get(key) or self._build(key, factory)
+            if entry.hold():
+                return entry.model
+            # dropped between the lookup and the hold: look it up again
+
+    def release(self, key: Hashable) -> None:
+        """
+        Release a model held with acquire
+        Args:
+            key (Hashable): model key
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        with entry.lock:
+            entry.refs = max(0, entry.refs - 1)
+            entry.last_used = time.monotonic()
+            idle = entry.refs == 0
+        if idle and 0 < self.budget_bytes < self.memory_bytes_total:
+            # drops deferred while the model was held
+            with self._lock:
+                self._evict(protect=None)
+
+    @contextmanager
+    def use(self, key: Hashable, factory: Callable[[], Any]):
+        """
+        `with pool.use(key, factory) as model: ...` holds the model during the block
+        """
+        model = self.acquire(key, factory)
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+    def put(self, key: Hashable, model: Any) -> None:
+        """
+        Register an already built model, replacing the one stored for the key
+        Args:
+            key (Hashable): model key
+            model (Any): built model
+        """
+        with self._lock:
+            self._insert(key, _Entry(model, estimate_model_bytes(model) or 0, 0.0))
+
+    def contains(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def unload(self, keys: List[Hashable]) -> List[Hashable]:
+        """
+        Drop models that nobody holds, they are built again on next use
+        Args:
+            keys (list): keys of the models to drop
+        Returns:
+            unloaded (list): keys of the models that were dropped
+        """
+        with self._lock:
+            unloaded = [key for key in keys if self._drop(key)]
+            self.unloads += len(unloaded)
+        if unloaded:
+            logger.debug(f"unloaded models {unloaded}")
+        return unloaded
+
+    def unload_idle(
+        self, idle_seconds: Optional[float] = None, keys: Optional[List[Hashable]] = None
+    ) -> List[Hashable]:
+        """
+        Drop the models that nobody held for a while
+        Args:
+            idle_seconds (float): min idle time, idle_seconds of the pool by default
+            keys (list): only consider these models, all of them by default
+        Returns:
+            unloaded (list): keys of the models that were dropped
+        """
+        idle_seconds = self.idle_seconds if idle_seconds is None else idle_seconds
+        now = time.monotonic()
+        idle = [
+            key
+            for key, entry in self._entries.items()
+            if (keys is None or key in keys)
+            and entry.refs == 0
+            and now - entry.last_used >= idle_seconds
+        ]
+        return self.unload(idle)
+
+    def start_reaper(self, interval: Optional[float] = None) -> None:
+        """
+        Start a daemon thread that drops idle models, a no-op when idle_seconds is 0
+        Args:
+            interval (float): seconds between sweeps, a quarter of idle_seconds by default
+        """
+        if self.idle_seconds <= 0 or self._reaper is not None:
+            return
+        interval = interval or max(1.0, self.idle_seconds / 4)
+
+        def sweep():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.unload_idle()
+                except Exception as err:  # pylint: disable=broad-except
+                    logger.warn(f"model pool sweep failed: {err}")
+
+        self._reaper = threading.Thread(target=sweep, name="ModelPoolReaper", daemon=True)
+        self._reaper.start()
+
+    def memory_bytes(self) -> int:
+        return self.memory_bytes_total
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns:
+            stats (dict): budget, memory in use, build and eviction counts and, for each
+                built model, its bytes, holders, idle seconds and build time
+        """
+        now = time.monotonic()
+        with self._lock:
+            models = {
+                "/".join(key) if isinstance(key, tuple) else str(key): {
+                    "bytes": entry.nbytes,
+                    "refs": entry.refs,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    "age_seconds": round(now - entry.loaded_at, 1),
+                    "build_ms": round(entry.build_ms, 1),
+                }
+                for key, entry in self._entries.items()
+            }
+            return {
+                "budget_bytes": self.budget_bytes,
+                "memory_bytes": self.memory_bytes_total,
+                "idle_seconds": self.idle_seconds,
+                "reload": self.reload,
+                "building": len(self._building),
+                "loads": self.loads,
+                "shared_builds": self.shared_builds,
+                "build_errors": self.build_errors,
+                "evictions": self.evictions,
+                "unloads": self.unloads,
+                "over_budget": self.over_budget,
+                "models": models,
+            }
+
+    def _build(self, key: Hashable, factory: Callable[[], Any]) -> _Entry:
+        """Build the entry of a key once, concurrent callers wait for the same build"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+            pending = self._building.get(key)
+            if pending is None:
+                if key in self._unloaded and not self.reload:
+                    raise ModelUnloadedError(f"model {key} was unloaded and reload is disabled")
+                future: Future = Future()
+                self._building[key] = future
+                # drop idle models before building, so that their memory can be reused
+                if self.idle_seconds > 0:
+                    self._drop_idle(time.monotonic())
+            else:
+                self.shared_builds += 1
+
+        if pending is not None:
+            # built by another caller, a failed build raises here too
+            return pending.result()
+
+        try:
+            rss_before = read_rss_bytes()
+            tic = time.perf_counter()
+            model = factory()
+            build_ms = (time.perf_counter() - tic) * 1000
+            nbytes = estimate_model_bytes(model)
+            if nbytes is None:
+                # not a keras model (e.g. opencv or dlib detectors): what the process grew by
+                nbytes = max(0, read_rss_bytes() - rss_before)
+        except BaseException as err:
+            with self._lock:
+                del self._building[key]
+                self.build_errors += 1
+            # waiters get the error, the next call builds again
+            future.set_exception(err)
+            raise
+
+        entry = _Entry(model, nbytes, build_ms)
+        with self._lock:
+            self._insert(key, entry)
+            del self._building[key]
+            self.loads += 1
+            self._evict(protect=key)
+        future.set_result(entry)
+        return entry
+
+    def _insert(self, key: Hashable, entry: _Entry) -> None:
+        """Publish an entry (call with the lock held)"""
+        entries = dict(self._entries)
+        previous = entries.get(key)
+        entries[key] = entry
+        self._entries = entries
+        self.memory_bytes_total += entry.nbytes - (previous.nbytes if previous else 0)
+        self._unloaded.discard(key)
+
+    def _evict(self, protect: Optional[Hashable]) -> None:
+        """Drop least recently used idle models until the pool fits its budget (lock held)"""
+        if self.budget_bytes <= 0 or self.memory_bytes_total <= self.budget_bytes:
+            return
+        lru = sorted(self._entries.items(), key=lambda item: item[1].last_used)
+        for key, _ in lru:
+            if self.memory_bytes_total <= self.budget_bytes:
+                return
+            if key == protect or not self._drop(key):
+                continue
+            self.evictions += 1
+            logger.debug(f"evicted model {key} to fit the budget of {self.budget_bytes} bytes")
+        if self.memory_bytes_total > self.budget_bytes:
+            # every other model is held: go over budget rather than fail the request
+            self.over_budget += 1
+
+    def _drop_idle(self, now: float) -> None:
+        for key, entry in list(self._entries.items()):
+            if entry.refs == 0 and now - entry.last_used >= self.idle_seconds:
+                self.unloads += self._drop(key)
+
+    def _drop(self, key: Hashable) -> bool:
+        """Unpublish an entry nobody holds (call with the lock held)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        with entry.lock:
+            if entry.refs > 0:
+                return False
+            # a lookup that already found it retries instead of holding a dropped model
+            entry.dropped = True
+        entries = dict(self._entries)
+        del entries[key]
+        self._entries = entries
+        self.memory_bytes_total -= entry.nbytes
+        self._unloaded.add(key)
+        return True
+
+
+# models and detectors built by deepface, keyed by (kind, name)
+model_pool = ModelPool(
+    budget_mb=float(os.getenv("DEEPFACE_MODEL_BUDGET_MB", "0")),
+    idle_seconds=float(os.getenv("DEEPFACE_MODEL_IDLE_SECONDS", "0")),
+    reload=os.getenv("DEEPFACE_MODEL_RELOAD", "true").lower() in ("1", "true", "yes"),
+)
@@ -0,0 +1,39 @@
+# built-in dependencies
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List
+
+# long lived helper threads shared by every call. models kept per thread, such as the
+# opencv cascades, are built once per helper instead of once per call
+HELPER_THREADS = int(os.getenv("DEEPFACE_HELPER_THREADS", str(min(4, os.cpu_count() or 1))))
+
+helper_executor = ThreadPoolExecutor(
+    max_workers=max(1, HELPER_THREADS), thread_name_prefix="deepface-helper"
+)
+
+
+def map_with_helpers(fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+    """
+    Apply a function to many items in the calling thread and the shared helper threads
+        the caller runs the first item, and then every item no helper has started yet,
+        so a busy pool never makes the call slower than a plain loop
+    Args:
+        fn (Callable): function of a single item
+        items (Iterable): items to apply it to
+    Returns:
+        results (list): result of each item in the same order with items
+    """
+    items = list(items)
+    if len(items) < 2:
+        return [fn(item) for item in items]
+
+    futures: List[Future] = [helper_executor.submit(fn, item) for item in items[1:]]
+    try:
+        results = [fn(items[0])]
+        for item, future in zip(items[1:], futures):
+            results.append(fn(item) if future.cancel() else future.result())
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return results
@@ -1,4 +1,8 @@
-from typing import Any, List, Tuple
+import os
+import time
+import threading
+from contextlib import ExitStack
+from typing import Any, Dict, List, Tuple
 import numpy as np
 import cv2
 from deepface.modules import detection
@@ -16,9 +20,26 @@ from deepface.detectors import (
     CenterFace,
 )
 from deepface.commons import logger as log
+from deepface.commons.cache_utils import detection_cache, image_digest
+from deepface.commons.latency_utils import stage_latency
+from deepface.commons.model_pool import model_pool
 
 logger = log.get_singletonish_logger()
 
+# separator of detector cascades such as "opencv>retinaface"
+CASCADE_SEPARATOR = ">"
+
+# a cascade stage other than the last one accepts an image only if its most confident
+# facial area reaches this score, otherwise the image falls through to the next stage
+CASCADE_MIN_CONFIDENCE = float(os.getenv("DEEPFACE_CASCADE_MIN_CONFIDENCE", "0"))
+
+# per cascade and stage: images received and images accepted
+cascade_stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+cascade_stats_lock = threading.Lock()
+
+# constructor arguments of each detector backend, set with configure
+detector_options: Dict[str, Dict[str, Any]] = {}
+
 
 def build_model(detector_backend: str) -> Any:
     """
@@ -28,8 +49,26 @@ def build_model(detector_backend: str) -> Any:
     Returns:
         built detector (Any)
     """
-    global face_detector_obj  # singleton design pattern
+    # built detectors live in the shared pool, which may drop them under its memory budget
+    return model_pool.get(("detector", detector_backend), lambda: __build(detector_backend))
+
+
+def configure(detector_backend: str, **options: Any) -> None:
+    """
+    Set the constructor arguments of a detector backend
+        the detector is built with them from now on, also when the pool rebuilds it.
+        a detector already built with other arguments is dropped from the pool.
+    Args:
+        detector_backend (str): backend detector name
+        options: keyword arguments of the detector class, e.g. fast_mode=True for opencv
+    """
+    if detector_options.get(detector_backend) == options:
+        return
+    detector_options[detector_backend] = options
+    model_pool.unload([("detector", detector_backend)])
+
 
+def __build(detector_backend: str) -> Any:
     backends = {
         "opencv": OpenCv.OpenCvClient,
         "mtcnn": MtCnn.MtCnnClient,
@@ -43,20 +82,114 @@ def build_model(detector_backend: str) -> Any:
         "centerface": CenterFace.CenterFaceClient,
     }
 
-    if not "face_detector_obj" in globals():
-        face_detector_obj = {}
+    face_detector = backends.get(detector_backend)
+    if face_detector is None:
+        raise ValueError("invalid detector_backend passed - " + detector_backend)
+    return face_detector(**detector_options.get(detector_backend, {}))
 
-    built_models = list(face_detector_obj.keys())
-    if detector_backend not in built_models:
-        face_detector = backends.get(detector_backend)
 
-        if face_detector:
-            face_detector = face_detector()
-            face_detector_obj[detector_backend] = face_detector
-        else:
-            raise ValueError("invalid detector_backend passed - " + detector_backend)
+def is_cascade(detector_backend: str) -> bool:
+    """
+    Check a detector backend is a cascade such as "opencv>retinaface"
+    Args:
+        detector_backend (str): detector name
+    Returns:
+        result (bool)
+    """
+    return CASCADE_SEPARATOR in detector_backend
 
-    return face_detector_obj[detector_backend]
+
+def get_cascade_stats() -> Dict[str, Any]:
+    """
+    Get per stage hit rates of detector cascades used so far
+    Returns:
+        stats (dict): for each cascade, the images received and accepted by each stage
+            and the ratio of images accepted by the stage
+    """
+    with cascade_stats_lock:
+        return {
+            cascade: {
+                stage: {
+                    **counts,
+                    "hit_rate": round(counts["accepted"] / counts["received"], 4)
+                    if counts["received"] > 0
+                    else 0.0,
+                }
+                for stage, counts in stages.items()
+            }
+            for cascade, stages in cascade_stats.items()
+        }
+
+
+def __detect_facial_areas(
+    detector_backend: str, imgs: List[np.ndarray]
+) -> List[List[FacialAreaRegion]]:
+    """
+    Find facial areas of many images with a detector or a detector cascade
+        a cascade runs its cheap stages first and only sends the images they miss
+        (no face, or best confidence under DEEPFACE_CASCADE_MIN_CONFIDENCE) to the next
+        stage. the last stage's result is always accepted.
+    Args:
+        detector_backend (str): detector name, or stages separated by ">"
+        imgs (List[np.ndarray]): pre-loaded images
+    Returns:
+        results (List[List[FacialAreaRegion]]): facial areas of each image
+    """
+    stages = detector_backend.split(CASCADE_SEPARATOR)
+    with ExitStack() as stack:
+        # build and hold every stage first, so that an invalid name fails before any
+        # detection and the model pool cannot drop a stage midway
+        face_detectors: List[Detector] = [
+            stack.enter_context(model_pool.use(("detector", stage), lambda stage=stage: __build(stage)))
+            for stage in stages
+        ]
+        if len(stages) == 1:
+            return face_detectors[0].detect_faces_batch(imgs)
+        return __run_cascade(detector_backend, stages, face_detectors, imgs)
+
+
+def __run_cascade(
+    detector_backend: str, stages: List[str], face_detectors: List[Detector], imgs: List[np.ndarray]
+) -> List[List[FacialAreaRegion]]:
+    """
+    Run the stages of a detector cascade, each one on the images the previous ones missed
+    Args:
+        detector_backend (str): cascade name such as "opencv>retinaface"
+        stages (List[str]): detector name of each stage
+        face_detectors (List[Detector]): built detector of each stage
+        imgs (List[np.ndarray]): pre-loaded images
+    Returns:
+        results (List[List[FacialAreaRegion]]): facial areas of each image
+    """
+    results: List[Any] = [None] * len(imgs)
+    pending = list(range(len(imgs)))
+    for stage_idx, (stage, face_detector) in enumerate(zip(stages, face_detectors)):
+        if len(pending) == 0:
+            break
+        is_last = stage_idx == len(stages) - 1
+
+        facial_areas_batch = face_detector.detect_faces_batch([imgs[idx] for idx in pending])
+
+        missed = []
+        for idx, facial_areas in zip(pending, facial_areas_batch):
+            confidences = [facial_area.confidence or 0 for facial_area in facial_areas]
+            if is_last or (
+                len(confidences) > 0 and max(confidences) >= CASCADE_MIN_CONFIDENCE
+            ):
+                results[idx] = facial_areas
+            else:
+                missed.append(idx)
+
+        with cascade_stats_lock:
+            counts = cascade_stats.setdefault(detector_backend, {}).setdefault(
+                stage, {"received": 0, "accepted": 0}
+            )
+            counts["received"] += len(pending)
+            counts["accepted"] += len(pending) - len(missed)
+
+        pending = missed
+
+    return results
 
 
 def detect_faces(
@@ -65,7 +198,7 @@ def detect_faces(
     """
     Detect face(s) from a given image
     Args:
-        detector_backend (str): detector name
+        detector_backend (str): detector name, or a cascade of detectors such as "opencv>retinaface"
 
         img (np.ndarray): pre-loaded image
 
@@ -85,10 +218,35 @@ def detect_faces(
 
         - confidence (float): The confidence score associated with the detected face.
     """
-    height, width, _ = img.shape
+    return detect_faces_batch(
+        detector_backend=detector_backend,
+        imgs=[img],
+        align=align,
+        expand_percentage=expand_percentage,
+    )[0]
+
+
+def detect_faces_batch(
+    detector_backend: str,
+    imgs: List[np.ndarray],
+    align: bool = True,
+    expand_percentage: int = 0,
+) -> List[List[DetectedFace]]:
+    """
+    Detect face(s) from many images with a single detector call
+    Args:
+        detector_backend (str): detector name, or a cascade of detectors such as "opencv>retinaface"
+
+        imgs (List[np.ndarray]): pre-loaded images
+
+        align (bool): enable or disable alignment after detection
 
-    face_detector: Detector = build_model(detector_backend)
+        expand_percentage (int): expand detected facial area with a percentage (default is 0).
 
+    Returns:
+        results (List[List[DetectedFace]]): DetectedFace objects of each image
+            in the same order with imgs. See detect_faces for the fields.
+    """
     # validate expand percentage score
     if expand_percentage < 0:
         logger.warn(
@@ -99,22 +257,85 @@ def detect_faces(
 
     # If faces are close to the upper boundary, alignment move them outside
     # Add a black border around an image to avoid this.
-    height_border = int(0.5 * height)
-    width_border = int(0.5 * width)
-    if align is True:
-        img = cv2.copyMakeBorder(
-            img,
-            height_border,
-            height_border,
-            width_border,
-            width_border,
-            cv2.BORDER_CONSTANT,
-            value=[0, 0, 0],  # Color of the border (black)
+    borders = []
+    bordered_imgs = []
+    for img in imgs:
+        height, width, _ = img.shape
+        height_border = int(0.5 * height)
+        width_border = int(0.5 * width)
+        if align is True:
+            img = cv2.copyMakeBorder(
+                img,
+                height_border,
+                height_border,
+                width_border,
+                width_border,
+                cv2.BORDER_CONSTANT,
+                value=[0, 0, 0],  # Color of the border (black)
+            )
+        borders.append((height_border, width_border))
+        bordered_imgs.append(img)
+
+    # find facial areas of given images. resubmitted images (retries, same photo in
+    # register and verify) reuse the facial areas of their previous detection
+    facial_areas_batch: List[Any] = [None] * len(imgs)
+    keys = [None] * len(imgs)
+    if detection_cache.enabled:
+        for idx, img in enumerate(imgs):
+            keys[idx] = (image_digest(img), detector_backend, align, expand_percentage)
+            facial_areas_batch[idx] = detection_cache.get(keys[idx])
+
+    missing = [idx for idx, facial_areas in enumerate(facial_areas_batch) if facial_areas is None]
+    if len(missing) > 0:
+        tic = time.time()
+        detected = __detect_facial_areas(
+            detector_backend, [bordered_imgs[idx] for idx in missing]
         )
+        cost_ms = (time.time() - tic) * 1000 / len(missing)
+        stage_latency.record("detection", cost_ms / 1000, count=len(missing))
+        for idx, facial_areas in zip(missing, detected):
+            facial_areas_batch[idx] = facial_areas
+            if keys[idx] is not None:
+                detection_cache.put(keys[idx], facial_areas, cost_ms)
+
+    results = []
+    for img, facial_areas, (height_border, width_border) in zip(
+        bordered_imgs, facial_areas_batch, borders
+    ):
+        with stage_latency.time("alignment"):
+            results.append(
+                __extract_detected_faces(
+                    img=img,
+                    facial_areas=facial_areas,
+                    align=align,
+                    expand_percentage=expand_percentage,
+                    height_border=height_border,
+                    width_border=width_border,
+                )
+            )
+    return results
 
-    # find facial areas of given image
-    facial_areas = face_detector.detect_faces(img)
 
+def __extract_detected_faces(
+    img: np.ndarray,
+    facial_areas: List[FacialAreaRegion],
+    align: bool,
+    expand_percentage: int,
+    height_border: int,
+    width_border: int,
+) -> List[DetectedFace]:
+    """
+    Crop (and align) detected facial areas of an image
+    Args:
+        img (np.ndarray): pre-loaded image, with black borders if align is True
+        facial_areas (List[FacialAreaRegion]): facial areas found by the detector
+        align (bool): enable or disable alignment after detection
+        expand_percentage (int): expand detected facial area with a percentage
+        height_border (int): border added to top and bottom of the image
+        width_border (int): border added to left and right of the image
+    Returns:
+        results (List[DetectedFace]): A list of DetectedFace objects
+    """
     results = []
     for facial_area in facial_areas:
         x = facial_area.x
@@ -11,6 +11,9 @@ logger = log.get_singletonish_logger()
 
 
 class DlibClient(Detector):
+    # dlib detectors are not thread safe, batches are detected sequentially
+    batch_workers = 1
+
     def __init__(self):
         self.model = self.build_model()
 
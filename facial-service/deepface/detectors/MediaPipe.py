@@ -6,6 +6,9 @@ from deepface.models.Detector import Detector, FacialAreaRegion
 
 
 class MediaPipeClient(Detector):
+    # mediapipe graphs are not thread safe, batches are detected sequentially
+    batch_workers = 1
+
     def __init__(self):
         self.model = self.build_model()
 
@@ -1,5 +1,6 @@
 import os
-from typing import Any, List
+import threading
+from typing import Any, List, Optional
 import cv2
 import numpy as np
 from deepface.models.Detector import Detector, FacialAreaRegion
@@ -10,8 +11,33 @@ class OpenCvClient(Detector):
     Class to cover common face detection functionalitiy for OpenCv backend
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        fast_mode: Optional[bool] = None,
+        scan_width: Optional[int] = None,
+        min_face_size: Optional[int] = None,
+    ):
+        """
+        Args:
+            fast_mode (bool): scan a grayscale, downscaled copy of the image and search eyes
+                in the upper part of each face only. Defaults to DEEPFACE_OPENCV_FAST_MODE.
+            scan_width (int): max width of the image scanned by the face cascade in fast mode.
+                Defaults to DEEPFACE_OPENCV_SCAN_WIDTH or 320.
+            min_face_size (int): smallest face in pixels of the original image searched in
+                fast mode. Defaults to DEEPFACE_OPENCV_MIN_FACE_SIZE or 60.
+        """
+        if fast_mode is None:
+            fast_mode = os.getenv("DEEPFACE_OPENCV_FAST_MODE", "0").lower() in ("1", "true", "yes")
+        self.fast_mode = fast_mode
+        self.scan_width = scan_width or int(os.getenv("DEEPFACE_OPENCV_SCAN_WIDTH", "320"))
+        self.min_face_size = min_face_size or int(
+            os.getenv("DEEPFACE_OPENCV_MIN_FACE_SIZE", "60")
+        )
         self.model = self.build_model()
+        # cascade classifiers keep scanning state internally, so they cannot be shared
+        # across threads. every other thread lazily builds its own copy.
+        self._local = threading.local()
+        self._local.model = self.model
 
     def build_model(self):
         """
@@ -24,6 +50,18 @@ class OpenCvClient(Detector):
         detector["eye_detector"] = self.__build_cascade("haarcascade_eye")
         return detector
 
+    def thread_model(self) -> dict:
+        """
+        Get face and eye detector models owned by the calling thread
+        Returns:
+            model (dict): including face_detector and eye_detector keys
+        """
+        model = getattr(self._local, "model", None)
+        if model is None:
+            model = self.build_model()
+            self._local.model = model
+        return model
+
     def detect_faces(self, img: np.ndarray) -> List[FacialAreaRegion]:
         """
         Detect and align face with opencv
@@ -34,6 +72,9 @@ class OpenCvClient(Detector):
         Returns:
             results (List[FacialAreaRegion]): A list of FacialAreaRegion objects
         """
+        if self.fast_mode is True:
+            return self.__detect_faces_fast(img)
+
         resp = []
 
         detected_face = None
@@ -43,7 +84,7 @@ class OpenCvClient(Detector):
             # faces = detector["face_detector"].detectMultiScale(img, 1.3, 5)
 
             # note that, by design, opencv's haarcascade scores are >0 but not capped at 1
-            faces, _, scores = self.model["face_detector"].detectMultiScale3(
+            faces, _, scores = self.thread_model()["face_detector"].detectMultiScale3(
                 img, 1.1, 10, outputRejectLevels=True
             )
         except:
@@ -74,6 +115,82 @@ class OpenCvClient(Detector):
 
         return resp
 
+    def __detect_faces_fast(self, img: np.ndarray) -> List[FacialAreaRegion]:
+        """
+        Detect faces on a grayscale, downscaled copy of the image and map them back
+
+        Args:
+            img (np.ndarray): pre-loaded image as numpy array
+
+        Returns:
+            results (List[FacialAreaRegion]): A list of FacialAreaRegion objects
+        """
+        resp = []
+
+        # convert once, both cascades work on gray scale images
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        # alignment pads the image with black borders, scan its content only
+        offset_x, offset_y, content_w, content_h = cv2.boundingRect(gray)
+        if content_w == 0 or content_h == 0:
+            return resp
+        content = gray[offset_y : offset_y + content_h, offset_x : offset_x + content_w]
+
+        scale = min(1.0, self.scan_width / content_w)
+        if scale < 1.0:
+            scan = cv2.resize(
+                content,
+                (max(1, round(content_w * scale)), max(1, round(content_h * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        else:
+            scan = content
+
+        # per axis ratios between the content and the scanned image
+        ratio_x = content_w / scan.shape[1]
+        ratio_y = content_h / scan.shape[0]
+        min_size = (
+            max(1, int(self.min_face_size / ratio_x)),
+            max(1, int(self.min_face_size / ratio_y)),
+        )
+
+        faces = []
+        try:
+            faces, _, scores = self.thread_model()["face_detector"].detectMultiScale3(
+                scan, 1.1, 10, minSize=min_size, outputRejectLevels=True
+            )
+        except:
+            pass
+
+        if len(faces) > 0:
+            for (scan_x, scan_y, scan_w, scan_h), confidence in zip(faces, scores):
+                x = offset_x + int(round(scan_x * ratio_x))
+                y = offset_y + int(round(scan_y * ratio_y))
+                w = int(round(scan_w * ratio_x))
+                h = int(round(scan_h * ratio_y))
+
+                # eyes lie in the upper half of the face. their boxes cross the middle line
+                # slightly, so the top 60% is scanned and the rest skipped
+                left_eye, right_eye = self.__find_eyes_gray(gray[y : y + h * 3 // 5, x : x + w])
+
+                if left_eye is not None:
+                    left_eye = (int(x + left_eye[0]), int(y + left_eye[1]))
+                if right_eye is not None:
+                    right_eye = (int(x + right_eye[0]), int(y + right_eye[1]))
+
+                facial_area = FacialAreaRegion(
+                    x=x,
+                    y=y,
+                    w=w,
+                    h=h,
+                    left_eye=left_eye,
+                    right_eye=right_eye,
+                    confidence=(100 - confidence) / 100,
+                )
+                resp.append(facial_area)
+
+        return resp
+
     def find_eyes(self, img: np.ndarray) -> tuple:
         """
         Find the left and right eye coordinates of given image
@@ -93,7 +210,23 @@ class OpenCvClient(Detector):
             img, cv2.COLOR_BGR2GRAY
         )  # eye detector expects gray scale image
 
-        eyes = self.model["eye_detector"].detectMultiScale(detected_face_gray, 1.1, 10)
+        return self.__find_eyes_gray(detected_face_gray)
+
+    def __find_eyes_gray(self, img: np.ndarray) -> tuple:
+        """
+        Find the left and right eye coordinates of given gray scale image
+        Args:
+            img (np.ndarray): given gray scale image
+        Returns:
+            left and right eye (tuple)
+        """
+        left_eye = None
+        right_eye = None
+
+        if img.shape[0] == 0 or img.shape[1] == 0:
+            return left_eye, right_eye
+
+        eyes = self.thread_model()["eye_detector"].detectMultiScale(img, 1.1, 10)
 
         # ----------------------------------------------------------------
 
@@ -1,8 +1,8 @@
-from typing import List
+from typing import List, Tuple
 import os
+import threading
 import gdown
 import cv2
-import pandas as pd
 import numpy as np
 from deepface.detectors import OpenCv
 from deepface.commons import folder_utils
@@ -14,9 +14,55 @@ logger = log.get_singletonish_logger()
 # pylint: disable=line-too-long, c-extension-no-member
 
 
+def scale_detections(
+    detections: np.ndarray, img_shape: Tuple[int, ...]
+) -> List[Tuple[int, int, int, int, float]]:
+    """
+    Filter raw ssd detections of an image and project their boxes onto the original image
+
+    Args:
+        detections (np.ndarray): detections of the image with shape (N, 7)
+        img_shape (tuple): shape of the original image
+
+    Returns:
+        boxes (List[Tuple[int, int, int, int, float]]): x, y, w, h and confidence of each face
+    """
+    target_size = (300, 300)
+
+    aspect_ratio_x = img_shape[1] / target_size[1]
+    aspect_ratio_y = img_shape[0] / target_size[0]
+
+    # columns: img_id, is_face, confidence, left, top, right, bottom
+    # is_face 0 means background, 1 means face
+    detections = detections[(detections[:, 1] == 1) & (detections[:, 2] >= 0.90)]
+    if detections.shape[0] == 0:
+        return []
+
+    # corners are relative to the 300x300 input, truncate them to its pixels first
+    lefts, tops, rights, bottoms = (detections[:, 3:7] * 300).astype(int).T
+
+    # then project them onto the original image
+    x1s = (lefts * aspect_ratio_x).astype(int)
+    y1s = (tops * aspect_ratio_y).astype(int)
+    x2s = (rights * aspect_ratio_x).astype(int)
+    y2s = (bottoms * aspect_ratio_y).astype(int)
+
+    return list(
+        zip(
+            x1s.tolist(),
+            y1s.tolist(),
+            (x2s - x1s).tolist(),
+            (y2s - y1s).tolist(),
+            detections[:, 2].tolist(),
+        )
+    )
+
+
 class SsdClient(Detector):
     def __init__(self):
         self.model = self.build_model()
+        # opencv dnn network keeps its input blob as state, guard setInput and forward pair
+        self._lock = threading.Lock()
 
     def build_model(self) -> dict:
         """
@@ -80,74 +126,73 @@ class SsdClient(Detector):
         Returns:
             results (List[FacialAreaRegion]): A list of FacialAreaRegion objects
         """
-        opencv_module: OpenCv.OpenCvClient = self.model["opencv_module"]
+        return self.detect_faces_batch([img])[0]
 
-        resp = []
+    def detect_faces_batch(self, imgs: List[np.ndarray]) -> List[List[FacialAreaRegion]]:
+        """
+        Detect and align faces of many images with a single ssd forward pass
 
-        detected_face = None
+        Args:
+            imgs (List[np.ndarray]): pre-loaded images as numpy array
 
-        ssd_labels = ["img_id", "is_face", "confidence", "left", "top", "right", "bottom"]
+        Returns:
+            results (List[List[FacialAreaRegion]]): facial areas of each image
+        """
+        if len(imgs) == 0:
+            return []
 
         target_size = (300, 300)
 
-        original_size = img.shape
+        imageBlob = cv2.dnn.blobFromImages(images=[cv2.resize(img, target_size) for img in imgs])
 
-        current_img = cv2.resize(img, target_size)
+        face_detector = self.model["face_detector"]
+        with self._lock:
+            face_detector.setInput(imageBlob)
+            detections = face_detector.forward()
+
+        # each detection row starts with the index of its image in the batch
+        detections = detections[0][0]
+        return [
+            self.__process_detections(img, detections[detections[:, 0] == img_id])
+            for img_id, img in enumerate(imgs)
+        ]
+
+    def __process_detections(self, img: np.ndarray, detections: np.ndarray) -> List[FacialAreaRegion]:
+        """
+        Convert raw ssd detections of an image into facial areas
 
-        aspect_ratio_x = original_size[1] / target_size[1]
-        aspect_ratio_y = original_size[0] / target_size[0]
+        Args:
+            img (np.ndarray): pre-loaded image as numpy array
+            detections (np.ndarray): detections of the image with shape (N, 7)
 
-        imageBlob = cv2.dnn.blobFromImage(image=current_img)
+        Returns:
+            results (List[FacialAreaRegion]): A list of FacialAreaRegion objects
+        """
+        opencv_module: OpenCv.OpenCvClient = self.model["opencv_module"]
 
-        face_detector = self.model["face_detector"]
-        face_detector.setInput(imageBlob)
-        detections = face_detector.forward()
-
-        detections_df = pd.DataFrame(detections[0][0], columns=ssd_labels)
-
-        detections_df = detections_df[detections_df["is_face"] == 1]  # 0: background, 1: face
-        detections_df = detections_df[detections_df["confidence"] >= 0.90]
-
-        detections_df["left"] = (detections_df["left"] * 300).astype(int)
-        detections_df["bottom"] = (detections_df["bottom"] * 300).astype(int)
-        detections_df["right"] = (detections_df["right"] * 300).astype(int)
-        detections_df["top"] = (detections_df["top"] * 300).astype(int)
-
-        if detections_df.shape[0] > 0:
-
-            for _, instance in detections_df.iterrows():
-
-                left = instance["left"]
-                right = instance["right"]
-                bottom = instance["bottom"]
-                top = instance["top"]
-                confidence = instance["confidence"]
-
-                x = int(left * aspect_ratio_x)
-                y = int(top * aspect_ratio_y)
-                w = int(right * aspect_ratio_x) - int(left * aspect_ratio_x)
-                h = int(bottom * aspect_ratio_y) - int(top * aspect_ratio_y)
-
-                detected_face = img[int(y) : int(y + h), int(x) : int(x + w)]
-
-                left_eye, right_eye = opencv_module.find_eyes(detected_face)
-
-                # eyes found in the detected face instead image itself
-                # detected face's coordinates should be added
-                if left_eye is not None:
-                    left_eye = (int(x + left_eye[0]), int(y + left_eye[1]))
-                if right_eye is not None:
-                    right_eye = (int(x + right_eye[0]), int(y + right_eye[1]))
-
-                facial_area = FacialAreaRegion(
-                    x=x,
-                    y=y,
-                    w=w,
-                    h=h,
-                    left_eye=left_eye,
-                    right_eye=right_eye,
-                    confidence=confidence,
-                )
-                resp.append(facial_area)
+        resp = []
+
+        for x, y, w, h, confidence in scale_detections(detections, img.shape):
+            detected_face = img[y : y + h, x : x + w]
+
+            left_eye, right_eye = opencv_module.find_eyes(detected_face)
+
+            # eyes found in the detected face instead image itself
+            # detected face's coordinates should be added
+            if left_eye is not None:
+                left_eye = (int(x + left_eye[0]), int(y + left_eye[1]))
+            if right_eye is not None:
+                right_eye = (int(x + right_eye[0]), int(y + right_eye[1]))
+
+            facial_area = FacialAreaRegion(
+                x=x,
+                y=y,
+                w=w,
+                h=h,
+                left_eye=left_eye,
+                right_eye=right_eye,
+                confidence=confidence,
+            )
+            resp.append(facial_area)
 
         return resp
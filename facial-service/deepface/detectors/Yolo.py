@@ -62,10 +62,36 @@ class YoloClient(Detector):
         Returns:
             results (List[FacialAreaRegion]): A list of FacialAreaRegion objects
         """
-        resp = []
+        return self.detect_faces_batch([img])[0]
+
+    def detect_faces_batch(self, imgs: List[np.ndarray]) -> List[List[FacialAreaRegion]]:
+        """
+        Detect and align faces of many images with a single yolo prediction
+
+        Args:
+            imgs (List[np.ndarray]): pre-loaded images as numpy array
+
+        Returns:
+            results (List[List[FacialAreaRegion]]): facial areas of each image
+        """
+        if len(imgs) == 0:
+            return []
 
         # Detect faces
-        results = self.model.predict(img, verbose=False, show=False, conf=0.25)[0]
+        batch_results = self.model.predict(list(imgs), verbose=False, show=False, conf=0.25)
+        return [self.__process_results(results) for results in batch_results]
+
+    def __process_results(self, results: Any) -> List[FacialAreaRegion]:
+        """
+        Convert yolo results of an image into facial areas
+
+        Args:
+            results (Any): yolo results of a single image
+
+        Returns:
+            results (List[FacialAreaRegion]): A list of FacialAreaRegion objects
+        """
+        resp = []
 
         # For each face, extract the bounding box, the landmarks and confidence
         for result in results:
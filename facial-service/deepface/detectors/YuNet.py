@@ -1,5 +1,6 @@
 # built-in dependencies
 import os
+import threading
 from typing import Any, List
 
 # 3rd party dependencies
@@ -18,6 +19,8 @@ logger = log.get_singletonish_logger()
 class YuNetClient(Detector):
     def __init__(self):
         self.model = self.build_model()
+        # input size and score threshold are set on the shared model before each detection
+        self._lock = threading.Lock()
 
     def build_model(self) -> Any:
         """
@@ -85,9 +88,10 @@ class YuNetClient(Detector):
             img = cv2.resize(img, (int(width * r), int(height * r)))
             height, width = img.shape[0], img.shape[1]
             resized = True
-        self.model.setInputSize((width, height))
-        self.model.setScoreThreshold(score_threshold)
-        _, faces = self.model.detect(img)
+        with self._lock:
+            self.model.setInputSize((width, height))
+            self.model.setScoreThreshold(score_threshold)
+            _, faces = self.model.detect(img)
         if faces is None:
             return resp
         for face in faces:
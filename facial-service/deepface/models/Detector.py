@@ -1,12 +1,19 @@
+import os
 from typing import List, Tuple, Optional
 from abc import ABC, abstractmethod
 import numpy as np
+from deepface.commons.thread_utils import map_with_helpers
 
 # Notice that all facial detector models must be inherited from this class
 
 
 # pylint: disable=unnecessary-pass, too-few-public-methods
 class Detector(ABC):
+    # the default detect_faces_batch spreads images over the shared helper threads when this
+    # is 2 or more. detectors whose model keeps per call state and cannot be shared across
+    # threads must set it to 1.
+    batch_workers: int = min(4, os.cpu_count() or 1)
+
     @abstractmethod
     def detect_faces(self, img: np.ndarray) -> List["FacialAreaRegion"]:
         """
@@ -26,6 +33,24 @@ class Detector(ABC):
         """
         pass
 
+    def detect_faces_batch(self, imgs: List[np.ndarray]) -> List[List["FacialAreaRegion"]]:
+        """
+        Detect faces of many images. Detectors supporting batched inference overwrite this
+        to run a single forward pass; the default detects images in this thread and the shared
+        helper threads, which keep their thread local models across calls.
+
+        Args:
+            imgs (List[np.ndarray]): pre-loaded images as numpy array
+
+        Returns:
+            results (List[List[FacialAreaRegion]]): facial areas of each image
+                in the same order with imgs
+        """
+        if len(imgs) < 2 or self.batch_workers < 2:
+            return [self.detect_faces(img) for img in imgs]
+
+        return map_with_helpers(self.detect_faces, imgs)
+
 
 class FacialAreaRegion:
     x: int
@@ -0,0 +1,169 @@
+import base64
+from typing import Any, Iterator, List, Optional, Union
+import numpy as np
+
+
+class Embedding:
+    """
+    Read-only float32 vector of a face with its model name and a cached l2 norm.
+        numpy reads its buffer without copying (np.asarray(embedding)), and it behaves as
+        a sequence of floats for callers expecting a list. Use to_list or json_default to
+        serialize it as JSON.
+    """
+
+    __slots__ = ("_values", "model_name", "_norm")
+
+    def __init__(
+        self,
+        values: Union["Embedding", np.ndarray, List[float]],
+        model_name: Optional[str] = None,
+    ):
+        """
+        Args:
+            values (Embedding, np.ndarray or list): vector items. float32 arrays are not
+                copied, the caller must not modify them afterwards.
+            model_name (str): facial recognition model the vector was found with
+        """
+        if isinstance(values, Embedding):
+            model_name = model_name or values.model_name
+            values = values.values
+        array = np.asarray(values, dtype=np.float32).reshape(-1)
+        if array.flags.writeable:
+            array = array.view()
+            array.flags.writeable = False
+        self._values = array
+        self.model_name = model_name
+        self._norm: Optional[float] = None
+
+    @classmethod
+    def from_any(
+        cls, values: Union["Embedding", np.ndarray, List[float]], model_name: Optional[str] = None
+    ) -> "Embedding":
+        """
+        Wrap a vector as an Embedding, returning it as is if it already is one
+        Args:
+            values (Embedding, np.ndarray or list): vector items
+            model_name (str): facial recognition model the vector was found with
+        Returns:
+            embedding (Embedding)
+        """
+        if isinstance(values, Embedding):
+            return values
+        return cls(values, model_name=model_name)
+
+    @classmethod
+    def from_base64(cls, encoded: str, model_name: Optional[str] = None) -> "Embedding":
+        """
+        Restore an embedding from the base64 of its little endian float32 bytes
+        Args:
+            encoded (str): base64 encoded bytes, see to_base64
+            model_name (str): facial recognition model the vector was found with
+        Returns:
+            embedding (Embedding)
+        """
+        return cls(np.frombuffer(base64.b64decode(encoded), dtype="<f4"), model_name=model_name)
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        Returns:
+            values (np.ndarray): read-only float32 buffer of the vector
+        """
+        return self._values
+
+    @property
+    def dims(self) -> int:
+        return self._values.shape[0]
+
+    @property
+    def norm(self) -> float:
+        """
+        Returns:
+            norm (float): l2 norm of the vector, calculated once
+        """
+        if self._norm is None:
+            self._norm = float(np.sqrt(np.dot(self._values, self._values)))
+        return self._norm
+
+    @property
+    def normalized(self) -> bool:
+        """
+        Returns:
+            result (bool): True if the vector is l2 normalized
+        """
+        return abs(self.norm - 1.0) < 1e-4
+
+    def normalize(self) -> "Embedding":
+        """
+        Returns:
+            embedding (Embedding): l2 normalized copy, or the embedding itself if it already is
+        """
+        if self.normalized or self.norm == 0:
+            return self
+        normalized = Embedding(self._values / np.float32(self.norm), model_name=self.model_name)
+        normalized._norm = 1.0
+        return normalized
+
+    def to_list(self) -> List[float]:
+        """
+        Returns:
+            values (list): vector items as python floats, for JSON serialization
+        """
+        return self._values.tolist()
+
+    def to_base64(self) -> str:
+        """
+        Returns:
+            encoded (str): base64 of the vector's little endian float32 bytes
+        """
+        return base64.b64encode(self._values.astype("<f4", copy=False).tobytes()).decode("ascii")
+
+    def __array__(self, dtype: Any = None, copy: Optional[bool] = None) -> np.ndarray:
+        if dtype is not None and np.dtype(dtype) != self._values.dtype:
+            return self._values.astype(dtype)
+        if copy:
+            return self._values.copy()
+        return self._values
+
+    def __len__(self) -> int:
+        return self._values.shape[0]
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._values.tolist())
+
+    def __getitem__(self, index: Any) -> Any:
+        return self._values[index]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (Embedding, np.ndarray, list, tuple)):
+            other = np.asarray(other, dtype=np.float32).reshape(-1)
+            return other.shape == self._values.shape and bool(np.array_equal(self._values, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __getstate__(self) -> dict:
+        return {"values": self._values, "model_name": self.model_name}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["values"], model_name=state["model_name"])
+
+    def __repr__(self) -> str:
+        return f"Embedding(model_name={self.model_name!r}, dims={self.dims})"
+
+
+def json_default(obj: Any) -> Any:
+    """
+    Serialize embeddings and numpy values for json.dumps(..., default=json_default)
+    Args:
+        obj (Any): object json cannot serialize by itself
+    Returns:
+        result (Any): JSON compatible counterpart of obj
+    """
+    if isinstance(obj, Embedding):
+        return obj.to_list()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -18,7 +18,15 @@ class FacialRecognition(ABC):
     input_shape: Tuple[int, int]
     output_shape: int
 
-    def forward(self, img: np.ndarray) -> List[float]:
+    def forward(self, img: np.ndarray) -> Union[np.ndarray, List[float]]:
+        """
+        Find embedding of a preprocessed face
+        Args:
+            img (np.ndarray): face with shape (1, height, width, 3)
+        Returns:
+            embedding (np.ndarray): float32 multi-dimensional vector. Subclasses may
+                return a list of floats as well.
+        """
         if not isinstance(self.model, Model):
             raise ValueError(
                 "You must overwrite forward method if it is not a keras model,"
@@ -26,4 +34,17 @@ class FacialRecognition(ABC):
             )
         # model.predict causes memory issue when it is called in a for loop
         # embedding = model.predict(img, verbose=0)[0].tolist()
-        return self.model(img, training=False).numpy()[0].tolist()
+        return self.model(img, training=False).numpy()[0]
+
+    def forward_batch(self, imgs: np.ndarray) -> Union[np.ndarray, List[List[float]]]:
+        """
+        Find embeddings of many preprocessed faces in a single model call
+        Args:
+            imgs (np.ndarray): batch of faces with shape (n, height, width, 3)
+        Returns:
+            embeddings (np.ndarray): multi-dimensional vector of each face, one per row
+        """
+        # models overwriting forward (non keras or post processed ones) are called one by one
+        if type(self).forward is not FacialRecognition.forward:
+            return [self.forward(img[np.newaxis, ...]) for img in imgs]
+        return self.model(imgs, training=False).numpy()
@@ -151,7 +151,8 @@ def analyze(
             pbar.set_description(f"Action: {action}")
 
             if action == "emotion":
-                emotion_predictions = modeling.build_model("Emotion").predict(img_content)
+                with modeling.use_model("Emotion") as model:
+                    emotion_predictions = model.predict(img_content)
                 sum_of_predictions = emotion_predictions.sum()
 
                 obj["emotion"] = {}
@@ -162,12 +163,14 @@ def analyze(
                 obj["dominant_emotion"] = Emotion.labels[np.argmax(emotion_predictions)]
 
             elif action == "age":
-                apparent_age = modeling.build_model("Age").predict(img_content)
+                with modeling.use_model("Age") as model:
+                    apparent_age = model.predict(img_content)
                 # int cast is for exception - object of type 'float32' is not JSON serializable
                 obj["age"] = int(apparent_age)
 
             elif action == "gender":
-                gender_predictions = modeling.build_model("Gender").predict(img_content)
+                with modeling.use_model("Gender") as model:
+                    gender_predictions = model.predict(img_content)
                 obj["gender"] = {}
                 for i, gender_label in enumerate(Gender.labels):
                     gender_prediction = 100 * gender_predictions[i]
@@ -176,7 +179,8 @@ def analyze(
                 obj["dominant_gender"] = Gender.labels[np.argmax(gender_predictions)]
 
             elif action == "race":
-                race_predictions = modeling.build_model("Race").predict(img_content)
+                with modeling.use_model("Race") as model:
+                    race_predictions = model.predict(img_content)
                 sum_of_predictions = race_predictions.sum()
 
                 obj["race"] = {}
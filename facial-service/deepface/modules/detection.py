@@ -60,18 +60,14 @@ def extract_faces(
         - "confidence" (float): The confidence score associated with the detected face.
     """
 
-    resp_objs = []
-
     # img might be path, base64 or numpy array. Convert it to numpy whatever it is.
     img, img_name = image_utils.load_image(img_path)
 
     if img is None:
         raise ValueError(f"Exception while loading {img_name}")
 
-    base_region = FacialAreaRegion(x=0, y=0, w=img.shape[1], h=img.shape[0], confidence=0)
-
     if detector_backend == "skip":
-        face_objs = [DetectedFace(img=img, facial_area=base_region, confidence=0)]
+        face_objs = []
     else:
         face_objs = DetectorWrapper.detect_faces(
             detector_backend=detector_backend,
@@ -80,6 +76,126 @@ def extract_faces(
             expand_percentage=expand_percentage,
         )
 
+    return __build_face_objs(
+        img=img,
+        img_name=img_name,
+        face_objs=face_objs,
+        enforce_detection=enforce_detection,
+        grayscale=grayscale,
+        skip=detector_backend == "skip",
+    )
+
+
+def extract_faces_batch(
+    img_paths: List[Union[str, np.ndarray]],
+    detector_backend: str = "opencv",
+    enforce_detection: bool = True,
+    align: bool = True,
+    expand_percentage: int = 0,
+    grayscale: bool = False,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Extract faces from many images with a single face detector call
+
+    Args:
+        img_paths (list): exact image paths as strings, numpy arrays (BGR),
+            or base64 encoded images.
+
+        detector_backend (string): face detector backend. Options: 'opencv', 'retinaface',
+            'mtcnn', 'ssd', 'dlib', 'mediapipe', 'yolov8', 'centerface' or 'skip'
+            (default is opencv)
+
+        enforce_detection (boolean): If no face is detected in an image, its result is an
+            empty list and the reason is logged instead of raising an exception, so that one
+            image cannot fail the whole batch. Set to False to get the whole image instead.
+
+        align (bool): Flag to enable face alignment (default is True).
+
+        expand_percentage (int): expand detected facial area with a percentage
+
+        grayscale (boolean): Flag to convert the image to grayscale before
+            processing (default is False).
+
+    Returns:
+        results (List[List[Dict[str, Any]]]): faces of each image in the same order with
+            img_paths. See extract_faces for the fields.
+    """
+    imgs = []
+    for img_path in img_paths:
+        try:
+            img, img_name = image_utils.load_image(img_path)
+            if img is None:
+                raise ValueError(f"Exception while loading {img_name}")
+        except ValueError as err:
+            logger.error(f"Exception while extracting faces from {img_path}: {str(err)}")
+            img, img_name = None, None
+        imgs.append((img, img_name))
+
+    loaded_imgs = [img for img, _ in imgs if img is not None]
+    if detector_backend == "skip" or len(loaded_imgs) == 0:
+        detected_batch = iter([[] for _ in loaded_imgs])
+    else:
+        detected_batch = iter(
+            DetectorWrapper.detect_faces_batch(
+                detector_backend=detector_backend,
+                imgs=loaded_imgs,
+                align=align,
+                expand_percentage=expand_percentage,
+            )
+        )
+
+    resp_objs = []
+    for img, img_name in imgs:
+        if img is None:
+            resp_objs.append([])
+            continue
+        try:
+            resp_objs.append(
+                __build_face_objs(
+                    img=img,
+                    img_name=img_name,
+                    face_objs=next(detected_batch),
+                    enforce_detection=enforce_detection,
+                    grayscale=grayscale,
+                    skip=detector_backend == "skip",
+                )
+            )
+        except ValueError as err:
+            logger.error(f"Exception while extracting faces from {img_name}: {str(err)}")
+            resp_objs.append([])
+
+    return resp_objs
+
+
+def __build_face_objs(
+    img: np.ndarray,
+    img_name: str,
+    face_objs: List[DetectedFace],
+    enforce_detection: bool,
+    grayscale: bool,
+    skip: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Convert detected faces of an image into the response format of extract_faces
+
+    Args:
+        img (np.ndarray): loaded image in BGR
+        img_name (str): image name to be used in exception messages
+        face_objs (List[DetectedFace]): detected faces of the image
+        enforce_detection (boolean): raise an exception if no face is detected
+        grayscale (boolean): convert faces to grayscale
+        skip (boolean): detection is skipped, use the whole image as the face
+
+    Returns:
+        results (List[Dict[str, Any]]): see extract_faces
+    """
+    resp_objs = []
+
+    base_region = FacialAreaRegion(x=0, y=0, w=img.shape[1], h=img.shape[0], confidence=0)
+
+    if skip:
+        face_objs = [DetectedFace(img=img, facial_area=base_region, confidence=0)]
+
     # in case of no face found
     if len(face_objs) == 0 and enforce_detection is True:
         if img_name is not None:
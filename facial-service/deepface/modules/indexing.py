@@ -0,0 +1,950 @@
+# built-in dependencies
+import pickle
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# 3rd party dependencies
+import numpy as np
+
+# project dependencies
+from deepface.commons import logger as log
+
+logger = log.get_singletonish_logger()
+
+# pylint: disable=too-many-instance-attributes
+
+
+class Index(ABC):
+    """
+    Nearest neighbour index over facial embeddings. Items are addressed with string keys,
+    so that they can be added and removed incrementally as the facial database changes.
+    """
+
+    index_type: str
+    dims: int
+    distance_metric: str
+
+    def __init__(self, dims: int, distance_metric: str = "cosine"):
+        if distance_metric not in ("cosine", "euclidean", "euclidean_l2"):
+            raise ValueError("Invalid distance_metric passed - ", distance_metric)
+        self.dims = dims
+        self.distance_metric = distance_metric
+        # cosine and euclidean_l2 are both calculated on l2 normalized vectors
+        self.normalize = distance_metric != "euclidean"
+
+    @abstractmethod
+    def add(self, keys: List[str], embeddings: Union[np.ndarray, list]) -> None:
+        """
+        Add embeddings into the index. An existing key is replaced.
+        Args:
+            keys (list): unique key of each embedding
+            embeddings (np.ndarray or list): vectors with shape (n, dims)
+        """
+
+    @abstractmethod
+    def remove(self, keys: List[str]) -> None:
+        """
+        Remove embeddings from the index. Unknown keys are ignored.
+        Args:
+            keys (list): keys of the embeddings to be removed
+        """
+
+    @abstractmethod
+    def search(
+        self, queries: Union[np.ndarray, list], k: int
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Find the nearest neighbours of given vectors
+        Args:
+            queries (np.ndarray or list): vectors with shape (n, dims) or (dims,)
+            k (int): number of neighbours to retrieve for each query
+        Returns:
+            results (list): for each query, (key, distance) pairs sorted by distance ascending
+        """
+
+    @abstractmethod
+    def keys(self) -> List[str]:
+        """
+        Keys of the embeddings stored in the index
+        """
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def set_params(self, **params: Any) -> None:
+        """
+        Update tunable parameters of a built index (e.g. nprobe or ef_search)
+        """
+        for name, value in params.items():
+            if not hasattr(self, name):
+                raise ValueError(f"{self.index_type} index has no {name} parameter")
+            setattr(self, name, value)
+
+    def save(self, path: str) -> None:
+        """
+        Persist the index into the given path
+        """
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    def restore(self, path: str) -> None:
+        """
+        Reload the state not covered by pickle after the index is loaded from the given path
+        """
+
+    def _prepare(self, embeddings: Union[np.ndarray, list]) -> np.ndarray:
+        """
+        Convert given vectors to a float32 matrix, normalized if the metric requires
+        """
+        vectors = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if vectors.shape[1] != self.dims:
+            raise ValueError(
+                f"Index expects embeddings with {self.dims} dimensions"
+                f" but {vectors.shape[1]} dimensional embeddings passed"
+            )
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms != 0)
+        return vectors
+
+
+def load_index(path: str) -> Index:
+    """
+    Load an index persisted with Index.save
+    Args:
+        path (str): exact path of the persisted index
+    Returns:
+        index (Index)
+    """
+    with open(path, "rb") as f:
+        index = pickle.load(f)
+    index.restore(path)
+    return index
+
+
+class VectorStore:
+    """
+    Growable matrix with stable integer labels. Removed rows are marked as dead
+    and dropped on compaction instead of shifting the whole matrix on each removal.
+    Rows are float32 embeddings, or compressed codes of quantized indexes.
+    """
+
+    def __init__(self, dims: int, dtype: Any = np.float32):
+        self.dims = dims
+        self.vectors = np.empty((0, dims), dtype=dtype)
+        self.sq_norms = np.empty((0,), dtype=np.float32)
+        self.alive = np.empty((0,), dtype=bool)
+        self.size = 0
+        self.key_to_label: Dict[str, int] = {}
+        self.label_to_key: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.key_to_label)
+
+    def add(
+        self, keys: List[str], vectors: np.ndarray, sq_norms: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Append prepared vectors (or codes with the squared norms of their
+        reconstructions) and return their labels
+        """
+        self.remove(keys)
+        count = vectors.shape[0]
+        required = self.size + count
+        if required > self.vectors.shape[0]:
+            capacity = max(required, 2 * self.vectors.shape[0], 1024)
+            self.vectors = self.__grow(self.vectors, capacity)
+            self.sq_norms = self.__grow(self.sq_norms, capacity)
+            self.alive = self.__grow(self.alive, capacity)
+
+        labels = np.arange(self.size, required)
+        self.vectors[self.size : required] = vectors
+        if sq_norms is None:
+            sq_norms = np.sum(vectors * vectors, axis=1)
+        self.sq_norms[self.size : required] = sq_norms
+        self.alive[self.size : required] = True
+        for key, label in zip(keys, labels):
+            self.key_to_label[key] = int(label)
+            self.label_to_key.append(key)
+        self.size = required
+        return labels
+
+    def remove(self, keys: List[str]) -> None:
+        """
+        Mark vectors of given keys as dead
+        """
+        for key in keys:
+            label = self.key_to_label.pop(key, None)
+            if label is not None:
+                self.alive[label] = False
+                self.label_to_key[label] = None
+
+    def needs_compaction(self) -> bool:
+        """
+        Dead rows are worth dropping once they dominate the matrix
+        """
+        dead = self.size - len(self.key_to_label)
+        return dead > 1024 and dead > len(self.key_to_label)
+
+    def compact(self) -> np.ndarray:
+        """
+        Drop dead rows
+        Returns:
+            mapping (np.ndarray): new label of each old label, -1 for dropped ones
+        """
+        live_labels = np.flatnonzero(self.alive[: self.size])
+        mapping = np.full(self.size, -1, dtype=np.int64)
+        mapping[live_labels] = np.arange(len(live_labels))
+
+        self.vectors = self.vectors[live_labels].copy()
+        self.sq_norms = self.sq_norms[live_labels].copy()
+        self.alive = np.ones(len(live_labels), dtype=bool)
+        self.label_to_key = [self.label_to_key[label] for label in live_labels]
+        self.key_to_label = {key: label for label, key in enumerate(self.label_to_key)}
+        self.size = len(live_labels)
+        return mapping
+
+    def distances(
+        self, queries: np.ndarray, metric: str, labels: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Distances between prepared queries and stored vectors (all or the given labels)
+        """
+        if labels is None:
+            vectors = self.vectors[: self.size]
+            sq_norms = self.sq_norms[: self.size]
+        else:
+            vectors = self.vectors[labels]
+            sq_norms = self.sq_norms[labels]
+
+        products = queries @ vectors.T
+        return to_distances(products, metric, queries=queries, sq_norms=sq_norms)
+
+    @staticmethod
+    def exact_distances(query: np.ndarray, vectors: np.ndarray, metric: str) -> np.ndarray:
+        """
+        Distances between a prepared query and prepared float32 vectors
+        """
+        products = (vectors @ query)[np.newaxis, :]
+        sq_norms = np.sum(vectors * vectors, axis=1)
+        return to_distances(products, metric, queries=query[np.newaxis, :], sq_norms=sq_norms)[0]
+
+    @staticmethod
+    def __grow(array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[: array.shape[0]] = array
+        return grown
+
+
+def to_distances(
+    products: np.ndarray,
+    metric: str,
+    queries: Optional[np.ndarray] = None,
+    sq_norms: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Convert dot products of prepared vectors into distances of the given metric
+    Args:
+        products (np.ndarray): dot products with shape (n_queries, n_vectors)
+        metric (str): cosine, euclidean or euclidean_l2
+        queries (np.ndarray): prepared queries, required for euclidean
+        sq_norms (np.ndarray): squared norms of the vectors, required for euclidean
+    Returns:
+        distances (np.ndarray): matrix with the same shape of products
+    """
+    if metric == "cosine":
+        return np.maximum(1 - products, 0)
+    if metric == "euclidean_l2":
+        return np.sqrt(np.maximum(2 - 2 * products, 0))
+    query_sq_norms = np.sum(queries * queries, axis=1)[:, np.newaxis]
+    return np.sqrt(np.maximum(query_sq_norms + sq_norms[np.newaxis, :] - 2 * products, 0))
+
+
+def top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of k smallest items of a distance vector, sorted ascending
+    """
+    if k < distances.shape[0]:
+        candidates = np.argpartition(distances, k - 1)[:k]
+    else:
+        candidates = np.arange(distances.shape[0])
+    return candidates[np.argsort(distances[candidates], kind="stable")]
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, n: int = 1) -> np.ndarray:
+    """
+    Indices of the n closest centroids (in l2 distance) of each vector, shape (len(vectors), n)
+    """
+    # argmin |v - c|^2 equals argmin |c|^2 - 2vc because |v|^2 is the same for all c
+    scores = np.sum(centroids * centroids, axis=1)[np.newaxis, :] - 2 * (vectors @ centroids.T)
+    n = min(n, centroids.shape[0])
+    if n == 1:
+        return np.argmin(scores, axis=1)[:, np.newaxis]
+    return np.argpartition(scores, n - 1, axis=1)[:, :n]
+
+
+def kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    iterations: int,
+    rng: np.random.Generator,
+    normalize: bool = False,
+) -> np.ndarray:
+    """
+    Lloyd's k-means initialized with randomly picked vectors
+    Args:
+        vectors (np.ndarray): float32 training vectors with shape (n, dims)
+        n_clusters (int): number of centroids, at most n
+        iterations (int): number of assignment and update steps
+        rng (np.random.Generator): random generator for initialization
+        normalize (bool): keep centroids on the unit sphere (spherical k-means)
+    Returns:
+        centroids (np.ndarray): float32 centroids with shape (n_clusters, dims)
+    """
+    centroids = vectors[rng.choice(vectors.shape[0], size=n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids)[:, 0]
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, np.newaxis]
+        if normalize:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids = np.divide(centroids, norms, out=np.zeros_like(centroids), where=norms != 0)
+    return centroids
+
+
+class FlatIndex(Index):
+    """
+    Exact brute force search over all embeddings with a single matrix multiplication
+    """
+
+    index_type = "flat"
+
+    # number of queries scored at once, bounds the temporary distance matrix
+    query_batch_size = 32
+
+    def __init__(self, dims: int, distance_metric: str = "cosine"):
+        super().__init__(dims=dims, distance_metric=distance_metric)
+        self.store = VectorStore(dims=dims)
+
+    def add(self, keys: List[str], embeddings: Union[np.ndarray, list]) -> None:
+        if len(keys) == 0:
+            return
+        self.store.add(keys, self._prepare(embeddings))
+
+    def remove(self, keys: List[str]) -> None:
+        self.store.remove(keys)
+        if self.store.needs_compaction():
+            self.store.compact()
+
+    def keys(self) -> List[str]:
+        return list(self.store.key_to_label.keys())
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def search(
+        self, queries: Union[np.ndarray, list], k: int
+    ) -> List[List[Tuple[str, float]]]:
+        queries = self._prepare(queries)
+        alive = self.store.alive[: self.store.size]
+        results = []
+        for start in range(0, queries.shape[0], self.query_batch_size):
+            batch = queries[start : start + self.query_batch_size]
+            distances = self.store.distances(batch, self.distance_metric)
+            distances[:, ~alive] = np.inf
+            for row in distances:
+                labels = top_k(row, min(k, len(self.store)))
+                results.append(
+                    [(self.store.label_to_key[label], float(row[label])) for label in labels]
+                )
+        return results
+
+
+class IvfIndex(Index):
+    """
+    Inverted file index. Embeddings are clustered around nlist coarse centroids with k-means
+    and a query only scans the nprobe closest clusters. Increasing nprobe increases recall
+    and latency. Until enough embeddings are added to train the centroids, it searches
+    exhaustively.
+    """
+
+    index_type = "ivf"
+
+    # k-means needs a few dozen points per centroid to be meaningful
+    min_points_per_centroid = 39
+    max_points_per_centroid = 256
+
+    def __init__(
+        self,
+        dims: int,
+        distance_metric: str = "cosine",
+        nlist: int = 100,
+        nprobe: int = 8,
+        kmeans_iterations: int = 10,
+        seed: int = 0,
+    ):
+        super().__init__(dims=dims, distance_metric=distance_metric)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.store = VectorStore(dims=dims)
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[List[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def add(self, keys: List[str], embeddings: Union[np.ndarray, list]) -> None:
+        if len(keys) == 0:
+            return
+        vectors = self._prepare(embeddings)
+        labels = self.store.add(keys, vectors)
+
+        if self.is_trained:
+            self.__assign(labels, vectors)
+        elif len(self.store) >= self.nlist * self.min_points_per_centroid:
+            self.train()
+
+    def remove(self, keys: List[str]) -> None:
+        self.store.remove(keys)
+        if self.store.needs_compaction():
+            mapping = self.store.compact()
+            if self.is_trained:
+                self.lists = [
+                    [int(mapping[label]) for label in labels if mapping[label] >= 0]
+                    for labels in self.lists
+                ]
+                self._list_arrays = {}
+
+    def keys(self) -> List[str]:
+        return list(self.store.key_to_label.keys())
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def train(self) -> None:
+        """
+        Find coarse centroids with k-means over (a sample of) stored embeddings
+        and assign every embedding to its closest centroid
+        """
+        live_labels = np.flatnonzero(self.store.alive[: self.store.size])
+        nlist = min(self.nlist, len(live_labels))
+        if nlist == 0:
+            return
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(live_labels), nlist * self.max_points_per_centroid)
+        sample = self.store.vectors[rng.choice(live_labels, size=sample_size, replace=False)]
+
+        self.centroids = kmeans(sample, nlist, self.kmeans_iterations, rng, self.normalize)
+        self.lists = [[] for _ in range(nlist)]
+        self._list_arrays = {}
+        self.__assign(live_labels, self.store.vectors[live_labels])
+
+    def search(
+        self, queries: Union[np.ndarray, list], k: int
+    ) -> List[List[Tuple[str, float]]]:
+        queries = self._prepare(queries)
+        if not self.is_trained:
+            return self.__exhaustive_search(queries, k)
+
+        probes = nearest_centroids(queries, self.centroids, self.nprobe)
+        results = []
+        for query, query_probes in zip(queries, probes):
+            candidates = np.concatenate([self.__list_array(probe) for probe in query_probes])
+            candidates = candidates[self.store.alive[candidates]]
+            if len(candidates) == 0:
+                results.append([])
+                continue
+            distances = self.store.distances(
+                query[np.newaxis, :], self.distance_metric, labels=candidates
+            )[0]
+            positions = top_k(distances, min(k, len(candidates)))
+            results.append(
+                [
+                    (self.store.label_to_key[candidates[position]], float(distances[position]))
+                    for position in positions
+                ]
+            )
+        return results
+
+    def __exhaustive_search(self, queries: np.ndarray, k: int) -> List[List[Tuple[str, float]]]:
+        alive = self.store.alive[: self.store.size]
+        distances = self.store.distances(queries, self.distance_metric)
+        distances[:, ~alive] = np.inf
+        results = []
+        for row in distances:
+            labels = top_k(row, min(k, len(self.store)))
+            results.append([(self.store.label_to_key[label], float(row[label])) for label in labels])
+        return results
+
+    def __assign(self, labels: np.ndarray, vectors: np.ndarray) -> None:
+        assignments = nearest_centroids(vectors, self.centroids, 1)[:, 0]
+        for label, list_id in zip(labels, assignments):
+            self.lists[list_id].append(int(label))
+            self._list_arrays.pop(int(list_id), None)
+
+    def __list_array(self, list_id: int) -> np.ndarray:
+        array = self._list_arrays.get(list_id)
+        if array is None:
+            array = np.asarray(self.lists[list_id], dtype=np.int64)
+            self._list_arrays[list_id] = array
+        return array
+
+
+class HnswIndex(Index):
+    """
+    Hierarchical navigable small world graph index wrapping hnswlib. M and ef_construction
+    shape the graph while building; ef_search trades recall against latency while querying.
+    """
+
+    index_type = "hnsw"
+
+    def __init__(
+        self,
+        dims: int,
+        distance_metric: str = "cosine",
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        seed: int = 0,
+    ):
+        super().__init__(dims=dims, distance_metric=distance_metric)
+        self.M = M  # pylint: disable=invalid-name
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+        self.key_to_label: Dict[str, int] = {}
+        self.label_to_key: Dict[int, str] = {}
+        self.next_label = 0
+        self.capacity = 0
+        self.graph = self.__new_graph()
+        self.graph.init_index(
+            max_elements=1024,
+            ef_construction=self.ef_construction,
+            M=self.M,
+            random_seed=self.seed,
+        )
+        self.capacity = 1024
+
+    def __new_graph(self) -> Any:
+        # this is not a must dependency. do not import it in the global level.
+        try:
+            import hnswlib
+        except ModuleNotFoundError as e:
+            raise ImportError(
+                "HNSW is an optional index, ensure the library is installed."
+                "Please install using 'pip install hnswlib' "
+            ) from e
+
+        # vectors are already normalized for cosine and euclidean_l2, so inner product and
+        # squared l2 distance on them are enough to restore each metric
+        space = "ip" if self.distance_metric == "cosine" else "l2"
+        return hnswlib.Index(space=space, dim=self.dims)
+
+    def add(self, keys: List[str], embeddings: Union[np.ndarray, list]) -> None:
+        if len(keys) == 0:
+            return
+        vectors = self._prepare(embeddings)
+        self.remove(keys)
+
+        required = self.next_label + len(keys)
+        if required > self.capacity:
+            self.capacity = max(required, 2 * self.capacity)
+            self.graph.resize_index(self.capacity)
+
+        labels = np.arange(self.next_label, required)
+        self.graph.add_items(vectors, labels)
+        for key, label in zip(keys, labels):
+            self.key_to_label[key] = int(label)
+            self.label_to_key[int(label)] = key
+        self.next_label = required
+
+    def remove(self, keys: List[str]) -> None:
+        for key in keys:
+            label = self.key_to_label.pop(key, None)
+            if label is not None:
+                self.graph.mark_deleted(label)
+                del self.label_to_key[label]
+
+    def keys(self) -> List[str]:
+        return list(self.key_to_label.keys())
+
+    def __len__(self) -> int:
+        return len(self.key_to_label)
+
+    def search(
+        self, queries: Union[np.ndarray, list], k: int
+    ) -> List[List[Tuple[str, float]]]:
+        queries = self._prepare(queries)
+        k = min(k, len(self))
+        if k == 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        self.graph.set_ef(max(self.ef_search, k))
+        labels, raw_distances = self.graph.knn_query(queries, k=k)
+
+        if self.distance_metric == "cosine":
+            # hnswlib's ip space returns 1 - inner product
+            distances = np.maximum(raw_distances, 0)
+        else:
+            distances = np.sqrt(np.maximum(raw_distances, 0))
+
+        return [
+            [(self.label_to_key[int(label)], float(distance)) for label, distance in zip(*row)]
+            for row in zip(labels, distances)
+        ]
+
+    def save(self, path: str) -> None:
+        self.graph.save_index(path + ".graph")
+        super().save(path)
+
+    def restore(self, path: str) -> None:
+        """
+        Load the graph persisted next to the pickled metadata
+        """
+        self.graph = self.__new_graph()
+        self.graph.load_index(path + ".graph", max_elements=self.capacity)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["graph"]  # persisted separately by hnswlib
+        return state
+
+
+class QuantizedIndex(Index):
+    """
+    Base of the indexes keeping compressed codes instead of float32 embeddings. Distances are
+    estimated asymmetrically (exact query against compressed embeddings) and, if a refine
+    source is set, the best rerank * k candidates are re-ranked with exact distances.
+    Until train_size embeddings are added, raw embeddings are kept and searched exactly.
+    """
+
+    code_dtype: Any = np.uint8
+
+    # number of stored codes scored at once, bounds temporary memory
+    chunk_size = 16384
+
+    def __init__(
+        self,
+        dims: int,
+        distance_metric: str = "cosine",
+        train_size: int = 4096,
+        rerank: int = 4,
+        seed: int = 0,
+    ):
+        super().__init__(dims=dims, distance_metric=distance_metric)
+        self.train_size = train_size
+        self.rerank = rerank
+        self.seed = seed
+        self.is_trained = False
+        self.store = VectorStore(dims=dims)
+        self.refine_source: Optional[Callable[[List[str]], Union[np.ndarray, list]]] = None
+
+    @property
+    @abstractmethod
+    def code_size(self) -> int:
+        """
+        Number of code items stored per embedding
+        """
+
+    @abstractmethod
+    def _fit(self, vectors: np.ndarray, rng: np.random.Generator) -> None:
+        """
+        Learn the quantizer from prepared training vectors
+        """
+
+    @abstractmethod
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compress prepared vectors
+        Returns:
+            codes (np.ndarray): codes with shape (n, code_size)
+            sq_norms (np.ndarray): squared norms of the reconstructed vectors
+        """
+
+    @abstractmethod
+    def _estimate(self, query: np.ndarray, codes: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        """
+        Asymmetric distances between a prepared query and compressed embeddings
+        """
+
+    def set_refine_source(
+        self, source: Optional[Callable[[List[str]], Union[np.ndarray, list]]]
+    ) -> None:
+        """
+        Set the function returning the original embeddings of given keys for exact re-ranking.
+        Originals usually live in a slower or shared storage (e.g. pkl or redis).
+        """
+        self.refine_source = source
+
+    def memory_bytes(self) -> int:
+        """
+        Bytes allocated for the stored embeddings or codes
+        """
+        return self.store.vectors.nbytes + self.store.sq_norms.nbytes + self.store.alive.nbytes
+
+    def add(self, keys: List[str], embeddings: Union[np.ndarray, list]) -> None:
+        if len(keys) == 0:
+            return
+        vectors = self._prepare(embeddings)
+        if self.is_trained:
+            codes, sq_norms = self._encode(vectors)
+            self.store.add(keys, codes, sq_norms=sq_norms)
+            return
+
+        self.store.add(keys, vectors)
+        if len(self.store) >= self.train_size:
+            self.train()
+
+    def remove(self, keys: List[str]) -> None:
+        self.store.remove(keys)
+        if self.store.needs_compaction():
+            self.store.compact()
+
+    def keys(self) -> List[str]:
+        return list(self.store.key_to_label.keys())
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def train(self) -> None:
+        """
+        Learn the quantizer from (a sample of) stored embeddings and replace them with codes
+        """
+        live_labels = np.flatnonzero(self.store.alive[: self.store.size])
+        if len(live_labels) == 0:
+            return
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(live_labels), 65536)
+        self._fit(self.store.vectors[rng.choice(live_labels, size=sample_size, replace=False)], rng)
+
+        keys = [self.store.label_to_key[label] for label in live_labels]
+        codes, sq_norms = self._encode(self.store.vectors[live_labels])
+        self.store = VectorStore(dims=self.code_size, dtype=self.code_dtype)
+        self.store.add(keys, codes, sq_norms=sq_norms)
+        self.is_trained = True
+
+    def search(
+        self, queries: Union[np.ndarray, list], k: int
+    ) -> List[List[Tuple[str, float]]]:
+        queries = self._prepare(queries)
+        size = self.store.size
+        alive = self.store.alive[:size]
+        k = min(k, len(self.store))
+
+        results = []
+        for query in queries:
+            if self.is_trained:
+                distances = np.empty(size, dtype=np.float32)
+                for start in range(0, size, self.chunk_size):
+                    end = min(start + self.chunk_size, size)
+                    distances[start:end] = self._estimate(
+                        query, self.store.vectors[start:end], self.store.sq_norms[start:end]
+                    )
+            else:
+                distances = self.store.distances(query[np.newaxis, :], self.distance_metric)[0]
+            distances[~alive] = np.inf
+
+            refine = self.is_trained and self.refine_source is not None
+            labels = top_k(distances, min(k * self.rerank, len(self.store)) if refine else k)
+            keys = [self.store.label_to_key[label] for label in labels]
+            distances = distances[labels]
+
+            if refine and len(keys) > 0:
+                originals = self._prepare(self.refine_source(keys))
+                distances = VectorStore.exact_distances(query, originals, self.distance_metric)
+                positions = top_k(distances, k)
+                keys = [keys[position] for position in positions]
+                distances = distances[positions]
+
+            results.append([(key, float(distance)) for key, distance in zip(keys, distances)])
+        return results
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["refine_source"] = None  # functions are bound to the running process
+        return state
+
+
+class PqIndex(QuantizedIndex):
+    """
+    Product quantization. Embeddings are split into m sub vectors and each sub vector is
+    replaced with the index of its closest of 256 centroids learnt for that subspace, so an
+    embedding costs m bytes. Distances are estimated with per query lookup tables.
+    """
+
+    index_type = "pq"
+
+    def __init__(
+        self,
+        dims: int,
+        distance_metric: str = "cosine",
+        m: int = 64,
+        train_size: int = 4096,
+        rerank: int = 4,
+        kmeans_iterations: int = 10,
+        seed: int = 0,
+    ):
+        if dims % m != 0:
+            raise ValueError(f"Embedding dimension {dims} must be divisible by m={m}")
+        super().__init__(
+            dims=dims,
+            distance_metric=distance_metric,
+            train_size=train_size,
+            rerank=rerank,
+            seed=seed,
+        )
+        self.m = m
+        self.kmeans_iterations = kmeans_iterations
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def code_size(self) -> int:
+        return self.m
+
+    def _fit(self, vectors: np.ndarray, rng: np.random.Generator) -> None:
+        n_clusters = min(256, vectors.shape[0])
+        subvectors = vectors.reshape(vectors.shape[0], self.m, -1)
+        self.codebooks = np.stack(
+            [
+                kmeans(subvectors[:, i], n_clusters, self.kmeans_iterations, rng)
+                for i in range(self.m)
+            ]
+        )
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        subvectors = vectors.reshape(vectors.shape[0], self.m, -1)
+        codes = np.empty((vectors.shape[0], self.m), dtype=np.uint8)
+        sq_norms = np.zeros(vectors.shape[0], dtype=np.float32)
+        for i in range(self.m):
+            codes[:, i] = nearest_centroids(subvectors[:, i], self.codebooks[i])[:, 0]
+            centroids = self.codebooks[i][codes[:, i]]
+            sq_norms += np.sum(centroids * centroids, axis=1)
+        return codes, sq_norms
+
+    def _estimate(self, query: np.ndarray, codes: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        subqueries = query.reshape(self.m, 1, -1)
+        # products[i, c] is the dot product of i-th sub query and c-th centroid of subspace i
+        tables = np.sum(subqueries * self.codebooks, axis=2)
+        # look codes up in the flattened tables, faster than 2d fancy indexing
+        offsets = np.arange(self.m) * self.codebooks.shape[1]
+        products = np.take(tables.ravel(), codes + offsets).sum(axis=1)
+        return to_distances(
+            products[np.newaxis, :],
+            self.distance_metric,
+            queries=query[np.newaxis, :],
+            sq_norms=sq_norms,
+        )[0]
+
+
+class Sq8Index(QuantizedIndex):
+    """
+    Scalar quantization. Each dimension is mapped linearly to 256 levels between its
+    trained minimum and maximum, so an embedding costs one byte per dimension.
+    """
+
+    index_type = "sq8"
+
+    def __init__(
+        self,
+        dims: int,
+        distance_metric: str = "cosine",
+        train_size: int = 4096,
+        rerank: int = 4,
+        seed: int = 0,
+    ):
+        super().__init__(
+            dims=dims,
+            distance_metric=distance_metric,
+            train_size=train_size,
+            rerank=rerank,
+            seed=seed,
+        )
+        self.minimums: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+
+    @property
+    def code_size(self) -> int:
+        return self.dims
+
+    def _fit(self, vectors: np.ndarray, rng: np.random.Generator) -> None:
+        self.minimums = vectors.min(axis=0)
+        self.scales = np.maximum(vectors.max(axis=0) - self.minimums, 1e-12) / 255
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        codes = np.clip(np.rint((vectors - self.minimums) / self.scales), 0, 255).astype(np.uint8)
+        decoded = codes * self.scales + self.minimums
+        return codes, np.sum(decoded * decoded, axis=1)
+
+    def _estimate(self, query: np.ndarray, codes: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        # q . (code * scale + minimum) = code . (q * scale) + q . minimum
+        products = codes.astype(np.float32) @ (query * self.scales) + query @ self.minimums
+        return to_distances(
+            products[np.newaxis, :],
+            self.distance_metric,
+            queries=query[np.newaxis, :],
+            sq_norms=sq_norms,
+        )[0]
+
+
+def build_index(
+    index_type: str, dims: int, distance_metric: str = "cosine", **params: Any
+) -> Index:
+    """
+    Build an empty nearest neighbour index
+    Args:
+        index_type (str): flat (exact), ivf, hnsw, pq or sq8
+        dims (int): dimension of the embeddings
+        distance_metric (str): cosine, euclidean or euclidean_l2
+        params: index specific tunable parameters.
+            ivf: nlist, nprobe, kmeans_iterations, seed
+            hnsw: M, ef_construction, ef_search, seed
+            pq: m, train_size, rerank, kmeans_iterations, seed
+            sq8: train_size, rerank, seed
+    Returns:
+        index (Index)
+    """
+    indexes = {
+        "flat": FlatIndex,
+        "ivf": IvfIndex,
+        "hnsw": HnswIndex,
+        "pq": PqIndex,
+        "sq8": Sq8Index,
+    }
+
+    index = indexes.get(index_type)
+    if index is None:
+        raise ValueError(f"Invalid index_type passed - {index_type}")
+
+    return index(dims=dims, distance_metric=distance_metric, **params)
+
+
+def sync_index(index: Index, items: Dict[str, Union[np.ndarray, list]]) -> bool:
+    """
+    Synchronize an index with the given key to embedding mapping
+    Args:
+        index (Index): index to update in place
+        items (dict): expected content of the index
+    Returns:
+        changed (bool): True if the index is modified
+    """
+    indexed_keys = set(index.keys())
+    expected_keys = set(items.keys())
+
+    removed_keys = list(indexed_keys - expected_keys)
+    added_keys = [key for key in items.keys() if key not in indexed_keys]
+
+    if len(removed_keys) > 0:
+        index.remove(removed_keys)
+    if len(added_keys) > 0:
+        index.add(added_keys, np.asarray([items[key] for key in added_keys], dtype=np.float32))
+
+    return len(removed_keys) > 0 or len(added_keys) > 0
@@ -1,5 +1,6 @@
 # built-in dependencies
-from typing import Any
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 
 # project dependencies
 from deepface.basemodels import (
@@ -14,6 +15,7 @@ from deepface.basemodels import (
     GhostFaceNet
 )
 from deepface.extendedmodels import Age, Gender, Race, Emotion
+from deepface.commons.model_pool import model_pool
 
 
 def build_model(model_name: str) -> Any:
@@ -27,10 +29,25 @@ def build_model(model_name: str) -> Any:
     Returns:
             built model class
     """
+    # built models live in the shared pool, which may drop them under its memory budget
+    return model_pool.get(("model", model_name), lambda: __build(model_name))
 
-    # singleton design pattern
-    global model_obj
 
+@contextmanager
+def use_model(model_name: str) -> Iterator[Any]:
+    """
+    Build a deepface model and keep it in memory while the block runs
+        `with modeling.use_model("Age") as model: ...`, the pool never drops a model in use
+    Args:
+        model_name (str): face recognition or facial attribute model
+    Returns:
+        built model class
+    """
+    with model_pool.use(("model", model_name), lambda: __build(model_name)) as model:
+        yield model
+
+
+def __build(model_name: str) -> Any:
     models = {
         "VGG-Face": VGGFace.VggFaceClient,
         "OpenFace": OpenFace.OpenFaceClient,
@@ -48,14 +65,39 @@ def build_model(model_name: str) -> Any:
         "Race": Race.RaceClient,
     }
 
-    if not "model_obj" in globals():
-        model_obj = {}
+    model = models.get(model_name)
+    if model is None:
+        raise ValueError(f"Invalid model_name passed - {model_name}")
+    return model()
+
+
+def unload_models(model_names: List[str], idle_seconds: Optional[float] = None) -> List[str]:
+    """
+    Drop built models so their weights can be freed, they are built again on next use
+        models in use are kept
+    Args:
+        model_names (list): names of the models to drop
+        idle_seconds (float): only drop the models unused for at least this long,
+            all of them by default
+    Returns:
+        unloaded (list): names of the models that were loaded and got dropped
+    """
+    keys = [("model", name) for name in model_names]
+    if idle_seconds is None:
+        unloaded = model_pool.unload(keys)
+    else:
+        unloaded = model_pool.unload_idle(idle_seconds=idle_seconds, keys=keys)
+    return [name for _, name in unloaded]
 
-    if not model_name in model_obj.keys():
-        model = models.get(model_name)
-        if model:
-            model_obj[model_name] = model()
-        else:
-            raise ValueError(f"Invalid model_name passed - {model_name}")
 
-    return model_obj[model_name]
+def get_model_memory() -> Dict[str, int]:
+    """
+    Estimate the memory held by the weights of each built model
+    Returns:
+        memory (dict): model name to bytes of its float32 parameters, 0 if unknown
+    """
+    return {
+        key.split("/", 1)[1]: stats["bytes"]
+        for key, stats in model_pool.get_stats()["models"].items()
+        if key.startswith("model/")
+    }
@@ -1,7 +1,8 @@
 # built-in dependencies
 import os
 import pickle
-from typing import List, Union, Optional, Dict, Any
+import threading
+from typing import List, Union, Optional, Dict, Any, Tuple
 import time
 
 # 3rd party dependencies
@@ -11,11 +12,23 @@ from tqdm import tqdm
 
 # project dependencies
 from deepface.commons import image_utils
-from deepface.modules import representation, detection, verification
+from deepface.modules import representation, detection, verification, indexing
 from deepface.commons import logger as log
 
 logger = log.get_singletonish_logger()
 
+# representations loaded from pickle files, with the file's properties when they were read
+datastores: Dict[str, Tuple[Tuple[int, int, int], List[Dict[str, Any]]]] = {}
+
+# image directory trackers of pickle files, each pickle file follows the directory on its own
+directory_trackers: Dict[str, image_utils.DirectoryTracker] = {}
+
+# guards datastores, directory_trackers and sync_locks
+datastores_lock = threading.Lock()
+
+# a tracker is not thread safe, so the syncs of each pickle file run one at a time
+sync_locks: Dict[str, threading.Lock] = {}
+
 
 def find(
     img_path: Union[str, np.ndarray],
@@ -30,6 +43,8 @@ def find(
     normalization: str = "base",
     silent: bool = False,
     refresh_database: bool = True,
+    index_type: str = "flat",
+    index_params: Optional[Dict[str, Any]] = None,
 ) -> List[pd.DataFrame]:
     """
     Identify individuals in a database
@@ -72,6 +87,14 @@ def find(
         directory/db files, if set to false, it will ignore any file changes inside the db_path
         directory (default is True).
 
+        index_type (string): nearest neighbour index to search the database with. Options: 'flat'
+            for exact brute force search, 'ivf' or 'hnsw' for approximate search on large
+            databases, 'pq' or 'sq8' for compressed search (default is flat). Approximate
+            indexes are persisted next to the pkl file.
+
+        index_params (dict): tunable parameters of the index. 'k' sets the number of candidates
+            retrieved by approximate indexes (default is 100). ivf: nlist, nprobe.
+            hnsw: M, ef_construction, ef_search. pq: m, rerank. sq8: rerank.
 
     Returns:
         results (List[pd.DataFrame]): A list of pandas dataframes. Each dataframe corresponds
@@ -94,6 +117,141 @@ def find(
 
     tic = time.time()
 
+    datastore_path, representations = sync_datastore(
+        db_path=db_path,
+        model_name=model_name,
+        detector_backend=detector_backend,
+        enforce_detection=enforce_detection,
+        align=align,
+        expand_percentage=expand_percentage,
+        normalization=normalization,
+        silent=silent,
+        refresh_database=refresh_database,
+    )
+    file_name = os.path.basename(datastore_path)
+
+    # Should we have no representations bailout
+    if len(representations) == 0:
+        if not silent:
+            toc = time.time()
+            logger.info(f"find function duration {toc - tic} seconds")
+        return []
+
+    # ----------------------------
+    # now, we got representations for facial database
+    df = pd.DataFrame(representations)
+
+    if silent is False:
+        logger.info(f"Searching {img_path} in {df.shape[0]} length datastore")
+
+    index_params = dict(index_params or {})
+    k = index_params.pop("k", 100)
+    search_index, key_rows = __load_search_index(
+        df=df,
+        datastore_path=datastore_path,
+        index_type=index_type,
+        distance_metric=distance_metric,
+        index_params=index_params,
+        silent=silent,
+    )
+    if index_type == "flat":
+        k = len(key_rows)
+
+    # img path might have more than once face
+    source_objs = detection.extract_faces(
+        img_path=img_path,
+        detector_backend=detector_backend,
+        grayscale=False,
+        enforce_detection=enforce_detection,
+        align=align,
+        expand_percentage=expand_percentage,
+    )
+
+    resp_obj = []
+
+    for source_obj in source_objs:
+        source_img = source_obj["face"]
+        source_region = source_obj["facial_area"]
+        target_embedding_obj = representation.represent(
+            img_path=source_img,
+            model_name=model_name,
+            enforce_detection=enforce_detection,
+            detector_backend="skip",
+            align=align,
+            normalization=normalization,
+        )
+
+        target_representation = target_embedding_obj[0]["embedding"]
+
+        result_df = df.copy()  # df will be filtered in each img
+        result_df["source_x"] = source_region["x"]
+        result_df["source_y"] = source_region["y"]
+        result_df["source_w"] = source_region["w"]
+        result_df["source_h"] = source_region["h"]
+
+        target_dims = len(target_representation)
+        if len(search_index) > 0 and target_dims != search_index.dims:
+            raise ValueError(
+                "Source and target embeddings must have same dimensions but "
+                + f"{target_dims}:{search_index.dims}. Model structure may change"
+                + f" after pickle created. Delete the {file_name} and re-run."
+            )
+
+        # no representation for unmatched images
+        distances = np.full(df.shape[0], float("inf"))
+        if len(search_index) > 0:
+            for key, distance in search_index.search(target_representation, k=k)[0]:
+                distances[key_rows[key]] = distance
+
+        target_threshold = threshold or verification.find_threshold(model_name, distance_metric)
+
+        result_df["threshold"] = target_threshold
+        result_df["distance"] = distances
+
+        result_df = result_df.drop(columns=["embedding"])
+        # pylint: disable=unsubscriptable-object
+        result_df = result_df[result_df["distance"] <= target_threshold]
+        result_df = result_df.sort_values(by=["distance"], ascending=True).reset_index(drop=True)
+
+        resp_obj.append(result_df)
+
+    # -----------------------------------
+
+    if not silent:
+        toc = time.time()
+        logger.info(f"find function duration {toc - tic} seconds")
+
+    return resp_obj
+
+
+def sync_datastore(
+    db_path: str,
+    model_name: str = "VGG-Face",
+    detector_backend: str = "opencv",
+    enforce_detection: bool = True,
+    align: bool = True,
+    expand_percentage: int = 0,
+    normalization: str = "base",
+    silent: bool = False,
+    refresh_database: bool = True,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Load the representations (pkl) file of a database, synchronized with the db_path files
+    Args:
+        db_path (string): Path to the folder containing image files.
+        model_name (str): Model for face recognition.
+        detector_backend (string): face detector backend.
+        enforce_detection (boolean): If no face is detected in an image, raise an exception.
+        align (boolean): Perform alignment based on the eye positions.
+        expand_percentage (int): expand detected facial area with a percentage.
+        normalization (string): Normalize the input image before feeding it to the model.
+        silent (boolean): Suppress or allow some log messages for a quieter analysis process.
+        refresh_database (boolean): Synchronizes the pkl file with the db_path files, if set
+            to false, it will ignore any file changes inside the db_path directory.
+    Returns:
+        result (tuple): path of the pkl file and its representations. Each representation has
+            identity, hash, embedding, target_x, target_y, target_w and target_h keys.
+    """
     if os.path.isdir(db_path) is not True:
         raise ValueError("Passed db_path does not exist!")
 
@@ -111,9 +269,46 @@ def find(
     ]
 
     file_name = "_".join(file_parts) + ".pkl"
-    file_name = file_name.replace("-", "").lower()
+    # ">" of detector cascades is not allowed in file names of some platforms
+    file_name = file_name.replace("-", "").replace(">", "+").lower()
 
     datastore_path = os.path.join(db_path, file_name)
+
+    with datastores_lock:
+        sync_lock = sync_locks.setdefault(datastore_path, threading.Lock())
+
+    with sync_lock:
+        return __sync_representations(
+            db_path=db_path,
+            datastore_path=datastore_path,
+            model_name=model_name,
+            detector_backend=detector_backend,
+            enforce_detection=enforce_detection,
+            align=align,
+            expand_percentage=expand_percentage,
+            normalization=normalization,
+            silent=silent,
+            refresh_database=refresh_database,
+        )
+
+
+def __sync_representations(
+    db_path: str,
+    datastore_path: str,
+    model_name: str,
+    detector_backend: str,
+    enforce_detection: bool,
+    align: bool,
+    expand_percentage: int,
+    normalization: str,
+    silent: bool,
+    refresh_database: bool,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Synchronize a pickle file with the db_path files, see sync_datastore
+        the caller holds the sync lock of the pickle file
+    """
+    file_name = os.path.basename(datastore_path)
     representations = []
 
     # required columns for representations
@@ -132,27 +327,40 @@ def find(
         with open(datastore_path, "wb") as f:
             pickle.dump([], f)
 
-    # Load the representations from the pickle file
-    with open(datastore_path, "rb") as f:
-        representations = pickle.load(f)
+    with datastores_lock:
+        tracker = directory_trackers.get(datastore_path)
+        if tracker is None:
+            tracker = image_utils.DirectoryTracker(db_path)
+            directory_trackers[datastore_path] = tracker
+        cached = datastores.get(datastore_path)
+
+    # representations loaded before are reused while nobody else rewrote the pickle file,
+    # and the tracker's manifest then describes the images they were built from
+    trusted = (
+        cached is not None
+        and cached[0] == __file_props(datastore_path)
+        and tracker.manifest is not None
+    )
 
-    # check each item of representations list has required keys
-    for i, current_representation in enumerate(representations):
-        missing_keys = list(set(df_cols) - set(current_representation.keys()))
-        if len(missing_keys) > 0:
-            raise ValueError(
-                f"{i}-th item does not have some required keys - {missing_keys}."
-                f"Consider to delete {datastore_path}"
-            )
+    if trusted and refresh_database and not tracker.is_dirty():
+        return datastore_path, cached[1]
 
-    # embedded images
-    pickled_images = [representation["identity"] for representation in representations]
+    if trusted:
+        representations = cached[1]
+    else:
+        # Load the representations from the pickle file
+        with open(datastore_path, "rb") as f:
+            representations = pickle.load(f)
 
-    # Get the list of images on storage
-    storage_images = image_utils.list_images(path=db_path)
+        # check each item of representations list has required keys
+        for i, current_representation in enumerate(representations):
+            missing_keys = list(set(df_cols) - set(current_representation.keys()))
+            if len(missing_keys) > 0:
+                raise ValueError(
+                    f"{i}-th item does not have some required keys - {missing_keys}."
+                    f"Consider to delete {datastore_path}"
+                )
 
-    if len(storage_images) == 0 and refresh_database is True:
-        raise ValueError(f"No item found in {db_path}")
     if len(representations) == 0 and refresh_database is False:
         raise ValueError(f"Nothing is found in {datastore_path}")
 
@@ -166,16 +374,27 @@ def find(
             f"Could be some changes in {db_path} not tracked."
             "Set refresh_database to true to assure that any changes will be tracked."
         )
+        __store_datastore(datastore_path, representations)
+        return datastore_path, representations
 
     # Enforce data consistency amongst on disk images and pickle file
-    if refresh_database:
-        new_images = list(set(storage_images) - set(pickled_images))  # images added to storage
-        old_images = list(set(pickled_images) - set(storage_images))  # images removed from storage
+    if trusted:
+        # a single directory scan compared with the previous manifest
+        new_images, old_images, replaced_images = tracker.scan()
+    else:
+        # first sync of this process: compare the whole directory with the pickle file
+        tracker.invalidate()
+        tracker.scan()
+        storage_images = set(tracker.manifest)
+        pickled_images = set(representation["identity"] for representation in representations)
+
+        new_images = list(storage_images - pickled_images)  # images added to storage
+        old_images = list(pickled_images - storage_images)  # images removed from storage
 
         # detect replaced images
         for current_representation in representations:
             identity = current_representation["identity"]
-            if identity in old_images:
+            if identity not in storage_images:
                 continue
             alpha_hash = current_representation["hash"]
             beta_hash = image_utils.find_image_hash(identity)
@@ -183,6 +402,10 @@ def find(
                 logger.debug(f"Even though {identity} represented before, it's replaced later.")
                 replaced_images.append(identity)
 
+    if len(tracker.manifest) == 0:
+        tracker.invalidate()
+        raise ValueError(f"No item found in {db_path}")
+
     if not silent and (len(new_images) > 0 or len(old_images) > 0 or len(replaced_images) > 0):
         logger.info(
             f"Found {len(new_images)} newly added image(s)"
@@ -192,7 +415,7 @@ def find(
 
     # append replaced images into both old and new images. these will be dropped and re-added.
     new_images = new_images + replaced_images
-    old_images = old_images + replaced_images
+    old_images = set(old_images + replaced_images)
 
     # remove old images first
     if len(old_images) > 0:
@@ -201,16 +424,21 @@ def find(
 
     # find representations for new images
     if len(new_images) > 0:
-        representations += __find_bulk_embeddings(
-            employees=new_images,
-            model_name=model_name,
-            detector_backend=detector_backend,
-            enforce_detection=enforce_detection,
-            align=align,
-            expand_percentage=expand_percentage,
-            normalization=normalization,
-            silent=silent,
-        )  # add new images
+        try:
+            representations = representations + __find_bulk_embeddings(
+                employees=new_images,
+                model_name=model_name,
+                detector_backend=detector_backend,
+                enforce_detection=enforce_detection,
+                align=align,
+                expand_percentage=expand_percentage,
+                normalization=normalization,
+                silent=silent,
+            )  # add new images
+        except Exception:
+            # the manifest already moved on, rescan from scratch next time
+            tracker.invalidate()
+            raise
         must_save_pickle = True
 
     if must_save_pickle:
@@ -219,94 +447,110 @@ def find(
         if not silent:
             logger.info(f"There are now {len(representations)} representations in {file_name}")
 
-    # Should we have no representations bailout
-    if len(representations) == 0:
-        if not silent:
-            toc = time.time()
-            logger.info(f"find function duration {toc - tic} seconds")
-        return []
+    __store_datastore(datastore_path, representations)
 
-    # ----------------------------
-    # now, we got representations for facial database
-    df = pd.DataFrame(representations)
+    return datastore_path, representations
 
-    if silent is False:
-        logger.info(f"Searching {img_path} in {df.shape[0]} length datastore")
 
-    # img path might have more than once face
-    source_objs = detection.extract_faces(
-        img_path=img_path,
-        detector_backend=detector_backend,
-        grayscale=False,
-        enforce_detection=enforce_detection,
-        align=align,
-        expand_percentage=expand_percentage,
-    )
-
-    resp_obj = []
-
-    for source_obj in source_objs:
-        source_img = source_obj["face"]
-        source_region = source_obj["facial_area"]
-        target_embedding_obj = representation.represent(
-            img_path=source_img,
-            model_name=model_name,
-            enforce_detection=enforce_detection,
-            detector_backend="skip",
-            align=align,
-            normalization=normalization,
-        )
-
-        target_representation = target_embedding_obj[0]["embedding"]
-
-        result_df = df.copy()  # df will be filtered in each img
-        result_df["source_x"] = source_region["x"]
-        result_df["source_y"] = source_region["y"]
-        result_df["source_w"] = source_region["w"]
-        result_df["source_h"] = source_region["h"]
-
-        distances = []
-        for _, instance in df.iterrows():
-            source_representation = instance["embedding"]
-            if source_representation is None:
-                distances.append(float("inf"))  # no representation for this image
-                continue
+def __store_datastore(datastore_path: str, representations: List[Dict[str, Any]]) -> None:
+    """
+    Keep the representations of a pickle file in memory with the file's current properties
+    Args:
+        datastore_path (str): exact pickle file path
+        representations (list): representations stored in the pickle file
+    """
+    props = __file_props(datastore_path)
+    with datastores_lock:
+        datastores[datastore_path] = (props, representations)
 
-            target_dims = len(list(target_representation))
-            source_dims = len(list(source_representation))
-            if target_dims != source_dims:
-                raise ValueError(
-                    "Source and target embeddings must have same dimensions but "
-                    + f"{target_dims}:{source_dims}. Model structure may change"
-                    + " after pickle created. Delete the {file_name} and re-run."
-                )
 
-            distance = verification.find_distance(
-                source_representation, target_representation, distance_metric
-            )
+def __file_props(file_path: str) -> Tuple[int, int, int]:
+    """
+    Find size, modification time (ns) and inode of a file
+    Args:
+        file_path (str): exact file path
+    Returns:
+        props (tuple)
+    """
+    stats = os.stat(file_path)
+    return stats.st_size, stats.st_mtime_ns, stats.st_ino
 
-            distances.append(distance)
 
-            # ---------------------------
-        target_threshold = threshold or verification.find_threshold(model_name, distance_metric)
+def __load_search_index(
+    df: pd.DataFrame,
+    datastore_path: str,
+    index_type: str,
+    distance_metric: str,
+    index_params: Dict[str, Any],
+    silent: bool = False,
+) -> Tuple[indexing.Index, Dict[str, int]]:
+    """
+    Build the nearest neighbour index of the representations, or load the persisted one and
+    synchronize it with the representations by adding and removing the changed items only
 
-        result_df["threshold"] = target_threshold
-        result_df["distance"] = distances
+    Args:
+        df (pd.DataFrame): representations of the facial database
+        datastore_path (str): exact path of the representations pkl file
+        index_type (str): flat, ivf or hnsw
+        distance_metric (str): cosine, euclidean or euclidean_l2
+        index_params (dict): index specific tunable parameters
+        silent (bool): enable or disable informative logging
+    Returns:
+        search_index (indexing.Index): index of the representations having an embedding
+        key_rows (dict): row of each index key in df
+    """
+    key_rows = {}
+    items = {}
+    for row, instance in enumerate(df.itertuples(index=False)):
+        if instance.embedding is None:
+            continue
+        # hash is a part of the key, so replaced images are re-indexed
+        key = (
+            f"{instance.identity}:{instance.hash}:"
+            f"{instance.target_x}:{instance.target_y}:{instance.target_w}:{instance.target_h}"
+        )
+        key_rows[key] = row
+        items[key] = instance.embedding
 
-        result_df = result_df.drop(columns=["embedding"])
-        # pylint: disable=unsubscriptable-object
-        result_df = result_df[result_df["distance"] <= target_threshold]
-        result_df = result_df.sort_values(by=["distance"], ascending=True).reset_index(drop=True)
+    dims = len(next(iter(items.values()))) if len(items) > 0 else 0
 
-        resp_obj.append(result_df)
+    # exact search is cheap to build, do not persist it
+    if index_type == "flat":
+        search_index = indexing.build_index(index_type, dims, distance_metric, **index_params)
+        indexing.sync_index(search_index, items)
+        return search_index, key_rows
 
-    # -----------------------------------
+    index_path = f"{datastore_path[:-4]}_index_{index_type}_{distance_metric}.pkl"
 
-    if not silent:
-        toc = time.time()
-        logger.info(f"find function duration {toc - tic} seconds")
+    search_index = None
+    if os.path.exists(index_path):
+        try:
+            search_index = indexing.load_index(index_path)
+            if search_index.dims != dims and len(items) > 0:
+                search_index = None
+        except Exception as err:  # pylint: disable=broad-except
+            logger.warn(f"Index {index_path} cannot be loaded, it will be rebuilt: {str(err)}")
+            search_index = None
+
+    if search_index is None:
+        search_index = indexing.build_index(index_type, dims, distance_metric, **index_params)
+    else:
+        search_index.set_params(**index_params)
+
+    if indexing.sync_index(search_index, items) or not os.path.exists(index_path):
+        search_index.save(index_path)
+        if not silent:
+            logger.info(f"There are now {len(search_index)} items in {index_type} index")
+
+    if isinstance(search_index, indexing.QuantizedIndex):
+        # compressed distances are only estimations, re-rank candidates with the embeddings
+        # of the datastore itself: the index keeps codes only, no second float copy
+        embeddings = df["embedding"]
+        search_index.set_refine_source(
+            lambda keys: np.asarray([embeddings.iat[key_rows[key]] for key in keys], dtype=np.float32)
+        )
 
-    return resp_obj
+    return search_index, key_rows
 
 
 def __find_bulk_embeddings(
@@ -318,6 +562,7 @@ def __find_bulk_embeddings(
     expand_percentage: int = 0,
     normalization: str = "base",
     silent: bool = False,
+    batch_size: int = 16,
 ) -> List[Dict["str", Any]]:
     """
     Find embeddings of a list of images
@@ -342,21 +587,21 @@ def __find_bulk_embeddings(
         normalization (bool): normalization technique
 
         silent (bool): enable or disable informative logging
+
+        batch_size (int): number of images sent to the face detector
+            and the facial recognition model at once
     Returns:
         representations (list): pivot list of dict with
             image name, hash, embedding and detected face area's coordinates
     """
     representations = []
-    for employee in tqdm(
-        employees,
-        desc="Finding representations",
-        disable=silent,
-    ):
-        file_hash = image_utils.find_image_hash(employee)
+    with tqdm(total=len(employees), desc="Finding representations", disable=silent) as pbar:
+        for start in range(0, len(employees), batch_size):
+            batch = employees[start : start + batch_size]
 
-        try:
-            img_objs = detection.extract_faces(
-                img_path=employee,
+            # one detector call per batch, images without a face get an empty list
+            batch_img_objs = detection.extract_faces_batch(
+                img_paths=batch,
                 detector_backend=detector_backend,
                 grayscale=False,
                 enforce_detection=enforce_detection,
@@ -364,46 +609,47 @@ def __find_bulk_embeddings(
                 expand_percentage=expand_percentage,
             )
 
-        except ValueError as err:
-            logger.error(f"Exception while extracting faces from {employee}: {str(err)}")
-            img_objs = []
-
-        if len(img_objs) == 0:
-            representations.append(
-                {
-                    "identity": employee,
-                    "hash": file_hash,
-                    "embedding": None,
-                    "target_x": 0,
-                    "target_y": 0,
-                    "target_w": 0,
-                    "target_h": 0,
-                }
-            )
-        else:
-            for img_obj in img_objs:
-                img_content = img_obj["face"]
-                img_region = img_obj["facial_area"]
-                embedding_obj = representation.represent(
-                    img_path=img_content,
+            # one facial recognition model call per batch
+            embedding_objs = iter(
+                representation.represent_faces(
+                    img_objs=[img_obj for img_objs in batch_img_objs for img_obj in img_objs],
                     model_name=model_name,
-                    enforce_detection=enforce_detection,
-                    detector_backend="skip",
-                    align=align,
                     normalization=normalization,
                 )
+            )
 
-                img_representation = embedding_obj[0]["embedding"]
-                representations.append(
-                    {
-                        "identity": employee,
-                        "hash": file_hash,
-                        "embedding": img_representation,
-                        "target_x": img_region["x"],
-                        "target_y": img_region["y"],
-                        "target_w": img_region["w"],
-                        "target_h": img_region["h"],
-                    }
-                )
+            for employee, img_objs in zip(batch, batch_img_objs):
+                file_hash = image_utils.find_image_hash(employee)
+
+                if len(img_objs) == 0:
+                    representations.append(
+                        {
+                            "identity": employee,
+                            "hash": file_hash,
+                            "embedding": None,
+                            "target_x": 0,
+                            "target_y": 0,
+                            "target_w": 0,
+                            "target_h": 0,
+                        }
+                    )
+                    continue
+
+                for img_obj in img_objs:
+                    img_region = img_obj["facial_area"]
+                    img_representation = next(embedding_objs)["embedding"]
+                    representations.append(
+                        {
+                            "identity": employee,
+                            "hash": file_hash,
+                            "embedding": img_representation,
+                            "target_x": img_region["x"],
+                            "target_y": img_region["y"],
+                            "target_w": img_region["w"],
+                            "target_h": img_region["h"],
+                        }
+                    )
+
+            pbar.update(len(batch))
 
     return representations
@@ -1,4 +1,5 @@
 # built-in dependencies
+import time
 from typing import Any, Dict, List, Union
 
 # 3rd party dependencies
@@ -6,8 +7,9 @@ import numpy as np
 
 # project dependencies
 from deepface.commons import image_utils
+from deepface.commons.latency_utils import stage_latency
 from deepface.modules import modeling, detection, preprocessing
-from deepface.models.FacialRecognition import FacialRecognition
+from deepface.models.Embedding import Embedding
 
 
 def represent(
@@ -47,9 +49,10 @@ def represent(
         results (List[Dict[str, Any]]): A list of dictionaries, each containing the
             following fields:
 
-        - embedding (List[float]): Multidimensional vector representing facial features.
+        - embedding (Embedding): Multidimensional float32 vector representing facial features.
             The number of dimensions varies based on the reference model
             (e.g., FaceNet returns 128 dimensions, VGG-Face returns 4096 dimensions).
+            It behaves as a list of floats, call to_list for a plain list.
         - facial_area (dict): Detected facial area by face detection in dictionary format.
             Contains 'x' and 'y' as the left-corner point, and 'w' and 'h'
             as the width and height. If `detector_backend` is set to 'skip', it represents
@@ -57,13 +60,8 @@ def represent(
         - face_confidence (float): Confidence score of face detection. If `detector_backend` is set
             to 'skip', the confidence will be 0 and is nonsensical.
     """
-    resp_objs = []
-
-    model: FacialRecognition = modeling.build_model(model_name)
-
     # ---------------------------------
     # we have run pre-process in verification. so, this can be skipped if it is coming from verify.
-    target_size = model.input_shape
     if detector_backend != "skip":
         img_objs = detection.extract_faces(
             img_path=img_path,
@@ -90,31 +88,67 @@ def represent(
         ]
     # ---------------------------------
 
-    for img_obj in img_objs:
-        img = img_obj["face"]
+    resp_objs = represent_faces(
+        img_objs=img_objs, model_name=model_name, normalization=normalization
+    )
 
-        # rgb to bgr
-        img = img[:, :, ::-1]
+    return resp_objs
 
-        region = img_obj["facial_area"]
-        confidence = img_obj["confidence"]
 
-        # resize to expected shape of ml model
-        img = preprocessing.resize_image(
-            img=img,
-            # thanks to DeepId (!)
-            target_size=(target_size[1], target_size[0]),
-        )
+def represent_faces(
+    img_objs: List[Dict[str, Any]],
+    model_name: str = "VGG-Face",
+    normalization: str = "base",
+) -> List[Dict[str, Any]]:
+    """
+    Represent already extracted faces with a single batched model call.
+
+    Args:
+        img_objs (List[Dict[str, Any]]): faces as returned by extract_faces, each having
+            face (RGB), facial_area and confidence fields. Faces of different images can be mixed.
+
+        model_name (str): Model for face recognition. Options: VGG-Face, Facenet, Facenet512,
+            OpenFace, DeepFace, DeepID, Dlib, ArcFace, SFace and GhostFaceNet
+
+        normalization (string): Normalize the input image before feeding it to the model.
+            Default is base. Options: base, raw, Facenet, Facenet2018, VGGFace, VGGFace2, ArcFace
+
+    Returns:
+        results (List[Dict[str, Any]]): embedding, facial_area and face_confidence
+            of each face in the same order with img_objs.
+    """
+    if len(img_objs) == 0:
+        return []
+
+    # held for the whole batch, so that the model pool cannot drop it midway
+    with modeling.use_model(model_name) as model:
+        target_size = model.input_shape
 
-        # custom normalization
-        img = preprocessing.normalize_input(img=img, normalization=normalization)
+        imgs = []
+        for img_obj in img_objs:
+            # rgb to bgr
+            img = img_obj["face"][:, :, ::-1]
 
-        embedding = model.forward(img)
+            # resize to expected shape of ml model
+            img = preprocessing.resize_image(
+                img=img,
+                # thanks to DeepId (!)
+                target_size=(target_size[1], target_size[0]),
+            )
 
+            # custom normalization
+            imgs.append(preprocessing.normalize_input(img=img, normalization=normalization))
+
+        tic = time.perf_counter()
+        embeddings = model.forward_batch(np.concatenate(imgs, axis=0))
+        stage_latency.record("embedding", (time.perf_counter() - tic) / len(imgs), count=len(imgs))
+
+    resp_objs = []
+    for img_obj, embedding in zip(img_objs, embeddings):
         resp_obj = {}
-        resp_obj["embedding"] = embedding
-        resp_obj["facial_area"] = region
-        resp_obj["face_confidence"] = confidence
+        resp_obj["embedding"] = Embedding(embedding, model_name=model_name)
+        resp_obj["facial_area"] = img_obj["facial_area"]
+        resp_obj["face_confidence"] = img_obj["confidence"]
         resp_objs.append(resp_obj)
 
     return resp_objs
@@ -1,7 +1,9 @@
 # built-in dependencies
 import os
 import time
-from typing import List, Tuple, Optional
+import threading
+import queue
+from typing import Any, Dict, Iterator, List, Tuple, Optional, Union
 
 # 3rd party dependencies
 import numpy as np
@@ -10,6 +12,8 @@ import cv2
 
 # project dependencies
 from deepface import DeepFace
+from deepface.modules import recognition, representation, verification
+from deepface.commons import image_utils
 from deepface.commons import logger as log
 
 logger = log.get_singletonish_logger()
@@ -21,6 +25,23 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
 IDENTIFIED_IMG_SIZE = 112
 TEXT_COLOR = (255, 255, 255)
 
+# min intersection over union to match a detected facial area with a tracked face
+TRACK_IOU_THRESHOLD = 0.3
+
+# a tracked face not found in db_path is looked up again on a detector frame at least
+# this many frames after its last lookup, e.g. in case it was registered meanwhile
+IDENTITY_RETRY_FRAMES = 30
+
+# min seconds between two checks of a gallery's db_path for changes
+GALLERY_REFRESH_INTERVAL = 5.0
+
+# in-memory galleries, keyed by db_path, model name, detector backend and distance metric
+galleries: Dict[Tuple[str, str, str, str], "Gallery"] = {}
+galleries_lock = threading.Lock()
+
+# end of stream marker passed through the queues of the headless pipeline
+END_OF_STREAM = None
+
 
 def analysis(
     db_path: str,
@@ -31,6 +52,7 @@ def analysis(
     source=0,
     time_threshold=5,
     frame_threshold=5,
+    detection_interval=1,
 ):
     """
     Run real time face recognition and facial attribute analysis
@@ -57,19 +79,22 @@ def analysis(
         time_threshold (int): The time threshold (in seconds) for face recognition (default is 5).
 
         frame_threshold (int): The frame threshold for face recognition (default is 5).
+
+        detection_interval (int): run the face detector every detection_interval frames and
+            track the faces in the frames between (default is 1, detect on every frame).
+            Identity and demography results are kept per tracked face.
     Returns:
         None
     """
     # initialize models
     build_demography_models(enable_face_analysis=enable_face_analysis)
     build_facial_recognition_model(model_name=model_name)
-    # call a dummy find function for db_path once to create embeddings before starting webcam
-    _ = search_identity(
-        detected_face=np.zeros([224, 224, 3]),
+    # load the facial database into memory once before starting webcam
+    _ = get_gallery(
         db_path=db_path,
+        model_name=model_name,
         detector_backend=detector_backend,
         distance_metric=distance_metric,
-        model_name=model_name,
     )
 
     freezed_img = None
@@ -77,6 +102,10 @@ def analysis(
     num_frames_with_faces = 0
     tic = time.time()
 
+    face_tracker = FaceTracker(
+        detector_backend=detector_backend, detection_interval=detection_interval
+    )
+
     cap = cv2.VideoCapture(source)  # webcam
     while True:
         has_frame, img = cap.read()
@@ -89,7 +118,8 @@ def analysis(
 
         faces_coordinates = []
         if freeze is False:
-            faces_coordinates = grab_facial_areas(img=img, detector_backend=detector_backend)
+            tracks = face_tracker.update(img=img)
+            faces_coordinates = [track.box for track in tracks]
 
             # we will pass img to analyze modules (identity, demography) and add some illustrations
             # that is why, we will not be able to extract detected face from img clearly
@@ -116,6 +146,7 @@ def analysis(
                     img=raw_img,
                     faces_coordinates=faces_coordinates,
                     detected_faces=detected_faces,
+                    tracks=tracks,
                 )
                 # facial recogntion analysis
                 img = perform_facial_recognition(
@@ -126,6 +157,7 @@ def analysis(
                     detector_backend=detector_backend,
                     distance_metric=distance_metric,
                     model_name=model_name,
+                    tracks=tracks,
                 )
 
                 # freeze the img after analysis
@@ -154,6 +186,287 @@ def analysis(
     cv2.destroyAllWindows()
 
 
+def headless_analysis(
+    source: Any,
+    db_path: str = "",
+    model_name: str = "VGG-Face",
+    detector_backend: str = "opencv",
+    distance_metric: str = "cosine",
+    enable_face_analysis: bool = False,
+    detection_interval: int = 1,
+    queue_size: int = 8,
+    drop_frames: bool = True,
+    max_frames: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run face recognition and facial attribute analysis on a video without a display
+        capture, detection and embedding run on their own threads connected with bounded
+        queues. when detection falls behind, capture drops the oldest waiting frame
+        instead of blocking (unless drop_frames is False, e.g. to process every frame
+        of a file).
+
+    Args:
+        source (Any): video file, stream url (e.g. rtsp) or camera index.
+
+        db_path (string): Path to the folder containing image files. Empty to skip facial
+            recognition (default is empty).
+
+        model_name (str): Model for face recognition. Options: VGG-Face, Facenet, Facenet512,
+            OpenFace, DeepFace, DeepID, Dlib, ArcFace, SFace and GhostFaceNet (default is VGG-Face).
+
+        detector_backend (string): face detector backend. Options: 'opencv', 'retinaface',
+            'mtcnn', 'ssd', 'dlib', 'mediapipe', 'yolov8', 'centerface' or 'skip'
+            (default is opencv).
+
+        distance_metric (string): Metric for measuring similarity. Options: 'cosine',
+            'euclidean', 'euclidean_l2' (default is cosine).
+
+        enable_face_analysis (bool): Flag to enable age, gender and emotion analysis
+            (default is False).
+
+        detection_interval (int): run the face detector every detection_interval frames and
+            track the faces in the frames between (default is 1).
+
+        queue_size (int): capacity of each queue between stages (default is 8).
+
+        drop_frames (bool): drop frames under backpressure (default is True).
+
+        max_frames (int): stop after reading this many frames (default is None, read all).
+
+    Returns:
+        results (Iterator[dict]): a JSON serializable result for each analyzed frame with
+            keys frame, timestamp_ms, latency_ms, dropped_frames and faces. Each face has
+            track_id, box (x, y, w, h), identity, distance and attributes.
+    """
+    if db_path:
+        build_facial_recognition_model(model_name=model_name)
+        _ = get_gallery(
+            db_path=db_path,
+            model_name=model_name,
+            detector_backend=detector_backend,
+            distance_metric=distance_metric,
+        )
+    if enable_face_analysis:
+        build_demography_models(enable_face_analysis=True)
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video source {source}")
+
+    frames: queue.Queue = queue.Queue(maxsize=queue_size)
+    detections: queue.Queue = queue.Queue(maxsize=queue_size)
+    results: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    stats = {"dropped_frames": 0}
+
+    def put(target: queue.Queue, item: Any) -> None:
+        # blocks while the next stage is busy, but gives up once the pipeline stops
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def take(source: queue.Queue) -> Any:
+        while not stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return END_OF_STREAM
+
+    def capture() -> None:
+        frame_idx = 0
+        try:
+            while not stop.is_set() and (max_frames is None or frame_idx < max_frames):
+                has_frame, img = cap.read()
+                if not has_frame:
+                    break
+                item = (frame_idx, time.time(), img)
+                frame_idx += 1
+                if not drop_frames:
+                    put(frames, item)
+                    continue
+                while True:
+                    try:
+                        frames.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            frames.get_nowait()
+                            stats["dropped_frames"] += 1
+                        except queue.Empty:
+                            pass
+        except Exception as err:  # pylint: disable=broad-except
+            # every stage passes errors downstream, the caller re-raises them
+            put(frames, err)
+        finally:
+            cap.release()
+            put(frames, END_OF_STREAM)
+
+    def detect() -> None:
+        try:
+            face_tracker = FaceTracker(
+                detector_backend=detector_backend, detection_interval=detection_interval
+            )
+            while True:
+                item = take(frames)
+                if item is END_OF_STREAM:
+                    break
+                if isinstance(item, Exception):
+                    put(detections, item)
+                    break
+                frame_idx, captured_at, img = item
+                tracks = face_tracker.update(img=img)
+                # boxes are copied now, the tracker moves them in the next frames
+                tracked_boxes = [(t, t.box) for t in tracks]
+                put(detections, (frame_idx, captured_at, img, face_tracker.detected, tracked_boxes))
+        except Exception as err:  # pylint: disable=broad-except
+            put(detections, err)
+        finally:
+            put(detections, END_OF_STREAM)
+
+    def embed() -> None:
+        try:
+            while True:
+                item = take(detections)
+                if item is END_OF_STREAM:
+                    break
+                if isinstance(item, Exception):
+                    put(results, item)
+                    break
+                frame_idx, captured_at, img, detected, tracked_boxes = item
+                faces = [
+                    analyze_tracked_face(
+                        img=img,
+                        track=track,
+                        box=box,
+                        frame_idx=frame_idx,
+                        detected=detected,
+                        db_path=db_path,
+                        model_name=model_name,
+                        detector_backend=detector_backend,
+                        distance_metric=distance_metric,
+                        enable_face_analysis=enable_face_analysis,
+                    )
+                    for track, box in tracked_boxes
+                ]
+                put(
+                    results,
+                    {
+                        "frame": frame_idx,
+                        "timestamp_ms": round(captured_at * 1000, 3),
+                        "latency_ms": round((time.time() - captured_at) * 1000, 3),
+                        "dropped_frames": stats["dropped_frames"],
+                        "faces": faces,
+                    },
+                )
+        except Exception as err:  # surface the error to the caller instead of hanging
+            put(results, err)
+        finally:
+            put(results, END_OF_STREAM)
+
+    workers = [
+        threading.Thread(target=stage, name=f"deepface-stream-{stage.__name__}", daemon=True)
+        for stage in (capture, detect, embed)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        while True:
+            result = results.get()
+            if result is END_OF_STREAM:
+                break
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(timeout=1)
+
+
+def analyze_tracked_face(
+    img: np.ndarray,
+    track: "FaceTrack",
+    box: Tuple[int, int, int, int],
+    db_path: str,
+    model_name: str,
+    detector_backend: str,
+    distance_metric: str,
+    enable_face_analysis: bool,
+    frame_idx: int = 0,
+    detected: bool = True,
+) -> Dict[str, Any]:
+    """
+    Find identity and attributes of a tracked face, reusing the results of its track
+        a face not found in db_path is not looked up again in every frame, see
+        FaceTrack.should_look_up
+    Args:
+        img (np.ndarray): frame itself
+        track (FaceTrack): tracked face
+        box (tuple): facial area of the face in this frame as x, y, w and h
+        db_path (string): Path to the folder containing image files. Empty to skip facial
+            recognition.
+        model_name (str): Model for face recognition.
+        detector_backend (string): face detector backend.
+        distance_metric (string): Metric for measuring similarity.
+        enable_face_analysis (bool): Flag to enable age, gender and emotion analysis.
+        frame_idx (int): index of the frame
+        detected (bool): the box was found by the detector in this frame, not tracked
+    Returns:
+        result (dict): track_id, box, identity, distance and attributes of the face
+    """
+    x, y, w, h = box
+    detected_face = None
+
+    if db_path and track.identity is None and track.should_look_up(frame_idx, detected):
+        detected_face = img[int(y) : int(y + h), int(x) : int(x + w)]
+        target_path, distance = find_identity(
+            detected_face=detected_face,
+            db_path=db_path,
+            model_name=model_name,
+            detector_backend=detector_backend,
+            distance_metric=distance_metric,
+        )
+        if target_path is not None:
+            track.identity = (target_path.split("/")[-1], None)
+            track.distance = distance
+        else:
+            track.identity_checked_at = frame_idx
+
+    if enable_face_analysis and track.demography is None:
+        if detected_face is None:
+            detected_face = img[int(y) : int(y + h), int(x) : int(x + w)]
+        demographies = DeepFace.analyze(
+            img_path=detected_face,
+            actions=("age", "gender", "emotion"),
+            detector_backend="skip",
+            enforce_detection=False,
+            silent=True,
+        )
+        if len(demographies) > 0:
+            track.demography = demographies[0]
+
+    attributes = None
+    if track.demography is not None:
+        attributes = {
+            "age": int(track.demography["age"]),
+            "gender": track.demography["dominant_gender"],
+            "emotion": track.demography["dominant_emotion"],
+        }
+
+    return {
+        "track_id": track.track_id,
+        "box": {"x": int(x), "y": int(y), "w": int(w), "h": int(h)},
+        "identity": track.identity[0] if track.identity is not None else None,
+        "distance": track.distance,
+        "attributes": attributes,
+    }
+
+
 def build_facial_recognition_model(model_name: str) -> None:
     """
     Build facial recognition model
@@ -167,6 +480,40 @@ def build_facial_recognition_model(model_name: str) -> None:
     logger.info(f"{model_name} is built")
 
 
+def find_identity(
+    detected_face: np.ndarray,
+    db_path: str,
+    model_name: str,
+    detector_backend: str,
+    distance_metric: str,
+) -> Tuple[Optional[str], Optional[float]]:
+    """
+    Find the closest identity of a face in facial database.
+    Args:
+        detected_face (np.ndarray): extracted individual facial image
+        db_path (string): Path to the folder containing image files. All detected faces
+            in the database will be considered in the decision-making process.
+        model_name (str): Model for face recognition. Options: VGG-Face, Facenet, Facenet512,
+            OpenFace, DeepFace, DeepID, Dlib, ArcFace, SFace and GhostFaceNet (default is VGG-Face).
+        detector_backend (string): face detector backend. Options: 'opencv', 'retinaface',
+            'mtcnn', 'ssd', 'dlib', 'mediapipe', 'yolov8', 'centerface' or 'skip'
+            (default is opencv).
+        distance_metric (string): Metric for measuring similarity. Options: 'cosine',
+            'euclidean', 'euclidean_l2' (default is cosine).
+    Returns:
+        result (tuple): result consisting of following objects
+            identified image path (str), None if the face is not in the database
+            distance to the identified image (float)
+    """
+    gallery = get_gallery(
+        db_path=db_path,
+        model_name=model_name,
+        detector_backend=detector_backend,
+        distance_metric=distance_metric,
+    )
+    return gallery.identify(detected_face)
+
+
 def search_identity(
     detected_face: np.ndarray,
     db_path: str,
@@ -192,61 +539,232 @@ def search_identity(
             identified image path (str)
             identified image itself (np.ndarray)
     """
-    target_path = None
-    try:
-        dfs = DeepFace.find(
-            img_path=detected_face,
-            db_path=db_path,
-            model_name=model_name,
-            detector_backend=detector_backend,
-            distance_metric=distance_metric,
-            enforce_detection=False,
-            silent=True,
-        )
-    except ValueError as err:
-        if f"No item found in {db_path}" in str(err):
-            logger.warn(
-                f"No item is found in {db_path}."
-                "So, no facial recognition analysis will be performed."
-            )
-            dfs = []
-        else:
-            raise err
-    if len(dfs) == 0:
+    gallery = get_gallery(
+        db_path=db_path,
+        model_name=model_name,
+        detector_backend=detector_backend,
+        distance_metric=distance_metric,
+    )
+    target_path, _ = gallery.identify(detected_face)
+    if target_path is None:
         # you may consider to return unknown person's image here
         return None, None
 
-    # detected face is coming from parent, safe to access 1st index
-    df = dfs[0]
+    logger.info(f"Hello, {target_path}")
+    return target_path.split("/")[-1], gallery.thumbnail(target_path)
 
-    if df.shape[0] == 0:
-        return None, None
 
-    candidate = df.iloc[0]
-    target_path = candidate["identity"]
-    logger.info(f"Hello, {target_path}")
+def get_gallery(
+    db_path: str, model_name: str, detector_backend: str, distance_metric: str
+) -> "Gallery":
+    """
+    Get the in-memory gallery of a facial database, loading it on first use
+    Args:
+        db_path (string): Path to the folder containing image files.
+        model_name (str): Model for face recognition.
+        detector_backend (string): face detector backend.
+        distance_metric (string): Metric for measuring similarity.
+    Returns:
+        gallery (Gallery)
+    """
+    key = (db_path, model_name, detector_backend, distance_metric)
+    with galleries_lock:
+        gallery = galleries.get(key)
+        if gallery is None:
+            gallery = Gallery(
+                db_path=db_path,
+                model_name=model_name,
+                detector_backend=detector_backend,
+                distance_metric=distance_metric,
+            )
+            galleries[key] = gallery
+    return gallery
 
-    # load found identity image - extracted if possible
-    target_objs = DeepFace.extract_faces(
-        img_path=target_path,
-        detector_backend=detector_backend,
-        enforce_detection=False,
-        align=True,
-    )
 
-    # extract facial area of the identified image if and only if it has one face
-    # otherwise, show image as is
-    if len(target_objs) == 1:
-        # extract 1st item directly
-        target_obj = target_objs[0]
-        target_img = target_obj["face"]
-        target_img = cv2.resize(target_img, (IDENTIFIED_IMG_SIZE, IDENTIFIED_IMG_SIZE))
-        target_img *= 255
-        target_img = target_img[:, :, ::-1]
-    else:
-        target_img = cv2.imread(target_path)
+class Gallery:
+    """
+    Facial database held in memory as an embedding matrix for identity queries.
+        instead of running DeepFace.find for each face, the representations of db_path are
+        loaded once and each query is a single vectorized distance computation. db_path is
+        followed by a directory tracker (inotify or a scan of image sizes and modification
+        times, no decoding or hashing) at most every refresh_interval seconds, and reloaded
+        when its images change.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        model_name: str,
+        detector_backend: str,
+        distance_metric: str,
+        refresh_interval: float = GALLERY_REFRESH_INTERVAL,
+    ):
+        """
+        Args:
+            db_path (string): Path to the folder containing image files.
+            model_name (str): Model for face recognition.
+            detector_backend (string): face detector backend.
+            distance_metric (string): Metric for measuring similarity.
+            refresh_interval (float): min seconds between two checks of db_path for changes
+        """
+        self.db_path = db_path
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.distance_metric = distance_metric
+        self.refresh_interval = refresh_interval
+        self.threshold = verification.find_threshold(model_name, distance_metric)
+
+        # identities and their embeddings are swapped together, readers take both at once
+        self._data: Tuple[List[str], Optional[np.ndarray]] = ([], None)
+        self._thumbnails: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        # its own tracker: the datastore's one is consumed by sync_datastore
+        self._tracker = image_utils.DirectoryTracker(db_path)
+        self._loaded = False
+        self._checked_at = 0.0
+
+        self.refresh(force=True)
+
+    def __len__(self) -> int:
+        return len(self._data[0])
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the gallery if db_path changed since the last load
+        Args:
+            force (bool): check db_path now, even if refresh_interval has not passed
+        Returns:
+            reloaded (bool): True if the gallery was reloaded
+        """
+        now = time.time()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return False
+
+        with self._lock:
+            if not force and now - self._checked_at < self.refresh_interval:
+                return False
+            self._checked_at = now
+
+            if self._loaded and not self._tracker.is_dirty():
+                return False
+            changes = self._tracker.scan()
+            if self._loaded and not any(changes):
+                return False
+
+            try:
+                _, representations = recognition.sync_datastore(
+                    db_path=self.db_path,
+                    model_name=self.model_name,
+                    detector_backend=self.detector_backend,
+                    enforce_detection=False,
+                    silent=True,
+                )
+            except Exception as err:
+                if f"No item found in {self.db_path}" not in str(err):
+                    # the changes were not loaded, look at the whole directory next time
+                    self._tracker.invalidate()
+                    raise err
+                logger.warn(
+                    f"No item is found in {self.db_path}."
+                    "So, no facial recognition analysis will be performed."
+                )
+                representations = []
+
+            representations = [rep for rep in representations if rep["embedding"] is not None]
+            identities = [rep["identity"] for rep in representations]
+            embeddings = (
+                np.asarray([rep["embedding"] for rep in representations], dtype=np.float32)
+                if len(representations) > 0
+                else None
+            )
+
+            self._data = (identities, embeddings)
+            # images might be replaced, their thumbnails are extracted again on demand
+            self._thumbnails = {}
+            self._loaded = True
+            logger.debug(f"{len(identities)} faces loaded from {self.db_path}")
+            return True
+
+    def search(
+        self, embedding: Union[np.ndarray, List[float]]
+    ) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Find the closest identity of an embedding
+        Args:
+            embedding (np.ndarray or list): embedding of a face
+        Returns:
+            result (tuple): identified image path and its distance, or (None, None) if no
+                image is closer than the threshold
+        """
+        self.refresh()
+        identities, embeddings = self._data
+        if embeddings is None:
+            return None, None
+
+        distances = verification.find_distance_matrix(
+            embedding, embeddings, self.distance_metric
+        )[0]
+        best = int(np.argmin(distances))
+        if distances[best] > self.threshold:
+            return None, None
+        return identities[best], float(distances[best])
+
+    def identify(self, detected_face: np.ndarray) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Represent a face and find its closest identity
+        Args:
+            detected_face (np.ndarray): extracted individual facial image
+        Returns:
+            result (tuple): identified image path and its distance, or (None, None)
+        """
+        if len(self) == 0 and not self.refresh():
+            return None, None
+
+        embedding_objs = representation.represent(
+            img_path=detected_face,
+            model_name=self.model_name,
+            detector_backend=self.detector_backend,
+            enforce_detection=False,
+        )
+        if len(embedding_objs) == 0:
+            return None, None
+        return self.search(embedding_objs[0]["embedding"])
+
+    def thumbnail(self, identity: str) -> np.ndarray:
+        """
+        Get the face of an identified image to overlay, extracted once per identity
+        Args:
+            identity (str): identified image path
+        Returns:
+            target_img (np.ndarray): facial area of the image, or the image itself if it has
+                no face or more than one
+        """
+        target_img = self._thumbnails.get(identity)
+        if target_img is not None:
+            return target_img
+
+        # load found identity image - extracted if possible
+        target_objs = DeepFace.extract_faces(
+            img_path=identity,
+            detector_backend=self.detector_backend,
+            enforce_detection=False,
+            align=True,
+        )
+
+        # extract facial area of the identified image if and only if it has one face
+        # otherwise, show image as is
+        if len(target_objs) == 1:
+            # extract 1st item directly
+            target_obj = target_objs[0]
+            target_img = target_obj["face"]
+            target_img = cv2.resize(target_img, (IDENTIFIED_IMG_SIZE, IDENTIFIED_IMG_SIZE))
+            target_img *= 255
+            target_img = target_img[:, :, ::-1]
+        else:
+            target_img = cv2.imread(identity)
 
-    return target_path.split("/")[-1], target_img
+        self._thumbnails[identity] = target_img
+        return target_img
 
 
 def build_demography_models(enable_face_analysis: bool) -> None:
@@ -398,6 +916,218 @@ def extract_facial_areas(
     return detected_faces
 
 
+class TemplateTracker:
+    """
+    Lightweight single face tracker matching the face's gray template around its last box
+    """
+
+    def __init__(
+        self,
+        gray: np.ndarray,
+        box: Tuple[int, int, int, int],
+        template_size: int = 48,
+        search_margin: float = 0.5,
+        min_score: float = 0.5,
+    ):
+        """
+        Args:
+            gray (np.ndarray): gray scale frame the face was detected in
+            box (tuple): detected facial area as x, y, w and h
+            template_size (int): longest side of the downscaled face template
+            search_margin (float): search window margin around the last box, relative
+                to the face size
+            min_score (float): min normalized correlation to consider the face found
+        """
+        x, y, w, h = box
+        self.box = box
+        self.search_margin = search_margin
+        self.min_score = min_score
+        self.scale = min(1.0, template_size / max(w, h, 1))
+        self.template = self.__resize(gray[y : y + h, x : x + w])
+
+    def __resize(self, img: np.ndarray) -> np.ndarray:
+        if self.scale == 1.0:
+            return img
+        size = (max(1, round(img.shape[1] * self.scale)), max(1, round(img.shape[0] * self.scale)))
+        return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+    def update(self, gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Find the face in a new frame
+        Args:
+            gray (np.ndarray): gray scale frame
+        Returns:
+            box (tuple): new facial area as x, y, w and h, or None if the face is lost
+        """
+        x, y, w, h = self.box
+        margin_x = int(w * self.search_margin)
+        margin_y = int(h * self.search_margin)
+        x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+        x1, y1 = min(gray.shape[1], x + w + margin_x), min(gray.shape[0], y + h + margin_y)
+
+        region = self.__resize(gray[y0:y1, x0:x1])
+        if region.shape[0] < self.template.shape[0] or region.shape[1] < self.template.shape[1]:
+            return None
+
+        scores = cv2.matchTemplate(region, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(scores)
+        if score < self.min_score:
+            return None
+
+        self.box = (
+            x0 + int(round(location[0] / self.scale)),
+            y0 + int(round(location[1] / self.scale)),
+            w,
+            h,
+        )
+        return self.box
+
+
+class FaceTrack:
+    """
+    A face followed across frames, with its analysis results cached
+    """
+
+    def __init__(self, track_id: int, box: Tuple[int, int, int, int], tracker: Any):
+        self.track_id = track_id
+        self.box = box
+        self.tracker = tracker
+        # (label, identified image) found by facial recognition
+        self.identity: Optional[Tuple[str, np.ndarray]] = None
+        # distance between the face and its identified image
+        self.distance: Optional[float] = None
+        # demography found by facial attribute analysis
+        self.demography: Optional[Dict[str, Any]] = None
+        # frame of the last lookup that did not find the face in db_path
+        self.identity_checked_at: Optional[int] = None
+
+    def should_look_up(self, frame_idx: int, detected: bool) -> bool:
+        """
+        Check whether the identity of an unknown face is looked up in a frame
+            the first time it is, then only on detector frames IDENTITY_RETRY_FRAMES after
+            its last lookup
+        Args:
+            frame_idx (int): index of the frame
+            detected (bool): the box was found by the detector in this frame
+        Returns:
+            result (bool)
+        """
+        if self.identity_checked_at is None:
+            return True
+        return detected and frame_idx - self.identity_checked_at >= IDENTITY_RETRY_FRAMES
+
+
+class FaceTracker:
+    """
+    Detect faces every detection_interval frames and track them in the frames between.
+        detections are matched with existing tracks by intersection over union, so that
+        a face keeps its track id, identity and demography while it stays in the scene.
+    """
+
+    def __init__(self, detector_backend: str, detection_interval: int = 1):
+        """
+        Args:
+            detector_backend (string): face detector backend
+            detection_interval (int): run the detector every detection_interval frames
+        """
+        self.detector_backend = detector_backend
+        self.detection_interval = max(int(detection_interval), 1)
+        self.tracks: List[FaceTrack] = []
+        self.frame_idx = 0
+        self.next_track_id = 0
+        # the last update ran the detector, instead of only tracking
+        self.detected = False
+
+    def update(self, img: np.ndarray) -> List[FaceTrack]:
+        """
+        Find the faces of the next frame
+        Args:
+            img (np.ndarray): frame itself
+        Returns:
+            tracks (list): faces in the frame
+        """
+        detect = self.frame_idx % self.detection_interval == 0
+        self.frame_idx += 1
+        self.detected = detect
+
+        if detect:
+            faces_coordinates = grab_facial_areas(img=img, detector_backend=self.detector_backend)
+            self.tracks = self.__match(faces_coordinates)
+            if self.detection_interval > 1 and len(self.tracks) > 0:
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                for track in self.tracks:
+                    track.tracker = TemplateTracker(gray=gray, box=track.box)
+            return self.tracks
+
+        if len(self.tracks) > 0:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            alive = []
+            for track in self.tracks:
+                box = track.tracker.update(gray)
+                if box is not None:
+                    track.box = box
+                    alive.append(track)
+            self.tracks = alive
+        return self.tracks
+
+    def __match(self, faces_coordinates: List[Tuple[int, int, int, int]]) -> List[FaceTrack]:
+        """
+        Match detected facial areas with current tracks, greedily by intersection over union
+        Args:
+            faces_coordinates (list): detected facial areas as x, y, w and h
+        Returns:
+            tracks (list): tracks of detected facial areas in the same order
+        """
+        pairs = sorted(
+            (
+                (intersection_over_union(track.box, box), track_idx, box_idx)
+                for track_idx, track in enumerate(self.tracks)
+                for box_idx, box in enumerate(faces_coordinates)
+            ),
+            reverse=True,
+        )
+
+        matched: Dict[int, FaceTrack] = {}
+        used_tracks = set()
+        for iou, track_idx, box_idx in pairs:
+            if iou < TRACK_IOU_THRESHOLD:
+                break
+            if track_idx in used_tracks or box_idx in matched:
+                continue
+            used_tracks.add(track_idx)
+            matched[box_idx] = self.tracks[track_idx]
+
+        tracks = []
+        for box_idx, box in enumerate(faces_coordinates):
+            track = matched.get(box_idx)
+            if track is None:
+                track = FaceTrack(track_id=self.next_track_id, box=box, tracker=None)
+                self.next_track_id += 1
+            track.box = box
+            tracks.append(track)
+        return tracks
+
+
+def intersection_over_union(
+    box_a: Tuple[int, int, int, int], box_b: Tuple[int, int, int, int]
+) -> float:
+    """
+    Find intersection over union of two boxes
+    Args:
+        box_a (tuple): x, y, w and h of the 1st box
+        box_b (tuple): x, y, w and h of the 2nd box
+    Returns:
+        iou (float)
+    """
+    xa, ya, wa, ha = box_a
+    xb, yb, wb, hb = box_b
+    inter_w = max(0, min(xa + wa, xb + wb) - max(xa, xb))
+    inter_h = max(0, min(ya + ha, yb + hb) - max(ya, yb))
+    intersection = inter_w * inter_h
+    union = wa * ha + wb * hb - intersection
+    return intersection / union if union > 0 else 0.0
+
+
 def perform_facial_recognition(
     img: np.ndarray,
     detected_faces: List[np.ndarray],
@@ -406,6 +1136,7 @@ def perform_facial_recognition(
     detector_backend: str,
     distance_metric: str,
     model_name: str,
+    tracks: Optional[List["FaceTrack"]] = None,
 ) -> np.ndarray:
     """
     Perform facial recognition
@@ -423,18 +1154,26 @@ def perform_facial_recognition(
             'euclidean', 'euclidean_l2' (default is cosine).
         model_name (str): Model for face recognition. Options: VGG-Face, Facenet, Facenet512,
             OpenFace, DeepFace, DeepID, Dlib, ArcFace, SFace and GhostFaceNet (default is VGG-Face).
+        tracks (list): tracked faces of faces_coordinates. Identities already found for a
+            track are reused instead of searched again.
     Returns:
         img (np.ndarray): image with identified face informations
     """
     for idx, (x, y, w, h) in enumerate(faces_coordinates):
-        detected_face = detected_faces[idx]
-        target_label, target_img = search_identity(
-            detected_face=detected_face,
-            db_path=db_path,
-            detector_backend=detector_backend,
-            distance_metric=distance_metric,
-            model_name=model_name,
-        )
+        track = tracks[idx] if tracks is not None else None
+        if track is not None and track.identity is not None:
+            target_label, target_img = track.identity
+        else:
+            detected_face = detected_faces[idx]
+            target_label, target_img = search_identity(
+                detected_face=detected_face,
+                db_path=db_path,
+                detector_backend=detector_backend,
+                distance_metric=distance_metric,
+                model_name=model_name,
+            )
+            if track is not None and target_label is not None:
+                track.identity = (target_label, target_img)
         if target_label is None:
             continue
 
@@ -456,6 +1195,7 @@ def perform_demography_analysis(
     img: np.ndarray,
     faces_coordinates: List[Tuple[int, int, int, int]],
     detected_faces: List[np.ndarray],
+    tracks: Optional[List["FaceTrack"]] = None,
 ) -> np.ndarray:
     """
     Perform demography analysis on given image
@@ -465,26 +1205,34 @@ def perform_demography_analysis(
         faces_coordinates (list): list of face coordinates as tuple with
             x, y, w and h values
         detected_faces (list): list of extracted detected face images as numpy
+        tracks (list): tracked faces of faces_coordinates. Demographies already analyzed
+            for a track are reused instead of analyzed again.
     Returns:
         img (np.ndarray): image with analyzed demography information
     """
     if enable_face_analysis is False:
         return img
     for idx, (x, y, w, h) in enumerate(faces_coordinates):
-        detected_face = detected_faces[idx]
-        demographies = DeepFace.analyze(
-            img_path=detected_face,
-            actions=("age", "gender", "emotion"),
-            detector_backend="skip",
-            enforce_detection=False,
-            silent=True,
-        )
+        track = tracks[idx] if tracks is not None else None
+        if track is not None and track.demography is not None:
+            demography = track.demography
+        else:
+            detected_face = detected_faces[idx]
+            demographies = DeepFace.analyze(
+                img_path=detected_face,
+                actions=("age", "gender", "emotion"),
+                detector_backend="skip",
+                enforce_detection=False,
+                silent=True,
+            )
 
-        if len(demographies) == 0:
-            continue
+            if len(demographies) == 0:
+                continue
 
-        # safe to access 1st index because detector backend is skip
-        demography = demographies[0]
+            # safe to access 1st index because detector backend is skip
+            demography = demographies[0]
+            if track is not None:
+                track.demography = demography
 
         img = overlay_emotion(img=img, emotion_probas=demography["emotion"], x=x, y=y, w=w, h=h)
         img = overlay_age_gender(
@@ -8,7 +8,9 @@ import numpy as np
 # project dependencies
 from deepface.modules import representation, detection, modeling
 from deepface.models.FacialRecognition import FacialRecognition
+from deepface.models.Embedding import Embedding
 from deepface.commons import logger as log
+from deepface.commons.thread_utils import map_with_helpers
 
 logger = log.get_singletonish_logger()
 
@@ -36,11 +38,11 @@ def verify(
     Args:
         img1_path (str or np.ndarray or List[float]): Path to the first image.
             Accepts exact image path as a string, numpy array (BGR), base64 encoded images
-            or pre-calculated embeddings.
+            or pre-calculated embeddings (Embedding, list or 1-D array of floats).
 
         img2_path (str or np.ndarray or  or List[float]): Path to the second image.
             Accepts exact image path as a string, numpy array (BGR), base64 encoded images
-            or pre-calculated embeddings.
+            or pre-calculated embeddings (Embedding, list or 1-D array of floats).
 
         model_name (str): Model for face recognition. Options: VGG-Face, Facenet, Facenet512,
             OpenFace, DeepFace, DeepID, Dlib, ArcFace, SFace and GhostFaceNet (default is VGG-Face).
@@ -100,77 +102,36 @@ def verify(
     model: FacialRecognition = modeling.build_model(model_name)
     dims = model.output_shape
 
-    # extract faces from img1
-    if isinstance(img1_path, list):
-        # given image is already pre-calculated embedding
-        if not all(isinstance(dim, float) for dim in img1_path):
-            raise ValueError(
-                "When passing img1_path as a list, ensure that all its items are of type float."
-            )
-
-        if silent is False:
-            logger.warn(
-                "You passed 1st image as pre-calculated embeddings."
-                f"Please ensure that embeddings have been calculated for the {model_name} model."
-            )
-
-        if len(img1_path) != dims:
-            raise ValueError(
-                f"embeddings of {model_name} should have {dims} dimensions,"
-                f" but it has {len(img1_path)} dimensions input"
-            )
-
-        img1_embeddings = [img1_path]
-        img1_facial_areas = [None]
-    else:
-        try:
-            img1_embeddings, img1_facial_areas = __extract_faces_and_embeddings(
-                img_path=img1_path,
-                model_name=model_name,
-                detector_backend=detector_backend,
-                enforce_detection=enforce_detection,
-                align=align,
-                expand_percentage=expand_percentage,
-                normalization=normalization,
-            )
-        except ValueError as err:
-            raise ValueError("Exception while processing img1_path") from err
-
-    # extract faces from img2
-    if isinstance(img2_path, list):
-        # given image is already pre-calculated embedding
-        if not all(isinstance(dim, float) for dim in img2_path):
-            raise ValueError(
-                "When passing img2_path as a list, ensure that all its items are of type float."
-            )
-
-        if silent is False:
-            logger.warn(
-                "You passed 2nd image as pre-calculated embeddings."
-                f"Please ensure that embeddings have been calculated for the {model_name} model."
-            )
-
-        if len(img2_path) != dims:
-            raise ValueError(
-                f"embeddings of {model_name} should have {dims} dimensions,"
-                f" but it has {len(img2_path)} dimensions input"
-            )
+    extraction_args = {
+        "model_name": model_name,
+        "dims": dims,
+        "detector_backend": detector_backend,
+        "enforce_detection": enforce_detection,
+        "align": align,
+        "expand_percentage": expand_percentage,
+        "normalization": normalization,
+        "silent": silent,
+    }
 
-        img2_embeddings = [img2_path]
-        img2_facial_areas = [None]
+    if __is_embedding(img1_path) or __is_embedding(img2_path):
+        # at most one side needs detection, nothing to overlap
+        img1_embeddings, img1_facial_areas = __find_embeddings_and_facial_areas(
+            img_path=img1_path, img_index=1, **extraction_args
+        )
+        img2_embeddings, img2_facial_areas = __find_embeddings_and_facial_areas(
+            img_path=img2_path, img_index=2, **extraction_args
+        )
     else:
-        try:
-            img2_embeddings, img2_facial_areas = __extract_faces_and_embeddings(
-                img_path=img2_path,
-                model_name=model_name,
-                detector_backend=detector_backend,
-                enforce_detection=enforce_detection,
-                align=align,
-                expand_percentage=expand_percentage,
-                normalization=normalization,
+        # extraction pipelines of img1 and img2 are independent: img1 runs in this thread
+        # while a long lived helper thread runs img2
+        (img1_embeddings, img1_facial_areas), (img2_embeddings, img2_facial_areas) = (
+            map_with_helpers(
+                lambda item: __find_embeddings_and_facial_areas(
+                    img_path=item[0], img_index=item[1], **extraction_args
+                ),
+                [(img1_path, 1), (img2_path, 2)],
             )
-        except ValueError as err:
-            raise ValueError("Exception while processing img2_path") from err
+        )
 
     no_facial_area = {
         "x": None,
@@ -181,20 +142,17 @@ def verify(
         "right_eye": None,
     }
 
-    distances = []
-    facial_areas = []
-    for idx, img1_embedding in enumerate(img1_embeddings):
-        for idy, img2_embedding in enumerate(img2_embeddings):
-            distance = find_distance(img1_embedding, img2_embedding, distance_metric)
-            distances.append(distance)
-            facial_areas.append(
-                (img1_facial_areas[idx] or no_facial_area, img2_facial_areas[idy] or no_facial_area)
-            )
+    # all face pair distances in one vectorized operation
+    distances = find_distance_matrix(img1_embeddings, img2_embeddings, distance_metric)
 
     # find the face pair with minimum distance
     threshold = threshold or find_threshold(model_name, distance_metric)
-    distance = float(min(distances))  # best distance
-    facial_areas = facial_areas[np.argmin(distances)]
+    idx, idy = np.unravel_index(np.argmin(distances), distances.shape)
+    distance = float(distances[idx, idy])  # best distance
+    facial_areas = (
+        img1_facial_areas[idx] or no_facial_area,
+        img2_facial_areas[idy] or no_facial_area,
+    )
 
     toc = time.time()
 
@@ -212,6 +170,76 @@ def verify(
     return resp_obj
 
 
+def __is_embedding(img_path: Union[str, np.ndarray, List[float], Embedding]) -> bool:
+    """
+    Check the given input is a pre-calculated embedding instead of an image
+        images are 2 or 3 dimensional arrays, embeddings are flat vectors
+    """
+    if isinstance(img_path, (list, Embedding)):
+        return True
+    return isinstance(img_path, np.ndarray) and img_path.ndim == 1
+
+
+def __find_embeddings_and_facial_areas(
+    img_path: Union[str, np.ndarray, List[float]],
+    img_index: int,
+    model_name: str,
+    dims: int,
+    detector_backend: str,
+    enforce_detection: bool,
+    align: bool,
+    expand_percentage: int,
+    normalization: str,
+    silent: bool,
+) -> Tuple[List[Embedding], List[Optional[dict]]]:
+    """
+    Find embeddings and facial areas of a verification input, which can be either
+    an image or a pre-calculated embedding
+    Returns:
+        embeddings (List[Embedding])
+        facial areas (List[dict]): None for a pre-calculated embedding
+    """
+    ordinal = "1st" if img_index == 1 else "2nd"
+
+    if __is_embedding(img_path):
+        # given image is already pre-calculated embedding
+        # numpy scalars are accepted as well, only non numeric items are rejected
+        try:
+            embedding = Embedding.from_any(img_path, model_name=model_name)
+        except (TypeError, ValueError) as err:
+            raise ValueError(
+                f"When passing img{img_index}_path as a list,"
+                " ensure that all its items are of type float."
+            ) from err
+
+        if silent is False:
+            logger.warn(
+                f"You passed {ordinal} image as pre-calculated embeddings."
+                f"Please ensure that embeddings have been calculated for the {model_name} model."
+            )
+
+        if embedding.dims != dims:
+            raise ValueError(
+                f"embeddings of {model_name} should have {dims} dimensions,"
+                f" but it has {embedding.dims} dimensions input"
+            )
+
+        return [embedding], [None]
+
+    try:
+        return __extract_faces_and_embeddings(
+            img_path=img_path,
+            model_name=model_name,
+            detector_backend=detector_backend,
+            enforce_detection=enforce_detection,
+            align=align,
+            expand_percentage=expand_percentage,
+            normalization=normalization,
+        )
+    except ValueError as err:
+        raise ValueError(f"Exception while processing img{img_index}_path") from err
+
+
 def __extract_faces_and_embeddings(
     img_path: Union[str, np.ndarray],
     model_name: str = "VGG-Face",
@@ -268,11 +296,8 @@ def find_cosine_distance(
     Returns
         distance (np.float64): calculated cosine distance
     """
-    if isinstance(source_representation, list):
-        source_representation = np.array(source_representation)
-
-    if isinstance(test_representation, list):
-        test_representation = np.array(test_representation)
+    source_representation = np.asarray(source_representation)
+    test_representation = np.asarray(test_representation)
 
     a = np.matmul(np.transpose(source_representation), test_representation)
     b = np.sum(np.multiply(source_representation, source_representation))
@@ -291,11 +316,8 @@ def find_euclidean_distance(
     Returns
         distance (np.float64): calculated euclidean distance
     """
-    if isinstance(source_representation, list):
-        source_representation = np.array(source_representation)
-
-    if isinstance(test_representation, list):
-        test_representation = np.array(test_representation)
+    source_representation = np.asarray(source_representation)
+    test_representation = np.asarray(test_representation)
 
     euclidean_distance = source_representation - test_representation
     euclidean_distance = np.sum(np.multiply(euclidean_distance, euclidean_distance))
@@ -303,32 +325,36 @@ def find_euclidean_distance(
     return euclidean_distance
 
 
-def l2_normalize(x: Union[np.ndarray, list]) -> np.ndarray:
+def l2_normalize(x: Union[np.ndarray, list, Embedding]) -> np.ndarray:
     """
     Normalize input vector with l2
     Args:
-        x (np.ndarray or list): given vector
+        x (np.ndarray, list or Embedding): given vector
     Returns:
         y (np.ndarray): l2 normalized vector
     """
-    if isinstance(x, list):
-        x = np.array(x)
+    if isinstance(x, Embedding):
+        return x.normalize().values
+    x = np.asarray(x)
     return x / np.sqrt(np.sum(np.multiply(x, x)))
 
 
 def find_distance(
-    alpha_embedding: Union[np.ndarray, list],
-    beta_embedding: Union[np.ndarray, list],
+    alpha_embedding: Union[np.ndarray, list, Embedding],
+    beta_embedding: Union[np.ndarray, list, Embedding],
     distance_metric: str,
 ) -> np.float64:
     """
     Wrapper to find distance between vectors according to the given distance metric
     Args:
-        source_representation (np.ndarray or list): 1st vector
-        test_representation (np.ndarray or list): 2nd vector
+        source_representation (np.ndarray, list or Embedding): 1st vector
+        test_representation (np.ndarray, list or Embedding): 2nd vector
     Returns
         distance (np.float64): calculated cosine distance
     """
+    if isinstance(alpha_embedding, Embedding) and isinstance(beta_embedding, Embedding):
+        return __find_embedding_distance(alpha_embedding, beta_embedding, distance_metric)
+
     if distance_metric == "cosine":
         distance = find_cosine_distance(alpha_embedding, beta_embedding)
     elif distance_metric == "euclidean":
@@ -342,6 +368,107 @@ def find_distance(
     return distance
 
 
+def __find_embedding_distance(
+    alpha_embedding: Embedding, beta_embedding: Embedding, distance_metric: str
+) -> np.float64:
+    """
+    Find distance between two embeddings reusing their cached norms,
+        a single dot product without temporary arrays
+    Args:
+        alpha_embedding (Embedding): 1st vector
+        beta_embedding (Embedding): 2nd vector
+        distance_metric (str): cosine, euclidean or euclidean_l2
+    Returns
+        distance (np.float64): calculated distance
+    """
+    if alpha_embedding.dims != beta_embedding.dims:
+        raise ValueError(
+            "Embeddings must have same dimensions but "
+            f"{alpha_embedding.dims}:{beta_embedding.dims} passed"
+        )
+    dot = np.float64(np.dot(alpha_embedding.values, beta_embedding.values))
+    alpha_norm, beta_norm = alpha_embedding.norm, beta_embedding.norm
+
+    if distance_metric == "cosine":
+        if alpha_norm == 0 or beta_norm == 0:
+            return np.float64(1.0)
+        return max(1 - dot / (alpha_norm * beta_norm), np.float64(0))
+    if distance_metric == "euclidean":
+        squared = alpha_norm * alpha_norm + beta_norm * beta_norm - 2 * dot
+        return np.sqrt(max(squared, np.float64(0)))
+    if distance_metric == "euclidean_l2":
+        if alpha_norm == 0 or beta_norm == 0:
+            return np.float64(0.0 if alpha_norm == beta_norm else 1.0)
+        squared = 2 - 2 * dot / (alpha_norm * beta_norm)
+        return np.sqrt(max(squared, np.float64(0)))
+    raise ValueError("Invalid distance_metric passed - ", distance_metric)
+
+
+def find_distance_matrix(
+    alpha_embeddings: Union[np.ndarray, list, List[Embedding]],
+    beta_embeddings: Union[np.ndarray, list, List[Embedding]],
+    distance_metric: str,
+) -> np.ndarray:
+    """
+    Find all pairwise distances between two sets of vectors in one vectorized operation
+    Args:
+        alpha_embeddings (np.ndarray or list): 1st set of vectors with shape (n, d) or (d,)
+        beta_embeddings (np.ndarray or list): 2nd set of vectors with shape (m, d) or (d,)
+        distance_metric (str): distance metric name. Options are cosine, euclidean
+            and euclidean_l2.
+    Returns
+        distances (np.ndarray): float32 matrix with shape (n, m). Item [i, j] is the distance
+            between i-th vector of alpha_embeddings and j-th vector of beta_embeddings.
+    """
+    alpha = np.atleast_2d(np.asarray(alpha_embeddings, dtype=np.float32))
+    beta = np.atleast_2d(np.asarray(beta_embeddings, dtype=np.float32))
+
+    if alpha.shape[1] != beta.shape[1]:
+        raise ValueError(
+            "Embeddings must have same dimensions but "
+            f"{alpha.shape[1]}:{beta.shape[1]} passed"
+        )
+
+    if distance_metric == "cosine":
+        alpha_norms = np.linalg.norm(alpha, axis=1)
+        beta_norms = np.linalg.norm(beta, axis=1)
+        denominator = np.outer(alpha_norms, beta_norms)
+        similarities = np.divide(
+            alpha @ beta.T,
+            denominator,
+            out=np.zeros_like(denominator),
+            where=denominator != 0,
+        )
+        # clipped because of floating point round-off for identical vectors
+        return np.maximum(1 - similarities, 0)
+
+    if distance_metric == "euclidean_l2":
+        alpha = __l2_normalize_rows(alpha)
+        beta = __l2_normalize_rows(beta)
+    elif distance_metric != "euclidean":
+        raise ValueError("Invalid distance_metric passed - ", distance_metric)
+
+    # |a - b|^2 = |a|^2 + |b|^2 - 2ab, clipped for the same reason
+    squared = (
+        np.sum(alpha * alpha, axis=1)[:, np.newaxis]
+        + np.sum(beta * beta, axis=1)[np.newaxis, :]
+        - 2 * (alpha @ beta.T)
+    )
+    return np.sqrt(np.maximum(squared, 0))
+
+
+def __l2_normalize_rows(x: np.ndarray) -> np.ndarray:
+    """
+    Normalize each row of a matrix with l2, leaving zero rows as they are
+    Args:
+        x (np.ndarray): matrix with shape (n, d)
+    Returns:
+        y (np.ndarray): row-wise l2 normalized matrix
+    """
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return np.divide(x, norms, out=np.zeros_like(x), where=norms != 0)
+
+
 def find_threshold(model_name: str, distance_metric: str) -> float:
     """
     Retrieve pre-tuned threshold values for a model and distance metric pair
@@ -2,10 +2,42 @@
 # Para ejecutar: python api.py --max-workers=2 --cache-size=500
 
 import os
-import psutil
 import gc
+import time
+import select
+import logging
+import threading
+from collections import defaultdict
 from functools import wraps
 
+import psutil
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def read_rss_mb():
+    """RSS del proceso en MB leyendo /proc/self/statm (una lectura de archivo, sin psutil)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+def trim_native_heap():
+    """Devuelve al sistema la memoria libre de las arenas de malloc (glibc malloc_trim).
+
+    gc.collect() libera objetos de Python, pero los buffers de NumPy/TensorFlow liberados
+    quedan en las arenas de malloc y el RSS no baja hasta llamar a malloc_trim.
+    """
+    try:
+        import ctypes
+        return bool(ctypes.CDLL('libc.so.6').malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
+
 class MemoryOptimizer:
     """Gestor de memoria para Facial-Service"""
     
@@ -17,8 +49,7 @@ class MemoryOptimizer:
     @staticmethod
     def get_memory_usage():
         """Obtiene uso de memoria actual en MB"""
-        process = psutil.Process(os.getpid())
-        return process.memory_info().rss / (1024 * 1024)
+        return read_rss_mb()
     
     @staticmethod
     def log_memory(label=""):
@@ -41,50 +72,318 @@ class MemoryOptimizer:
     
     @staticmethod
     def memory_guard(func):
-        """Decorator que monitorea memoria en funciones críticas"""
+        """Decorator que monitorea memoria en funciones críticas
+
+        Una lectura barata de RSS antes y otra después; si se supera WARNING_THRESHOLD se pide
+        una evaluación al gobernador activo (si lo hay) en lugar de forzar gc.collect()
+        """
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_mem = MemoryOptimizer.get_memory_usage()
+            start_mem = read_rss_mb()
             
             try:
                 result = func(*args, **kwargs)
                 return result
             finally:
-                end_mem = MemoryOptimizer.get_memory_usage()
+                end_mem = read_rss_mb()
                 delta = end_mem - start_mem
                 
                 if delta > 50:
                     print(f"⚠️ {func.__name__} used {delta:.1f}MB")
                 
-                if end_mem > MemoryOptimizer.WARNING_THRESHOLD:
-                    MemoryOptimizer.cleanup_memory()
+                if end_mem > MemoryOptimizer.WARNING_THRESHOLD and MemoryGovernor.active is not None:
+                    MemoryGovernor.active.request_check()
         
         return wrapper
     
     @staticmethod
     def monitor_memory_loop(check_interval=30):
-        """Monitorea memoria continuamente en background"""
-        import threading
-        
-        def monitor():
-            while True:
-                try:
-                    usage = MemoryOptimizer.get_memory_usage()
-                    
-                    if usage > MemoryOptimizer.CRITICAL_THRESHOLD:
-                        print(f"\n🔴 CRITICAL: Memory {usage:.1f}MB > {MemoryOptimizer.CRITICAL_THRESHOLD}MB")
-                        MemoryOptimizer.cleanup_memory()
-                    elif usage > MemoryOptimizer.WARNING_THRESHOLD:
-                        print(f"\n🟡 WARNING: Memory {usage:.1f}MB > {MemoryOptimizer.WARNING_THRESHOLD}MB")
-                        MemoryOptimizer.cleanup_memory()
-                    
-                    import time
-                    time.sleep(check_interval)
-                except Exception as e:
-                    print(f"Memory monitor error: {e}")
-        
-        thread = threading.Thread(target=monitor, daemon=True)
-        thread.start()
+        """Compatibilidad: inicia un MemoryGovernor sin manejadores (sólo mide y recorta el heap)"""
+        return MemoryGovernor(check_interval=check_interval).start()
+
+
+class CgroupMemory:
+    """Uso y límite de memoria del cgroup del proceso (v2 o v1)
+
+    El uso es el working set, como lo cuenta el OOM killer y kubelet: memoria total del cgroup
+    menos la caché de archivos inactiva, que el kernel recupera sin necesidad de matar nada.
+    """
+
+    def __init__(self, version, path):
+        self.version = version
+        self.path = path
+        if version == 2:
+            self.usage_file, self.limit_file, self.inactive_key = 'memory.current', 'memory.max', 'inactive_file'
+        else:
+            self.usage_file, self.limit_file, self.inactive_key = 'memory.usage_in_bytes', 'memory.limit_in_bytes', 'total_inactive_file'
+        self.limit_mb = self._read_limit_mb()
+
+    @classmethod
+    def detect(cls, root='/sys/fs/cgroup'):
+        """Cgroup de memoria de este proceso según /proc/self/cgroup, o None si no hay"""
+        try:
+            with open('/proc/self/cgroup') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+        for line in lines:
+            _, controllers, path = line.split(':', 2)
+            if controllers == '' and os.path.exists(os.path.join(root, 'memory.current')):
+                candidates, version = (os.path.join(root, path.lstrip('/')), root), 2
+            elif 'memory' in controllers.split(','):
+                memory_root = os.path.join(root, 'memory')
+                candidates, version = (os.path.join(memory_root, path.lstrip('/')), memory_root), 1
+            else:
+                continue
+            # con cgroup namespace el cgroup propio está montado en la raíz
+            for candidate in candidates:
+                usage = 'memory.current' if version == 2 else 'memory.usage_in_bytes'
+                if os.path.exists(os.path.join(candidate, usage)):
+                    return cls(version, candidate)
+        return None
+
+    def _read(self, name):
+        with open(os.path.join(self.path, name)) as f:
+            return f.read().strip()
+
+    def _read_limit_mb(self):
+        try:
+            value = self._read(self.limit_file)
+        except OSError:
+            return None
+        # sin límite: "max" en v2, un número cercano a 2^63 en v1
+        if value == 'max' or int(value) >= 1 << 60:
+            return None
+        return int(value) / (1024 * 1024)
+
+    def usage_mb(self):
+        usage = int(self._read(self.usage_file))
+        try:
+            for line in self._read('memory.stat').splitlines():
+                key, value = line.split()
+                if key == self.inactive_key:
+                    usage -= int(value)
+                    break
+        except (OSError, ValueError):
+            pass
+        return max(usage, 0) / (1024 * 1024)
+
+    @property
+    def events_file(self):
+        """memory.events (v2): el kernel lo notifica con POLLPRI al cruzar memory.high/max"""
+        path = os.path.join(self.path, 'memory.events')
+        return path if self.version == 2 and os.path.exists(path) else None
+
+
+class MemoryGovernor:
+    """Gobernador de memoria: mide barato, reparte el uso por subsistema y reacciona a la presión
+
+    - Uso: working set del cgroup si el proceso corre en uno (límite real del contenedor); si
+      no, RSS leído de /proc/self/statm. Nunca psutil ni gc.collect() en el camino de la petición
+    - Niveles: normal, warning y critical. Con límite de cgroup los umbrales son el 75% y el 90%
+      del límite; sin él, WARNING_THRESHOLD y CRITICAL_THRESHOLD de MemoryOptimizer
+    - Despertar: eventos de memory.events (cgroup v2, al cruzar memory.high o memory.max), una
+      petición explícita (request_check) o, como mínimo, cada `check_interval` segundos
+    - Subsistemas: contadores incrementales (`add`, p. ej. imágenes en vuelo) y funciones que
+      informan bytes bajo demanda (`register_reporter`, p. ej. pesos de modelos, cachés)
+    - Manejadores (`on_pressure`): reciben el nivel en cada cambio y, mientras no sea normal,
+      cada `cooldown` segundos; encogen cachés, descargan modelos, etc. Tras liberar en
+      critical se devuelve al sistema la memoria libre de malloc (trim_native_heap)
+    """
+
+    NORMAL, WARNING, CRITICAL = 'normal', 'warning', 'critical'
+
+    # gobernador iniciado más reciente, para memory_guard
+    active = None
+
+    def __init__(self, warning_mb=None, critical_mb=None, check_interval=5.0, cooldown=15.0, cgroup=None):
+        self.cgroup = cgroup if cgroup is not None else CgroupMemory.detect()
+        # un cgroup sin límite puede agrupar otros procesos: se mide el RSS propio
+        if self.cgroup is not None and self.cgroup.limit_mb is None:
+            self.cgroup = None
+        limit_mb = self.cgroup.limit_mb if self.cgroup else None
+        self.limit_mb = limit_mb or MemoryOptimizer.MAX_MEMORY
+        self.warning_mb = warning_mb or (limit_mb * 0.75 if limit_mb else MemoryOptimizer.WARNING_THRESHOLD)
+        self.critical_mb = critical_mb or (limit_mb * 0.90 if limit_mb else MemoryOptimizer.CRITICAL_THRESHOLD)
+        self.check_interval = check_interval
+        self.cooldown = cooldown
+
+        self.level = self.NORMAL
+        self.usage_mb = 0.0
+        self.counters = defaultdict(int)
+        self._tracked = defaultdict(int)
+        self._reporters = {}
+        self._handlers = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._last_reclaim = 0.0
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        """Configuración desde FACE_MEMORY_* (umbrales en MB; por defecto según el cgroup)"""
+        warning = os.getenv('FACE_MEMORY_WARNING_MB')
+        critical = os.getenv('FACE_MEMORY_CRITICAL_MB')
+        return cls(
+            warning_mb=float(warning) if warning else None,
+            critical_mb=float(critical) if critical else None,
+            check_interval=float(os.getenv('FACE_MEMORY_CHECK_INTERVAL', '5')),
+            cooldown=float(os.getenv('FACE_MEMORY_COOLDOWN', '15'))
+        )
+
+    @property
+    def source(self):
+        return f"cgroup-v{self.cgroup.version}" if self.cgroup else 'statm'
+
+    def read_usage_mb(self):
+        """Lectura barata del uso actual (MB); también actualiza `usage_mb`"""
+        try:
+            usage = self.cgroup.usage_mb() if self.cgroup else read_rss_mb()
+        except (OSError, ValueError):
+            usage = read_rss_mb()
+        self.usage_mb = usage
+        return usage
+
+    def add(self, subsystem, nbytes):
+        """Suma (o resta, si es negativo) bytes al contador de un subsistema"""
+        with self._lock:
+            self._tracked[subsystem] += nbytes
+
+    def register_reporter(self, subsystem, reporter):
+        """`reporter()` devuelve los bytes que ocupa el subsistema en este momento"""
+        self._reporters[subsystem] = reporter
+
+    def on_pressure(self, name, handler):
+        """`handler(level)` se llama en cada cambio de nivel y periódicamente bajo presión"""
+        self._handlers.append((name, handler))
+
+    def batch_size(self, size):
+        """Tamaño de lote según la presión: completo, la mitad en warning y 1 en critical"""
+        if self.level == self.CRITICAL:
+            return 1
+        if self.level == self.WARNING:
+            return max(1, size // 2)
+        return size
+
+    def request_check(self):
+        """Pide una evaluación inmediata al hilo del gobernador (no bloquea)"""
+        self._wake.set()
+
+    def check(self):
+        """Evalúa el nivel de presión y llama a los manejadores si corresponde"""
+        usage = self.read_usage_mb()
+        if usage >= self.critical_mb:
+            level = self.CRITICAL
+        elif usage >= self.warning_mb:
+            level = self.WARNING
+        else:
+            level = self.NORMAL
+
+        now = time.monotonic()
+        changed = level != self.level
+        if not changed and (level == self.NORMAL or now - self._last_reclaim < self.cooldown):
+            return level
+
+        if changed:
+            self.counters[f"to_{level}"] += 1
+            # subir de nivel es un aviso; volver a normal, sólo informativo
+            log_level = logging.WARNING if level != self.NORMAL else logging.INFO
+            logger.log(log_level, "%s Memory %s: %.1fMB (warning %.0fMB, critical %.0fMB)",
+                       '🔴' if level == self.CRITICAL else '🟡' if level == self.WARNING else '🟢',
+                       level, usage, self.warning_mb, self.critical_mb)
+        self.level = level
+        self._last_reclaim = now
+        for name, handler in self._handlers:
+            try:
+                handler(level)
+            except Exception:
+                logger.exception("Memory handler %s error", name)
+        if level != self.NORMAL:
+            self.counters['reclaims'] += 1
+            if level == self.CRITICAL and trim_native_heap():
+                self.counters['heap_trims'] += 1
+        return level
+
+    def start(self):
+        """Inicia el hilo del gobernador (daemon) y lo registra como activo"""
+        if self._thread is None:
+            self.check()
+            self._thread = threading.Thread(target=self._loop, name='MemoryGovernor', daemon=True)
+            self._thread.start()
+            MemoryGovernor.active = self
+        return self
+
+    def _loop(self):
+        events = self.cgroup.events_file if self.cgroup else None
+        poller = events_fd = None
+        if events:
+            try:
+                events_fd = open(events)
+                events_fd.read()
+                poller = select.poll()
+                poller.register(events_fd, select.POLLPRI | select.POLLERR)
+            except OSError:
+                poller = None
+        last_check = 0.0
+        while True:
+            try:
+                if poller is not None:
+                    # despierta al cruzar memory.high/max; request_check se atiende en <= 1 s
+                    if poller.poll(min(1000, self.check_interval * 1000)):
+                        events_fd.seek(0)
+                        events_fd.read()
+                        self.counters['cgroup_events'] += 1
+                        self._wake.set()
+                    if not self._wake.is_set() and time.monotonic() - last_check < self.check_interval:
+                        continue
+                else:
+                    self._wake.wait(self.check_interval)
+                self._wake.clear()
+                last_check = time.monotonic()
+                self.check()
+            except Exception:
+                logger.exception("Memory governor error")
+                time.sleep(self.check_interval)
+
+    def get_stats(self):
+        with self._lock:
+            subsystems = dict(self._tracked)
+        for subsystem, reporter in list(self._reporters.items()):
+            try:
+                subsystems[subsystem] = subsystems.get(subsystem, 0) + int(reporter())
+            except Exception:
+                subsystems[subsystem] = None
+        return {
+            'level': self.level,
+            'usage_mb': round(self.usage_mb, 1),
+            'source': self.source,
+            'limit_mb': round(self.limit_mb, 1),
+            'warning_mb': round(self.warning_mb, 1),
+            'critical_mb': round(self.critical_mb, 1),
+            'subsystems_mb': {name: round(value / (1024 * 1024), 2) if value is not None else None
+                              for name, value in subsystems.items()},
+            'handlers': [name for name, _ in self._handlers],
+            'events': dict(self.counters)
+        }
+
+    def to_prometheus(self):
+        """Uso, nivel y memoria por subsistema en formato de exposición de Prometheus"""
+        stats = self.get_stats()
+        levels = (self.NORMAL, self.WARNING, self.CRITICAL)
+        lines = [
+            '# HELP facial_memory_usage_bytes Memory used by the service (cgroup working set or RSS)',
+            '# TYPE facial_memory_usage_bytes gauge',
+            f"facial_memory_usage_bytes{{source=\"{stats['source']}\"}} {int(self.usage_mb * 1024 * 1024)}",
+            '# HELP facial_memory_pressure_level Memory pressure level (0 normal, 1 warning, 2 critical)',
+            '# TYPE facial_memory_pressure_level gauge',
+            f"facial_memory_pressure_level {levels.index(self.level)}",
+            '# HELP facial_memory_subsystem_bytes Memory accounted to each subsystem',
+            '# TYPE facial_memory_subsystem_bytes gauge',
+        ]
+        for name, value in sorted(stats['subsystems_mb'].items()):
+            if value is not None:
+                lines.append(f'facial_memory_subsystem_bytes{{subsystem="{name}"}} {int(value * 1024 * 1024)}')
+        return '\n'.join(lines) + '\n'
 
 
 class ImageOptimizer:
@@ -0,0 +1,182 @@
+# Profiler de muestreo por petición para Facial-Service
+# Captura pilas colapsadas (formato flamegraph.pl / speedscope) de las peticiones lentas
+
+import os
+import sys
+import time
+import uuid
+import random
+import threading
+from collections import deque, defaultdict
+from datetime import datetime
+
+
+class RequestProfile:
+    """Muestras de pila de una petición: pila colapsada -> número de muestras"""
+
+    def __init__(self, endpoint, sampled):
+        self.id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.sampled = sampled
+        self.started_at = datetime.now().isoformat()
+        self.duration_ms = None
+        self.reason = None
+        self.samples = defaultdict(int)
+        # perfil que el hilo tenía antes de éste (peticiones anidadas), se restaura en stop
+        self.previous = None
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            'reason': self.reason,
+            'samples': sum(self.samples.values())
+        }
+
+
+class RequestProfiler:
+    """Profiler de muestreo opt-in para peticiones lentas.
+
+    - Un hilo muestreador lee `sys._current_frames()` cada `interval_ms`, sólo de los hilos
+      que atienden una petición (el hilo de Flask y los workers a los que delega)
+    - Al terminar, la petición se guarda si tardó >= `slow_ms` o si cayó en la fracción
+      `sample_rate`; el resto se descarta
+    - Los perfiles guardados van a un buffer circular de `max_profiles`
+    - Deshabilitado, el costo por petición es una sola comprobación de `enabled`
+    """
+
+    MAX_DEPTH = 128
+
+    def __init__(self, enabled=False, slow_ms=1000, sample_rate=0.0, interval_ms=5, max_profiles=50):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.profiles = deque(maxlen=max_profiles)
+        self.discarded = 0
+        # hilo -> perfil de la petición que está atendiendo
+        self._active = {}
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._sampler = None
+
+    @classmethod
+    def from_env(cls):
+        """Configuración desde FACE_PROFILER_* (deshabilitado por defecto)"""
+        return cls(
+            enabled=os.getenv('FACE_PROFILER_ENABLED', 'false').lower() in ('1', 'true', 'yes'),
+            slow_ms=float(os.getenv('FACE_PROFILER_SLOW_MS', '1000')),
+            sample_rate=float(os.getenv('FACE_PROFILER_SAMPLE_RATE', '0')),
+            interval_ms=float(os.getenv('FACE_PROFILER_INTERVAL_MS', '5')),
+            max_profiles=int(os.getenv('FACE_PROFILER_MAX_PROFILES', '50'))
+        )
+
+    def start(self, endpoint):
+        """Empieza a muestrear el hilo actual. Retorna el perfil, o None si está deshabilitado"""
+        if not self.enabled:
+            return None
+        profile = RequestProfile(endpoint, sampled=random.random() < self.sample_rate)
+        profile.previous = self._attach(profile)
+        return profile
+
+    def stop(self, profile, duration):
+        """Deja de muestrear el hilo actual y guarda el perfil si fue lento o muestreado"""
+        if profile is None:
+            return
+        self._detach(profile.previous)
+        profile.previous = None
+        profile.duration_ms = round(duration * 1000, 2)
+        if profile.duration_ms >= self.slow_ms:
+            profile.reason = 'slow'
+        elif profile.sampled:
+            profile.reason = 'sampled'
+        else:
+            with self._cond:
+                self.discarded += 1
+            return
+        self.profiles.append(profile)
+
+    def bind(self, fn):
+        """Envuelve `fn` para que el worker que la ejecute se muestree con la petición actual"""
+        profile = getattr(self._local, 'profile', None) if self.enabled else None
+        if profile is None:
+            return fn
+
+        def profiled(*args, **kwargs):
+            previous = self._attach(profile)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._detach(previous)
+        return profiled
+
+    def _attach(self, profile):
+        previous = getattr(self._local, 'profile', None)
+        self._local.profile = profile
+        with self._cond:
+            self._active[threading.get_ident()] = profile
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name='RequestProfiler', daemon=True)
+                self._sampler.start()
+            self._cond.notify()
+        return previous
+
+    def _detach(self, previous):
+        self._local.profile = previous
+        with self._cond:
+            if previous is None:
+                self._active.pop(threading.get_ident(), None)
+            else:
+                self._active[threading.get_ident()] = previous
+
+    def _sample_loop(self):
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                active = list(self._active.items())
+            frames = sys._current_frames()
+            for thread_id, profile in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    profile.samples[self._collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _collapse(self, frame):
+        """Pila de la raíz a la hoja como `archivo:función;archivo:función`"""
+        stack = []
+        while frame is not None and len(stack) < self.MAX_DEPTH:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def collapsed(self, endpoint=None, profile_id=None):
+        """Pilas colapsadas de los perfiles guardados, una línea `pila muestras` por pila.
+
+        Cada pila empieza con el endpoint para separar las peticiones en el flamegraph.
+        """
+        totals = defaultdict(int)
+        for profile in list(self.profiles):
+            if endpoint and profile.endpoint != endpoint:
+                continue
+            if profile_id and profile.id != profile_id:
+                continue
+            for stack, count in list(profile.samples.items()):
+                totals[f"{profile.endpoint};{stack}"] += count
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(totals.items()))
+
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'slow_ms': self.slow_ms,
+            'sample_rate': self.sample_rate,
+            'interval_ms': self.interval * 1000,
+            'stored': len(self.profiles),
+            'max_profiles': self.profiles.maxlen,
+            'discarded': self.discarded,
+            'profiles': [profile.summary() for profile in list(self.profiles)]
+        }
@@ -5,6 +5,7 @@ Pruebas unitarias de componentes del servicio facial
 """
 
 import unittest
+from unittest import mock
 import base64
 import json
 import sys
@@ -211,5 +212,1268 @@ class TestFacialServiceIntegration(unittest.TestCase):
         print("\n" + "="*60)
 
 
+class TestVerificationEngine(unittest.TestCase):
+    """Pruebas del motor de verificación vectorizado"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            from verification_engine import VerificationEngine
+            from deepface.modules import verification
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.verification = verification
+        self.engine_cls = VerificationEngine
+
+    def test_distance_matrix_matches_find_distance(self):
+        """La matriz vectorizada coincide con find_distance para todas las métricas"""
+        np = self.np
+        rng = np.random.default_rng(0)
+        alpha = rng.normal(size=(3, 128))
+        beta = rng.normal(size=(4, 128))
+        for metric in ["cosine", "euclidean", "euclidean_l2"]:
+            matrix = self.verification.find_distance_matrix(alpha, beta, metric)
+            self.assertEqual(matrix.shape, (3, 4))
+            for i in range(3):
+                for j in range(4):
+                    expected = self.verification.find_distance(alpha[i], beta[j], metric)
+                    self.assertAlmostEqual(float(matrix[i, j]), float(expected), places=3)
+
+    def test_engine_uses_model_threshold(self):
+        """El umbral por defecto proviene de find_threshold"""
+        engine = self.engine_cls(model_name="Facenet512", distance_metric="cosine")
+        self.assertEqual(engine.threshold, self.verification.find_threshold("Facenet512", "cosine"))
+
+    def test_engine_compare_precomputed_embeddings(self):
+        """Embeddings idénticos se verifican; vectores nulos no"""
+        engine = self.engine_cls(model_name="Facenet512", distance_metric="cosine")
+        embedding = [0.1, 0.2, 0.3, 0.4]
+        result = engine.compare(embedding, list(embedding))
+        self.assertTrue(result["verified"])
+        self.assertAlmostEqual(result["distance"], 0.0, places=5)
+        self.assertFalse(engine.compare(embedding, [0.0, 0.0, 0.0, 0.0])["verified"])
+
+
+class TestEmbeddingIndex(unittest.TestCase):
+    """Pruebas de los índices de búsqueda de embeddings (flat / ivf)"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            from deepface.modules import indexing
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.indexing = indexing
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(2000, 64)).astype(np.float32)
+        self.keys = [f"face_{i}" for i in range(2000)]
+
+    def test_flat_index_is_exact(self):
+        """El índice flat devuelve el vecino exacto con la distancia de find_distance"""
+        from deepface.modules import verification
+        for metric in ["cosine", "euclidean", "euclidean_l2"]:
+            index = self.indexing.build_index("flat", 64, metric)
+            index.add(self.keys, self.embeddings)
+            key, distance = index.search(self.embeddings[7], k=1)[0][0]
+            self.assertEqual(key, "face_7")
+            expected = verification.find_distance(self.embeddings[7], self.embeddings[3], metric)
+            found = dict(index.search(self.embeddings[7], k=2000)[0])["face_3"]
+            self.assertAlmostEqual(distance, 0.0, places=2)
+            self.assertAlmostEqual(found, float(expected), places=3)
+
+    def test_ivf_index_sync_and_persistence(self):
+        """El índice ivf se sincroniza de forma incremental y sobrevive a save/load"""
+        import os
+        import tempfile
+        index = self.indexing.build_index("ivf", 64, "cosine", nlist=16, nprobe=16)
+        items = dict(zip(self.keys, self.embeddings))
+        self.assertTrue(self.indexing.sync_index(index, items))
+        self.assertTrue(index.is_trained)
+        self.assertFalse(self.indexing.sync_index(index, items))
+
+        del items["face_7"]
+        self.assertTrue(self.indexing.sync_index(index, items))
+        self.assertEqual(len(index), 1999)
+        self.assertNotEqual(index.search(self.embeddings[7], k=1)[0][0][0], "face_7")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "index.pkl")
+            index.save(path)
+            loaded = self.indexing.load_index(path)
+        self.assertEqual(loaded.search(self.embeddings[8], k=1)[0][0][0], "face_8")
+
+    def test_quantized_index_compresses_and_reranks(self):
+        """Los índices pq/sq8 ocupan mucha menos memoria y el re-ranking da distancias exactas"""
+        lookup = dict(zip(self.keys, self.embeddings))
+        flat = self.indexing.build_index("flat", 64, "cosine")
+        flat.add(self.keys, self.embeddings)
+        exact = flat.search(self.embeddings[5], k=5)[0]
+        for index_type, params in [("pq", {"m": 16}), ("sq8", {})]:
+            index = self.indexing.build_index(
+                index_type, 64, "cosine", train_size=1000, **params
+            )
+            index.add(self.keys, self.embeddings)
+            self.assertTrue(index.is_trained)
+            self.assertLessEqual(index.memory_bytes(), self.embeddings.nbytes // 3)
+            index.set_refine_source(lambda keys: [lookup[key] for key in keys])
+            key, distance = index.search(self.embeddings[5], k=5)[0][0]
+            self.assertEqual(key, exact[0][0])
+            self.assertAlmostEqual(distance, exact[0][1], places=4)
+
+
+class TestBatchRepresentation(unittest.TestCase):
+    """Pruebas de la inferencia por lotes usada por /register/batch y /verify/batch"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            from deepface.models.FacialRecognition import FacialRecognition
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+
+        class SumModel(FacialRecognition):
+            model_name = "Sum"
+            input_shape = (8, 8)
+            output_shape = 1
+
+            def forward(self, img):
+                return [float(img.sum())]
+
+        self.model = SumModel()
+
+    def test_forward_batch_falls_back_to_forward(self):
+        """Modelos con forward propio se evalúan cara a cara con el mismo resultado"""
+        imgs = self.np.random.default_rng(0).random((3, 8, 8, 3)).astype(self.np.float32)
+        expected = [self.model.forward(img[self.np.newaxis, ...]) for img in imgs]
+        self.assertEqual(self.model.forward_batch(imgs), expected)
+
+    def test_represent_faces_empty_batch(self):
+        """Un lote sin caras no construye el modelo ni falla"""
+        from deepface.modules import representation
+        self.assertEqual(representation.represent_faces([], model_name="Facenet512"), [])
+
+
+
+class TestConcurrentVerify(unittest.TestCase):
+    """Pruebas de la extracción concurrente de img1/img2 en verify (deepface.modules.verification)"""
+
+    def setUp(self):
+        try:
+            import threading
+            import time
+            import numpy as np
+            from deepface.commons import thread_utils
+            from deepface.commons.model_pool import model_pool
+            from deepface.models.FacialRecognition import FacialRecognition
+            from deepface.modules import verification
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.verification = verification
+        self.helper_threads = thread_utils.HELPER_THREADS
+        self.threads = []
+        threads = self.threads
+
+        class FlatModel(FacialRecognition):
+            model_name = "Flat"
+            input_shape = (16, 16)
+            output_shape = 8
+
+            def forward(self, img):
+                threads.append(threading.current_thread().name)
+                if threading.current_thread() is threading.main_thread():
+                    time.sleep(0.02)  # da tiempo a que un hilo auxiliar tome img2
+                return np.asarray(img, dtype=np.float32).reshape(-1)[::97][:8].tolist()
+
+        model_pool.put(("model", "Facenet512"), FlatModel())
+        self.addCleanup(model_pool.unload, [("model", "Facenet512")])
+
+    def test_matches_sequential_path_without_swapping_images(self):
+        """img2 corre en un hilo auxiliar persistente y el resultado es el del camino secuencial"""
+        rng = self.np.random.default_rng(0)
+        img1 = rng.integers(0, 255, (60, 50, 3), dtype=self.np.uint8)
+        img2 = rng.integers(0, 255, (70, 40, 3), dtype=self.np.uint8)
+
+        def verify():
+            result = self.verification.verify(
+                img1, img2, model_name="Facenet512", detector_backend="skip"
+            )
+            return result["distance"], result["facial_areas"]
+
+        concurrent = [verify() for _ in range(3)]
+        helpers = {name for name in self.threads if name.startswith("deepface-helper")}
+
+        def sequential_map(fn, items):
+            return [fn(item) for item in items]
+
+        with mock.patch.object(self.verification, "map_with_helpers", sequential_map):
+            sequential = verify()
+
+        for distance, facial_areas in concurrent:
+            self.assertAlmostEqual(distance, sequential[0], places=6)
+            self.assertEqual(facial_areas, sequential[1])
+        self.assertEqual((sequential[1]["img1"]["w"], sequential[1]["img2"]["w"]), (50, 40))
+        # los hilos auxiliares se reutilizan entre llamadas
+        self.assertTrue(helpers)
+        self.assertLessEqual(len(helpers), self.helper_threads)
+
+
+class TestBatchDetection(unittest.TestCase):
+    """Pruebas de la detección por lotes (Detector.detect_faces_batch / extract_faces_batch)"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            from deepface.models.Detector import Detector, FacialAreaRegion
+            from deepface.modules import detection
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.detection = detection
+
+        class WidthDetector(Detector):
+            def detect_faces(self, img):
+                return [FacialAreaRegion(x=0, y=0, w=img.shape[1], h=img.shape[0], confidence=1)]
+
+        self.detector = WidthDetector()
+
+    def test_default_batch_keeps_order(self):
+        """El fallback paralelo devuelve los resultados en el orden de las imágenes"""
+        imgs = [self.np.zeros((10, 10 + i, 3), dtype=self.np.uint8) for i in range(8)]
+        widths = [areas[0].w for areas in self.detector.detect_faces_batch(imgs)]
+        self.assertEqual(widths, [10 + i for i in range(8)])
+
+    def test_default_batch_reuses_helper_threads(self):
+        """Los lotes sucesivos se reparten en los mismos hilos auxiliares, sin crear hilos nuevos"""
+        import threading
+        from deepface.commons import thread_utils
+
+        names = set()
+        detector = self.detector
+
+        class NamingDetector(type(detector)):
+            def detect_faces(self, img):
+                names.add(threading.current_thread().name)
+                return detector.detect_faces(img)
+
+        naming = NamingDetector()
+        imgs = [self.np.zeros((10, 10, 3), dtype=self.np.uint8) for _ in range(8)]
+        for _ in range(5):
+            naming.detect_faces_batch(imgs)
+        helpers = {name for name in names if name.startswith("deepface-helper")}
+        self.assertLessEqual(len(helpers), thread_utils.HELPER_THREADS)
+        self.assertLessEqual(len(names - helpers), 1)
+
+    def test_extract_faces_batch_skip_and_missing_images(self):
+        """Una imagen inexistente no aborta el lote: su resultado es una lista vacía"""
+        img = self.np.zeros((20, 30, 3), dtype=self.np.uint8)
+        results = self.detection.extract_faces_batch(
+            [img, "/nonexistent/face.jpg"], detector_backend="skip"
+        )
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0]["facial_area"]["w"], 30)
+        self.assertEqual(results[1], [])
+
+
+class TestDetectorCascade(unittest.TestCase):
+    """Pruebas de las cascadas de detectores "rápido>lento" (deepface.detectors.DetectorWrapper)"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            from deepface.commons.model_pool import model_pool
+            from deepface.detectors import DetectorWrapper
+            from deepface.models.Detector import Detector, FacialAreaRegion
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.DetectorWrapper = DetectorWrapper
+
+        self.slow_calls = []
+        slow_calls = self.slow_calls
+
+        class WideOnlyDetector(Detector):
+            def detect_faces(self, img):
+                if img.shape[1] <= 20:
+                    return []
+                return [FacialAreaRegion(x=0, y=0, w=img.shape[1], h=img.shape[0], confidence=1)]
+
+        class SlowDetector(Detector):
+            def detect_faces(self, img):
+                slow_calls.append(img.shape)
+                return [FacialAreaRegion(x=1, y=1, w=5, h=5, confidence=0.5)]
+
+        model_pool.put(("detector", "fast"), WideOnlyDetector())
+        model_pool.put(("detector", "slow"), SlowDetector())
+        self.addCleanup(model_pool.unload, [("detector", "fast"), ("detector", "slow")])
+
+    def test_detector_cascade_falls_back_on_miss(self):
+        """La cascada sólo envía al detector lento las imágenes sin cara en la etapa rápida"""
+        imgs = [self.np.full((10, width, 3), width, dtype=self.np.uint8) for width in (30, 10, 40)]
+        results = self.DetectorWrapper.detect_faces_batch("fast>slow", imgs, align=False)
+        stats = self.DetectorWrapper.get_cascade_stats()["fast>slow"]
+        self.assertEqual([faces[0].facial_area.w for faces in results], [30, 5, 40])
+        self.assertEqual(len(self.slow_calls), 1)
+        self.assertEqual(stats["fast"]["accepted"], 2)
+        self.assertEqual(stats["slow"]["received"], 1)
+
+
+class TestDetectionCache(unittest.TestCase):
+    """Pruebas de la caché de detecciones por hash de imagen (deepface.commons.cache_utils)"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            from deepface.commons.cache_utils import detection_cache
+            from deepface.commons.model_pool import model_pool
+            from deepface.detectors import DetectorWrapper
+            from deepface.models.Detector import Detector, FacialAreaRegion
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.detection_cache = detection_cache
+        self.model_pool = model_pool
+        self.DetectorWrapper = DetectorWrapper
+
+        self.calls = []
+        calls = self.calls
+
+        class CountingDetector(Detector):
+            def detect_faces(self, img):
+                calls.append(img.shape)
+                return [FacialAreaRegion(x=0, y=0, w=img.shape[1], h=img.shape[0], confidence=1)]
+
+        model_pool.put(("detector", "counting"), CountingDetector())
+        self.addCleanup(model_pool.unload, [("detector", "counting")])
+        detection_cache.clear()
+
+    def test_detection_cache_skips_detector(self):
+        """Una imagen repetida reutiliza las áreas detectadas sin volver a llamar al detector"""
+        img = self.np.random.default_rng(0).integers(0, 255, (20, 30, 3), dtype=self.np.uint8)
+        first = self.DetectorWrapper.detect_faces("counting", img, align=False)
+        second = self.DetectorWrapper.detect_faces("counting", img.copy(), align=False)
+        self.DetectorWrapper.detect_faces("counting", img, align=True)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(first[0].facial_area.w, second[0].facial_area.w)
+        self.assertGreaterEqual(self.detection_cache.get_stats()["hits"], 1)
+
+
+class TestOpenCvFastMode(unittest.TestCase):
+    """Pruebas del modo rápido del detector opencv (deepface.detectors.OpenCv)"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            from deepface.detectors import DetectorWrapper, OpenCv
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.DetectorWrapper = DetectorWrapper
+        self.OpenCv = OpenCv
+
+    def test_fast_mode_from_env_and_arguments(self):
+        """El modo rápido se activa por entorno o por argumento y omite los bordes negros"""
+        with mock.patch.dict("os.environ", {"DEEPFACE_OPENCV_FAST_MODE": "1"}):
+            client = self.OpenCv.OpenCvClient()
+        self.assertTrue(client.fast_mode)
+        self.assertFalse(self.OpenCv.OpenCvClient(fast_mode=False).fast_mode)
+        self.assertEqual(client.detect_faces(self.np.zeros((480, 640, 3), dtype=self.np.uint8)), [])
+
+    def test_boxes_map_back_to_original_resolution(self):
+        """Las cajas halladas en la copia reducida se devuelven en coordenadas de la imagen original"""
+        np = self.np
+        scans = []
+
+        class ScanFaceDetector:
+            def detectMultiScale3(self, img, *args, **kwargs):  # pylint: disable=invalid-name
+                scans.append(img.shape)
+                return np.array([[32, 16, 64, 48]]), None, np.array([[5.0]])
+
+        class NoEyeDetector:
+            def detectMultiScale(self, img, *args):  # pylint: disable=invalid-name
+                return ()
+
+        client = self.OpenCv.OpenCvClient(fast_mode=True, scan_width=320)
+        client._local.model = {"face_detector": ScanFaceDetector(), "eye_detector": NoEyeDetector()}
+
+        # contenido de 920x660 rodeado de bordes negros de 40 px (x) y 20 px (y)
+        img = np.zeros((700, 1000, 3), dtype=np.uint8)
+        img[20:680, 40:960] = 128
+        areas = client.detect_faces(img)
+
+        # 920 px -> 320 px: ratio_x = 2.875, ratio_y = 660 / 230
+        self.assertEqual(scans, [(230, 320)])
+        self.assertEqual(len(areas), 1)
+        self.assertEqual((areas[0].x, areas[0].y, areas[0].w, areas[0].h), (132, 66, 184, 138))
+
+    def test_configure_passes_fast_mode_without_touching_env(self):
+        """configure() construye el detector con sus argumentos, también tras descargarlo del pool"""
+        import os
+        from deepface.commons.model_pool import model_pool
+
+        previous = dict(self.DetectorWrapper.detector_options)
+        try:
+            with mock.patch.dict("os.environ", {"DEEPFACE_OPENCV_FAST_MODE": "0"}):
+                self.DetectorWrapper.configure("opencv", fast_mode=True)
+                self.assertTrue(self.DetectorWrapper.build_model("opencv").fast_mode)
+                model_pool.unload([("detector", "opencv")])
+                self.assertTrue(self.DetectorWrapper.build_model("opencv").fast_mode)
+                self.assertEqual(os.environ["DEEPFACE_OPENCV_FAST_MODE"], "0")
+        finally:
+            self.DetectorWrapper.detector_options.clear()
+            self.DetectorWrapper.detector_options.update(previous)
+            model_pool.unload([("detector", "opencv")])
+
+
+class TestSsdDetector(unittest.TestCase):
+    """Pruebas del post-procesado vectorizado del detector SSD (deepface.detectors.Ssd)"""
+
+    def setUp(self):
+        try:
+            import threading
+            import numpy as np
+            from deepface.detectors import OpenCv, Ssd
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.threading = threading
+        self.np = np
+        self.OpenCv = OpenCv
+        self.Ssd = Ssd
+
+    def test_ssd_postprocess_filters_and_scales(self):
+        """El post-procesado del SSD descarta fondo y baja confianza y escala al tamaño original"""
+        np = self.np
+        detections = np.array([[[
+            [0, 1, 0.99, 0.1, 0.2, 0.5, 0.6],
+            [0, 1, 0.50, 0.0, 0.0, 0.9, 0.9],
+            [0, 0, 0.99, 0.0, 0.0, 0.9, 0.9],
+        ]]], dtype=np.float32)
+
+        class RecordedNet:
+            def setInput(self, blob):
+                pass
+
+            def forward(self):
+                return detections
+
+        client = self.Ssd.SsdClient.__new__(self.Ssd.SsdClient)
+        client._lock = self.threading.Lock()
+        client.model = {"face_detector": RecordedNet(), "opencv_module": self.OpenCv.OpenCvClient()}
+
+        areas = client.detect_faces(np.zeros((300, 600, 3), dtype=np.uint8))
+        self.assertEqual(len(areas), 1)
+        self.assertEqual((areas[0].x, areas[0].y, areas[0].w, areas[0].h), (60, 60, 240, 120))
+
+    def test_scale_detections_matches_pandas_reference(self):
+        """Las cajas y confianzas coinciden con el cálculo previo fila a fila"""
+        rng = self.np.random.default_rng(1)
+        detections = self.np.zeros((50, 7), dtype=self.np.float32)
+        detections[:, 1] = rng.integers(0, 2, 50)
+        detections[:, 2] = rng.uniform(0.8, 1.0, 50)
+        detections[:, 3:7] = self.np.sort(rng.uniform(0, 1, (50, 2, 2)), axis=1).reshape(50, 4)
+        img_shape = (481, 643, 3)
+
+        expected = []
+        for _, is_face, confidence, left, top, right, bottom in detections.tolist():
+            if is_face != 1 or confidence < 0.90:
+                continue
+            left, top, right, bottom = (int(v * 300) for v in (left, top, right, bottom))
+            x = int(left * img_shape[1] / 300)
+            y = int(top * img_shape[0] / 300)
+            expected.append((x, y, int(right * img_shape[1] / 300) - x,
+                             int(bottom * img_shape[0] / 300) - y, confidence))
+        self.assertTrue(expected)
+        self.assertEqual(self.Ssd.scale_detections(detections, img_shape), expected)
+
+
+class TestStreamingTracker(unittest.TestCase):
+    """Pruebas del seguimiento de caras entre detecciones (deepface.modules.streaming)"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            import cv2
+            from deepface.modules import streaming
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.cv2 = cv2
+        self.streaming = streaming
+
+    def test_template_tracker_follows_shift(self):
+        """El tracker ligero encuentra la cara desplazada en el siguiente frame"""
+        texture = self.np.random.default_rng(0).integers(0, 255, (80, 80), dtype=self.np.uint8)
+        texture = self.cv2.GaussianBlur(texture, (5, 5), 0)
+        frame = self.np.zeros((240, 320), dtype=self.np.uint8)
+        frame[50:130, 60:140] = texture
+        tracker = self.streaming.TemplateTracker(gray=frame, box=(60, 50, 80, 80))
+
+        moved = self.np.zeros_like(frame)
+        moved[62:142, 78:158] = texture
+        x, y, w, h = tracker.update(moved)
+        self.assertLessEqual(abs(x - 78), 2)
+        self.assertLessEqual(abs(y - 62), 2)
+        self.assertEqual((w, h), (80, 80))
+        self.assertIsNone(tracker.update(self.np.zeros_like(frame)))
+
+    def test_tracks_keep_id_and_cached_results(self):
+        """Una detección que solapa con un track existente conserva su id y sus resultados"""
+        tracker = self.streaming.FaceTracker(detector_backend="opencv")
+        detections = iter([[(10, 10, 100, 100)], [(15, 12, 100, 100), (300, 10, 100, 100)]])
+
+        def grab(img, detector_backend):
+            return next(detections)
+
+        with mock.patch.object(self.streaming, "grab_facial_areas", grab):
+            img = self.np.zeros((200, 420, 3), dtype=self.np.uint8)
+            first = tracker.update(img)
+            first[0].identity = ("alice.jpg", None)
+            second = tracker.update(img)
+        self.assertEqual([track.track_id for track in second], [0, 1])
+        self.assertEqual(second[0].identity, ("alice.jpg", None))
+        self.assertEqual(second[0].box, (15, 12, 100, 100))
+        self.assertIsNone(second[1].identity)
+
+    def test_unknown_track_is_looked_up_once_between_retries(self):
+        """Una cara desconocida no se busca en cada frame: se reintenta sólo en frames de detección"""
+        find_identity = mock.Mock(return_value=(None, None))
+        track = self.streaming.FaceTrack(track_id=0, box=(10, 10, 40, 40), tracker=None)
+        img = self.np.zeros((80, 80, 3), dtype=self.np.uint8)
+        retry = self.streaming.IDENTITY_RETRY_FRAMES
+
+        def analyze(frame_idx):
+            return self.streaming.analyze_tracked_face(
+                img=img,
+                track=track,
+                box=track.box,
+                db_path="/db",
+                model_name="Facenet512",
+                detector_backend="opencv",
+                distance_metric="cosine",
+                enable_face_analysis=False,
+                frame_idx=frame_idx,
+                detected=frame_idx % 5 == 0,
+            )
+
+        with mock.patch.object(self.streaming, "find_identity", find_identity):
+            results = [analyze(frame_idx) for frame_idx in range(retry)]
+            self.assertEqual(find_identity.call_count, 1)
+            self.assertIsNone(results[-1]["identity"])
+
+            # pasado el intervalo sólo se reintenta en un frame de detección
+            analyze(retry + 1)
+            self.assertEqual(find_identity.call_count, 1)
+            find_identity.return_value = ("/db/alice.jpg", 0.2)
+            analyze(retry + 5)
+            self.assertEqual(find_identity.call_count, 2)
+            self.assertEqual(analyze(retry + 10)["identity"], "alice.jpg")
+            self.assertEqual(find_identity.call_count, 2)
+
+    def test_headless_analysis_emits_result_per_frame(self):
+        """El modo sin pantalla emite un resultado JSON por frame leído del video"""
+        import json
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clip.avi")
+            writer = self.cv2.VideoWriter(path, self.cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+            for _ in range(12):
+                writer.write(self.np.zeros((48, 64, 3), dtype=self.np.uint8))
+            writer.release()
+
+            results = list(self.streaming.headless_analysis(source=path, drop_frames=False))
+
+        self.assertEqual([result["frame"] for result in results], list(range(12)))
+        self.assertEqual(results[0]["faces"], [])
+        self.assertEqual(results[-1]["dropped_frames"], 0)
+        json.dumps(results)
+
+    def test_headless_analysis_raises_detector_and_capture_errors(self):
+        """Un fallo del detector o de la captura llega al consumidor en vez de cortar el stream"""
+        import os
+        import tempfile
+
+        def broken_detector(img, detector_backend):
+            raise RuntimeError("detector roto")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clip.avi")
+            writer = self.cv2.VideoWriter(path, self.cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+            for _ in range(3):
+                writer.write(self.np.zeros((48, 64, 3), dtype=self.np.uint8))
+            writer.release()
+
+            with mock.patch.object(self.streaming, "grab_facial_areas", broken_detector):
+                with self.assertRaisesRegex(RuntimeError, "detector roto"):
+                    list(self.streaming.headless_analysis(source=path, drop_frames=False))
+
+        cap = mock.Mock()
+        cap.isOpened.return_value = True
+        cap.read.side_effect = OSError("cámara desconectada")
+        with mock.patch.object(self.streaming.cv2, "VideoCapture", return_value=cap):
+            with self.assertRaisesRegex(OSError, "cámara desconectada"):
+                list(self.streaming.headless_analysis(source=0))
+        cap.release.assert_called_once()
+
+    def test_gallery_searches_in_memory_and_reloads_on_change(self):
+        """La galería responde con una búsqueda vectorizada y se recarga al cambiar db_path"""
+        import os
+        import tempfile
+        from deepface.modules import recognition
+
+        np = self.np
+        with tempfile.TemporaryDirectory() as db_path:
+            alice, bob = os.path.join(db_path, "alice.jpg"), os.path.join(db_path, "bob.jpg")
+            representations = [{"identity": alice, "embedding": [1.0, 0.0, 0.0]}]
+            open(alice, "wb").close()
+
+            sync = mock.Mock(side_effect=lambda **kwargs: ("ds.pkl", list(representations)))
+            with mock.patch.object(recognition, "sync_datastore", sync):
+                gallery = self.streaming.Gallery(
+                    db_path=db_path,
+                    model_name="Facenet512",
+                    detector_backend="opencv",
+                    distance_metric="cosine",
+                    refresh_interval=3600,
+                )
+                identity, distance = gallery.search(np.array([0.9, 0.1, 0.0]))
+                self.assertEqual(identity, alice)
+                self.assertLess(distance, 0.01)
+                self.assertEqual(gallery.search([0.0, 0.0, 1.0]), (None, None))
+
+                # sin cambios en disco no se vuelve a sincronizar
+                self.assertFalse(gallery.refresh(force=True))
+
+                open(bob, "wb").close()
+                representations.append({"identity": bob, "embedding": [0.0, 0.0, 1.0]})
+                self.assertTrue(gallery.refresh(force=True))
+                self.assertEqual(gallery.search([0.0, 0.1, 1.0])[0], bob)
+            self.assertEqual(sync.call_count, 2)
+
+
+class TestDirectoryTracker(unittest.TestCase):
+    """Pruebas del seguimiento de cambios en db_path (deepface.commons.image_utils)"""
+
+    def setUp(self):
+        try:
+            from deepface.commons import image_utils
+        except ImportError:
+            self.skipTest("DeepFace not installed (expected in CI environment)")
+        self.image_utils = image_utils
+
+    def test_scan_reports_added_removed_and_replaced(self):
+        """Un solo recorrido detecta imágenes nuevas, borradas y reemplazadas por extensión"""
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as db_path:
+            os.makedirs(os.path.join(db_path, "team"))
+            paths = [os.path.join(db_path, name) for name in ("a.jpg", "b.png", "team/c.JPG")]
+            for path in paths:
+                with open(path, "wb") as f:
+                    f.write(b"x")
+            with open(os.path.join(db_path, "notes.txt"), "wb") as f:
+                f.write(b"x")
+
+            tracker = self.image_utils.DirectoryTracker(db_path, use_inotify=False)
+            self.assertTrue(tracker.is_dirty())
+            added, removed, replaced = tracker.scan()
+            self.assertEqual(sorted(added), sorted(paths))
+
+            self.assertEqual(tracker.scan(), ([], [], []))
+
+            os.remove(paths[1])
+            with open(paths[0], "wb") as f:
+                f.write(b"replaced")
+            added, removed, replaced = tracker.scan()
+            self.assertEqual((added, removed, replaced), ([], [paths[1]], [paths[0]]))
+
+
+class TestEmbedding(unittest.TestCase):
+    """Pruebas del tipo Embedding float32 (deepface.models.Embedding)"""
+
+    def setUp(self):
+        try:
+            import numpy as np
+            from deepface.models.Embedding import Embedding, json_default
+            from deepface.modules import verification
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.np = np
+        self.Embedding = Embedding
+        self.json_default = json_default
+        self.verification = verification
+
+    def test_wraps_float32_without_copy_and_round_trips(self):
+        """Envuelve el buffer float32 sin copiarlo, de solo lectura, y sobrevive pickle/base64/JSON"""
+        import json
+        import pickle
+
+        np = self.np
+        values = np.array([3.0, 4.0, 0.0], dtype=np.float32)
+        embedding = self.Embedding(values, model_name="Facenet512")
+
+        self.assertTrue(np.shares_memory(np.asarray(embedding), values))
+        with self.assertRaises(ValueError):
+            embedding.values[0] = 1.0
+        self.assertEqual((embedding.dims, embedding.norm, embedding.normalized), (3, 5.0, False))
+        self.assertTrue(embedding.normalize().normalized)
+        self.assertEqual(list(embedding), [3.0, 4.0, 0.0])
+
+        restored = self.Embedding.from_base64(embedding.to_base64(), model_name="Facenet512")
+        self.assertEqual(restored, embedding)
+        self.assertEqual(pickle.loads(pickle.dumps(embedding)), embedding)
+        self.assertEqual(json.loads(json.dumps({"e": embedding}, default=self.json_default)),
+                         {"e": [3.0, 4.0, 0.0]})
+
+    def test_distances_match_vectorized_and_accept_numpy_scalars(self):
+        """La distancia entre Embeddings coincide con la matricial; verify acepta escalares NumPy"""
+        np = self.np
+        rng = np.random.default_rng(0)
+        alpha, beta = rng.normal(size=(2, 128)).astype(np.float32)
+        for metric in ("cosine", "euclidean", "euclidean_l2"):
+            expected = self.verification.find_distance_matrix(alpha, beta, metric)[0, 0]
+            distance = self.verification.find_distance(
+                self.Embedding(alpha), self.Embedding(beta), metric
+            )
+            self.assertAlmostEqual(float(distance), float(expected), places=4)
+
+        model = mock.Mock(output_shape=128)
+        with mock.patch.object(self.verification.modeling, "build_model", return_value=model):
+            result = self.verification.verify(
+                img1_path=list(alpha),  # items np.float32, no float
+                img2_path=self.Embedding(alpha),
+                model_name="Facenet",
+                silent=True,
+            )
+        self.assertTrue(result["verified"])
+        self.assertAlmostEqual(result["distance"], 0.0, places=5)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Pruebas de los histogramas de latencia por etapa (deepface.commons.latency_utils)"""
+
+    def setUp(self):
+        try:
+            from deepface.commons import latency_utils
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.latency_utils = latency_utils
+
+    def test_percentiles_merge_thread_shards(self):
+        """Los percentiles de varios hilos coinciden con los exactos con error < 1%"""
+        import threading
+
+        values = [(i % 1000 + 1) / 1000 for i in range(20000)]  # 1ms..1s
+        histogram = self.latency_utils.LatencyHistogram()
+        threads = [
+            threading.Thread(target=lambda chunk: [histogram.record(v) for v in chunk],
+                             args=(values[i::4],))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = histogram.get_stats()
+        self.assertEqual(stats["count"], len(values))
+        self.assertEqual(stats["max_ms"], 1000.0)
+        for key, expected in (("p50_ms", 500.0), ("p95_ms", 950.0), ("p99_ms", 990.0)):
+            self.assertAlmostEqual(stats[key], expected, delta=expected * 0.01)
+
+    def test_short_lived_threads_keep_shards_bounded(self):
+        """Muchos hilos efímeros reparten sus registros en un número fijo de shards"""
+        import threading
+
+        histogram = self.latency_utils.LatencyHistogram()
+        for _ in range(10):
+            threads = [threading.Thread(target=histogram.record, args=(0.01,)) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        shards = [shard for shard in histogram._shards if shard is not None]
+        self.assertLessEqual(len(histogram._shards), self.latency_utils.SHARD_COUNT)
+        self.assertEqual(len(shards), self.latency_utils.SHARD_COUNT)
+        self.assertEqual(histogram.get_stats()["count"], 200)
+
+    def test_prometheus_exposition(self):
+        """Exporta cada histograma como summary con cuantiles, suma, conteo y máximo"""
+        registry = self.latency_utils.LatencyRegistry()
+        registry.record("detection", 0.25, count=2)
+        text = self.latency_utils.to_prometheus(
+            registry, "facial_stage_latency_seconds", "stage", "Latency"
+        )
+        lines = text.splitlines()
+        self.assertIn("# TYPE facial_stage_latency_seconds summary", lines)
+        self.assertIn('facial_stage_latency_seconds{stage="detection",quantile="0.99"} 0.250000', lines)
+        self.assertIn('facial_stage_latency_seconds_count{stage="detection"} 2', lines)
+        self.assertIn('facial_stage_latency_seconds_max{stage="detection"} 0.250000', lines)
+
+
+class TestRequestProfiler(unittest.TestCase):
+    """Pruebas del profiler de muestreo por petición"""
+
+    def setUp(self):
+        from request_profiler import RequestProfiler
+        self.profiler_cls = RequestProfiler
+
+    def test_keeps_only_slow_requests_with_worker_stacks(self):
+        """Guarda las pilas de la petición lenta (incluido su worker) y descarta la rápida"""
+        import threading
+        import time
+
+        profiler = self.profiler_cls(enabled=True, slow_ms=30, interval_ms=1, max_profiles=2)
+
+        def slow_stage():
+            time.sleep(0.06)
+
+        profile = profiler.start('register')
+        worker = threading.Thread(target=profiler.bind(slow_stage))
+        worker.start()
+        worker.join()
+        profiler.stop(profile, 0.06)
+
+        fast = profiler.start('register')
+        profiler.stop(fast, 0.001)
+
+        stats = profiler.get_stats()
+        self.assertEqual((stats['stored'], stats['discarded']), (1, 1))
+        self.assertEqual(stats['profiles'][0]['reason'], 'slow')
+        collapsed = profiler.collapsed(endpoint='register')
+        self.assertIn('test_unit.py:slow_stage', collapsed)
+        for line in collapsed.splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('register;'))
+            self.assertGreater(int(count), 0)
+
+    def test_nested_stop_restores_outer_profile(self):
+        """Al terminar una petición anidada el hilo vuelve a muestrearse con la externa"""
+        import threading
+
+        profiler = self.profiler_cls(enabled=True, slow_ms=0, interval_ms=1)
+        outer = profiler.start('register')
+        inner = profiler.start('verify')
+        profiler.stop(inner, 0.01)
+        self.assertIs(profiler._local.profile, outer)
+        self.assertIs(profiler._active[threading.get_ident()], outer)
+
+        profiler.stop(outer, 0.01)
+        self.assertIsNone(profiler._local.profile)
+        self.assertNotIn(threading.get_ident(), profiler._active)
+        self.assertEqual(profiler.get_stats()['stored'], 2)
+
+    def test_disabled_profiler_is_a_no_op(self):
+        """Deshabilitado no crea perfiles ni envuelve funciones"""
+        profiler = self.profiler_cls(enabled=False)
+        self.assertIsNone(profiler.start('verify'))
+        self.assertIs(profiler.bind(len), len)
+        profiler.stop(None, 10)
+        self.assertEqual(profiler.get_stats()['stored'], 0)
+
+
+class TestAdmissionControl(unittest.TestCase):
+    """Pruebas del control de admisión adaptativo"""
+
+    def setUp(self):
+        try:
+            import admission_control
+        except ImportError:
+            self.skipTest("DeepFace not installed (expected in CI environment)")
+        self.admission = admission_control
+
+    def test_sheds_by_slo_and_memory_and_serves_interactive_before_batch(self):
+        """Rechaza con Retry-After si la espera prevista supera el SLO, serializa la inferencia
+        si falta memoria y entrega la plaza liberada a la petición interactiva antes que al lote"""
+        import threading
+        import time
+
+        controller = self.admission.AdmissionController(slo_ms=500, initial_limit=1, max_limit=1)
+        ticket = controller.acquire()
+        controller.release(ticket, service_seconds=0.4)
+
+        held = controller.acquire()
+        with self.assertRaises(self.admission.Rejected) as ctx:
+            controller.acquire()  # 0.4 s de espera + 0.4 s de servicio > 0.5 s
+        self.assertEqual((ctx.exception.reason, ctx.exception.retry_after), ('slo', 1))
+
+        controller.short_rtt = 0.01
+        order = []
+
+        def wait(priority, name):
+            controller.release(controller.acquire(priority), service_seconds=0.01)
+            order.append(name)
+
+        batch = threading.Thread(target=wait, args=(self.admission.BATCH, 'batch'))
+        batch.start()
+        time.sleep(0.05)
+        interactive = threading.Thread(target=wait, args=(self.admission.INTERACTIVE, 'interactive'))
+        interactive.start()
+        time.sleep(0.05)
+        controller.release(held, service_seconds=0.01)
+        batch.join()
+        interactive.join()
+        self.assertEqual(order, ['interactive', 'batch'])
+
+        starved = self.admission.AdmissionController(memory_probe=lambda: 900, memory_limit_mb=700)
+        only = starved.acquire()
+        with self.assertRaises(self.admission.Rejected) as ctx:
+            starved.acquire()
+        self.assertEqual(ctx.exception.reason, 'memory')
+        stats = starved.get_stats()
+        self.assertEqual((stats['shed'], stats['in_flight']), ({'interactive:memory': 1}, 1))
+        starved.release(only)
+
+    def test_limit_grows_while_latency_holds_and_shrinks_when_it_rises(self):
+        """El límite sube con la latencia estable a plena ocupación, baja ante una subida
+        brusca de latencia y, si se sostiene por encima del SLO, cae hasta el mínimo"""
+        controller = self.admission.AdmissionController(initial_limit=4, max_limit=64, slo_ms=300)
+
+        def saturate(rtt, rounds):
+            for _ in range(rounds):
+                tickets = [controller.acquire() for _ in range(controller.current_limit)]
+                for ticket in tickets:
+                    controller.release(ticket, service_seconds=rtt)
+
+        saturate(0.05, 10)
+        grown = controller.current_limit
+        self.assertGreater(grown, 4)
+
+        saturate(0.2, 1)
+        self.assertLess(controller.current_limit, grown)
+
+        saturate(0.6, 20)
+        self.assertEqual(controller.current_limit, 1)
+
+
+class TestMemoryGovernor(unittest.TestCase):
+    """Pruebas del gobernador de memoria (memory_optimizer.MemoryGovernor)"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        try:
+            import memory_optimizer
+        except ImportError:
+            self.skipTest("psutil not installed (expected in CI environment)")
+        self.memory = memory_optimizer
+        self.cgroup_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cgroup_dir)
+
+    def write_cgroup(self, current_mb, inactive_mb=0, limit='1048576000'):
+        import os
+        mb = 1024 * 1024
+        for name, value in (('memory.current', str(current_mb * mb)), ('memory.max', limit),
+                            ('memory.stat', f"anon 1\ninactive_file {inactive_mb * mb}\n")):
+            with open(os.path.join(self.cgroup_dir, name), 'w') as f:
+                f.write(value)
+
+    def test_levels_follow_cgroup_working_set_and_drive_handlers(self):
+        """Umbrales al 75%/90% del límite del cgroup, sin contar la caché de archivos inactiva"""
+        self.write_cgroup(current_mb=850, inactive_mb=100)
+        governor = self.memory.MemoryGovernor(cgroup=self.memory.CgroupMemory(2, self.cgroup_dir), cooldown=0)
+        levels = []
+        governor.on_pressure('test', levels.append)
+        governor.add('images', 3 * 1024 * 1024)
+        governor.register_reporter('models', lambda: 90 * 1024 * 1024)
+
+        self.assertEqual((governor.source, governor.warning_mb, governor.critical_mb), ('cgroup-v2', 750, 900))
+        self.assertEqual(governor.check(), 'warning')
+        self.assertEqual(governor.batch_size(8), 4)
+        self.write_cgroup(current_mb=950)
+        self.assertEqual(governor.check(), 'critical')
+        self.assertEqual(governor.batch_size(8), 1)
+        self.write_cgroup(current_mb=400)
+        self.assertEqual(governor.check(), 'normal')
+        self.assertEqual(governor.check(), 'normal')
+
+        self.assertEqual(levels, ['warning', 'critical', 'normal'])
+        stats = governor.get_stats()
+        self.assertEqual(stats['subsystems_mb'], {'images': 3.0, 'models': 90.0})
+        self.assertEqual((stats['events']['to_critical'], stats['events']['reclaims']), (1, 2))
+
+    def test_pressure_changes_and_handler_errors_are_logged(self):
+        """Los cambios de nivel se registran como warning y los fallos de un handler como error"""
+        self.write_cgroup(current_mb=950)
+        governor = self.memory.MemoryGovernor(cgroup=self.memory.CgroupMemory(2, self.cgroup_dir), cooldown=0)
+
+        def broken_handler(level):
+            raise RuntimeError("handler roto")
+
+        governor.on_pressure('broken', broken_handler)
+        with self.assertLogs('memory_optimizer', level='INFO') as logs:
+            self.assertEqual(governor.check(), 'critical')
+        levels = [record.levelname for record in logs.records]
+        self.assertEqual(levels, ['WARNING', 'ERROR'])
+        self.assertIn('broken', logs.records[1].getMessage())
+
+    def test_cgroup_without_limit_falls_back_to_process_rss(self):
+        """Un cgroup sin límite no sirve de referencia: se usa el RSS propio y los umbrales fijos"""
+        self.write_cgroup(current_mb=5000, limit='max')
+        governor = self.memory.MemoryGovernor(cgroup=self.memory.CgroupMemory(2, self.cgroup_dir))
+        self.assertEqual(governor.source, 'statm')
+        self.assertEqual(governor.critical_mb, self.memory.MemoryOptimizer.CRITICAL_THRESHOLD)
+        self.assertLess(governor.read_usage_mb(), 5000)
+
+
+class TestModelPool(unittest.TestCase):
+    """Pruebas del pool de modelos con presupuesto de memoria (deepface.commons.model_pool)"""
+
+    def setUp(self):
+        try:
+            from deepface.commons import model_pool
+        except ImportError:
+            self.skipTest("NumPy/DeepFace not installed (expected in CI environment)")
+        self.model_pool = model_pool
+        self.builds = []
+
+    def factory(self, name, params=100_000):
+        """Modelo falso de `params` parámetros (400 KB en float32) que anota cada construcción"""
+        def build():
+            self.builds.append(name)
+            weights = type('Weights', (), {'count_params': lambda _self: params})()
+            return type('Client', (), {'name': name, 'model': weights})()
+        return build
+
+    def test_lru_eviction_skips_models_in_use_and_reloads_on_demand(self):
+        """Al superar el presupuesto se descarta el menos usado que nadie retiene; se reconstruye al pedirlo"""
+        pool = self.model_pool.ModelPool(budget_mb=1)
+        with pool.use('age', self.factory('age')):
+            pool.get('gender', self.factory('gender'))
+            pool.get('race', self.factory('race'))
+            # 1.2 MB > 1 MB: age es el más antiguo pero está en uso, cae gender
+            self.assertEqual(sorted(pool.get_stats()['models']), ['age', 'race'])
+            self.assertEqual(pool.get_stats()['models']['age']['refs'], 1)
+
+        # age se usó hasta salir del bloque: ahora el menos usado es race
+        self.assertEqual(pool.get('gender', self.factory('gender')).name, 'gender')
+        stats = pool.get_stats()
+        self.assertEqual(sorted(stats['models']), ['age', 'gender'])
+        self.assertEqual((stats['loads'], stats['evictions']), (4, 2))
+        self.assertEqual(stats['memory_bytes'], 800_000)
+        self.assertEqual(self.builds, ['age', 'gender', 'race', 'gender'])
+
+    def test_idle_unload_and_disabled_reload(self):
+        """Los modelos inactivos se descargan; sin recarga bajo demanda, pedirlos de nuevo falla"""
+        pool = self.model_pool.ModelPool(reload=False)
+        pool.get('emotion', self.factory('emotion'))
+        with pool.use('age', self.factory('age')):
+            self.assertEqual(pool.unload_idle(0), ['emotion'])
+        self.assertEqual(pool.unload(['age', 'missing']), ['age'])
+        with self.assertRaises(self.model_pool.ModelUnloadedError):
+            pool.get('emotion', self.factory('emotion'))
+        self.assertEqual(pool.get_stats()['unloads'], 2)
+
+    def test_idle_unload_restricted_to_keys_keeps_recent_models(self):
+        """Bajo presión sólo se descargan los modelos indicados que llevan tiempo sin usarse"""
+        pool = self.model_pool.ModelPool()
+        for name in ('age', 'gender', 'facenet'):
+            pool.get(name, self.factory(name))
+        pool._entries['age'].last_used -= 300
+        pool._entries['facenet'].last_used -= 300
+
+        self.assertEqual(pool.unload_idle(120, keys=['age', 'gender']), ['age'])
+        self.assertEqual(sorted(pool.get_stats()['models']), ['facenet', 'gender'])
+
+    def test_concurrent_first_calls_share_one_build(self):
+        """Las primeras peticiones simultáneas esperan a una sola construcción; si falla, se reintenta"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        pool = self.model_pool.ModelPool()
+        started, finish = threading.Event(), threading.Event()
+        slow = self.factory('facenet')
+
+        def build():
+            started.set()
+            finish.wait(5)
+            return slow()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(pool.acquire, 'facenet', build)]
+            started.wait(5)
+            futures += [executor.submit(pool.acquire, 'facenet', build) for _ in range(7)]
+            while pool.get_stats()['shared_builds'] < 7:
+                threading.Event().wait(0.01)
+            finish.set()
+            models = [future.result() for future in futures]
+
+        self.assertEqual(self.builds, ['facenet'])
+        self.assertEqual(len({id(model) for model in models}), 1)
+        self.assertEqual(pool.get_stats()['models']['facenet']['refs'], 8)
+
+        def broken():
+            raise OSError('descarga de pesos fallida')
+
+        with self.assertRaises(OSError):
+            pool.get('arcface', broken)
+        self.assertEqual(pool.get('arcface', self.factory('arcface')).name, 'arcface')
+        self.assertEqual((pool.get_stats()['build_errors'], pool.get_stats()['building']), (1, 0))
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    """Pruebas de la cola de escritura diferida a Redis (write_behind.WriteBehindQueue)"""
+
+    def setUp(self):
+        try:
+            import write_behind
+        except ImportError:
+            self.skipTest("DeepFace not installed (expected in CI environment)")
+        self.write_behind = write_behind
+        self.batches = []
+
+    def test_coalesces_keys_and_flushes_in_batches(self):
+        """Las escrituras repetidas de una clave se fusionan; se leen antes de llegar a Redis"""
+        queue = self.write_behind.WriteBehindQueue(self.batches.append, batch_size=3, flush_interval=0.01)
+        for n in range(3):
+            queue.put('user:a', f'v{n}', ttl=60)
+        for key in ('user:b', 'user:c', 'user:d'):
+            queue.put(key, 'x', ttl=60)
+        self.assertEqual(queue.pending('user:a'), 'v2')
+
+        self.assertTrue(queue.start().flush(timeout=2))
+        self.assertEqual(self.batches, [
+            [('user:a', 'v2', 60), ('user:b', 'x', 60), ('user:c', 'x', 60)],
+            [('user:d', 'x', 60)],
+        ])
+        stats = queue.get_stats()
+        self.assertEqual((stats['coalesced'], stats['flushed'], stats['batches'], stats['pending']), (2, 4, 2, 0))
+        self.assertIsNone(queue.pending('user:a'))
+        queue.close()
+
+    def test_retries_with_backoff_and_bounds_memory(self):
+        """Un lote fallido se reintenta; con la cola llena las escrituras prescindibles se descartan"""
+        failures = [ConnectionError('redis caído')] * 2
+
+        def flaky(items):
+            if failures:
+                raise failures.pop()
+            self.batches.append(items)
+
+        queue = self.write_behind.WriteBehindQueue(flaky, flush_interval=0, backoff_base=0.001).start()
+        with self.assertLogs('write_behind', level='WARNING') as logs:
+            queue.put('user:a', 'v', ttl=60)
+            self.assertTrue(queue.flush(timeout=2))
+        self.assertEqual(len(logs.records), 2)
+        stats = queue.get_stats()
+        self.assertEqual(self.batches, [[('user:a', 'v', 60)]])
+        self.assertEqual((stats['failed_batches'], stats['retries'], stats['dropped']), (2, 2, {}))
+        queue.close()
+
+        full = self.write_behind.WriteBehindQueue(self.batches.append, max_bytes=10, block_timeout=0.01)
+        self.assertTrue(full.put('hash:1', 'a' * 8, droppable=True))
+        self.assertFalse(full.put('hash:2', 'b' * 8, droppable=True))
+        self.assertFalse(full.put('user:b', 'c' * 8))
+        self.assertTrue(full.put('hash:1', 'd' * 9, droppable=True))
+        self.assertTrue(full.discard('hash:1'))
+        self.assertEqual((full.pending_bytes, full.get_stats()['dropped']), (0, {'full': 2}))
+
+
+    def test_registrations_outlive_retry_limit_and_dropped_keys_are_logged(self):
+        """Un registro se reintenta sin límite; lo prescindible se descarta con su clave en el log"""
+        failures = [ConnectionError('redis caído')] * 4
+
+        def flaky(items):
+            if failures:
+                raise failures.pop()
+            self.batches.append(items)
+
+        queue = self.write_behind.WriteBehindQueue(flaky, flush_interval=0, max_retries=1,
+                                                   backoff_base=0.001)
+        queue.put('hash:1', 'h', ttl=60, droppable=True)
+        queue.put('user:a', 'v', ttl=60)
+        with self.assertLogs('write_behind', level='WARNING') as logs:
+            self.assertTrue(queue.start().flush(timeout=2))
+        queue.close()
+
+        self.assertEqual(self.batches, [[('user:a', 'v', 60)]])
+        self.assertEqual(queue.get_stats()['dropped'], {'retries': 1})
+        errors = [record.getMessage() for record in logs.records if record.levelname == 'ERROR']
+        self.assertEqual(len(errors), 1)
+        self.assertIn('hash:1', errors[0])
+
+class TestAsyncLogging(unittest.TestCase):
+    """Pruebas del logging asíncrono con muestreo (deepface.commons.logger)"""
+
+    def setUp(self):
+        import logging
+        try:
+            from deepface.commons import logger as log
+        except ImportError:
+            self.skipTest("DeepFace not installed (expected in CI environment)")
+        self.log = log
+        root = logging.getLogger()
+        deepface_logger = logging.getLogger(log.LOGGER_NAME)
+        saved = (list(root.handlers), root.level, list(deepface_logger.handlers),
+                 deepface_logger.propagate, log.sink_configured)
+
+        def restore():
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            for handler in saved[0]:
+                root.addHandler(handler)
+            root.setLevel(saved[1])
+            for handler in saved[2]:
+                deepface_logger.addHandler(handler)
+            deepface_logger.propagate = saved[3]
+            log.sink_configured = saved[4]
+        self.addCleanup(restore)
+
+    def test_deepface_records_share_the_sink_and_debug_lines_are_sampled(self):
+        """deepface escribe en el mismo sink y de los DEBUG repetidos sólo sale 1 de cada N"""
+        import io
+        import json
+        import logging
+
+        stream = io.StringIO()
+        listener = self.log.setup_async_logging(
+            level=logging.DEBUG, structured=True, sample_every=3, stream=stream
+        )
+        app_logger = logging.getLogger("facial.test")
+        for i in range(7):
+            app_logger.debug("intento %d", i)
+        app_logger.info("usuario %s", "u1", extra={"endpoint": "register"})
+        self.log.Logger().info("detector %s listo", "opencv")
+        listener.stop()
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        messages = [record["message"] for record in records]
+        self.assertEqual(messages[:3], ["intento 0", "intento 3", "intento 6"])
+        self.assertEqual(records[3]["endpoint"], "register")
+        self.assertEqual(records[4], {**records[4], "logger": "deepface", "message": "detector opencv listo"})
+        self.assertEqual(self.log.get_async_stats()["sampled_out"], 4)
+
+
+class TestLoadImage(unittest.TestCase):
+    """Pruebas de la carga de imágenes de deepface (deepface.commons.image_utils)"""
+
+    def setUp(self):
+        try:
+            import cv2
+            import numpy as np
+            from deepface.commons import image_utils
+        except ImportError:
+            self.skipTest("OpenCV/DeepFace not installed (expected in CI environment)")
+        self.cv2, self.np, self.image_utils = cv2, np, image_utils
+
+    def test_base64_data_uri_decodes_like_the_file(self):
+        """Una imagen en data URI se decodifica igual que el mismo JPEG leído de disco"""
+        import base64
+        img = self.np.random.default_rng(0).integers(0, 255, (48, 64, 3), dtype=self.np.uint8)
+        encoded = self.cv2.imencode('.jpg', img)[1]
+        uri = 'data:image/jpeg;base64,' + base64.b64encode(encoded).decode()
+
+        loaded, name = self.image_utils.load_image(uri)
+
+        self.assertEqual(name, "base64 encoded string")
+        self.np.testing.assert_array_equal(loaded, self.cv2.imdecode(encoded, self.cv2.IMREAD_COLOR))
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
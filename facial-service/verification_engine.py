@@ -0,0 +1,139 @@
+# Motor de verificación facial reutilizable para Facial-Service
+# Compara embeddings precalculados o imágenes con NumPy vectorizado (float32)
+
+import numpy as np
+from deepface.modules import verification, detection, representation
+from deepface.models.Embedding import Embedding
+from deepface.commons.latency_utils import stage_latency
+
+
+class VerificationEngine:
+    """Verifica pares de caras a partir de embeddings precalculados o imágenes.
+
+    - Embeddings como objetos `Embedding` (float32 de solo lectura, norma cacheada)
+    - Distancias vectorizadas (float32) con todas las métricas de `verification.find_distance`
+    - Umbral por modelo/métrica desde `verification.find_threshold`
+    - Extracción concurrente de ambos embeddings a través del pool de workers
+    - Lotes: una sola llamada al detector y una sola inferencia del modelo por lote
+    """
+
+    def __init__(self, model_name='Facenet512', distance_metric='cosine',
+                 detector_backend='opencv', threshold=None, executor=None):
+        self.model_name = model_name
+        self.distance_metric = distance_metric
+        self.detector_backend = detector_backend
+        self.executor = executor
+        if threshold is None:
+            threshold = verification.find_threshold(model_name, distance_metric)
+        self.threshold = float(threshold)
+
+    @staticmethod
+    def is_embedding(source):
+        """True si `source` es un embedding (Embedding, lista de números o vector 1-D), no una imagen"""
+        if isinstance(source, np.ndarray):
+            return source.ndim == 1
+        return isinstance(source, (Embedding, list, tuple))
+
+    def to_vector(self, embedding):
+        """Convierte un embedding (lista JSON o array) a Embedding float32 sin copiar si ya lo es"""
+        return Embedding.from_any(embedding, model_name=self.model_name)
+
+    def represent(self, image):
+        """Calcula el embedding de una imagen (Base64 o array BGR) con el modelo configurado"""
+        from deepface import DeepFace
+
+        rep = DeepFace.represent(
+            img_path=image,
+            model_name=self.model_name,
+            detector_backend=self.detector_backend,
+            enforce_detection=True
+        )
+        return rep[0]['embedding'] if rep else None
+
+    def represent_many(self, images, loader=None):
+        """Calcula los embeddings de un lote de imágenes.
+
+        El decodificado con `loader` (si se indica) se reparte en el pool de workers, las
+        caras se detectan con una sola llamada al detector y todas se pasan al modelo en
+        una sola inferencia. Retorna una lista alineada con `images`: el embedding o la
+        excepción de cada imagen (ValueError si no se detectó cara).
+        """
+        def load_safely(image):
+            try:
+                return loader(image) if loader is not None else image
+            except Exception as e:
+                return e
+
+        if self.executor is None or len(images) < 2:
+            loaded = [load_safely(image) for image in images]
+        else:
+            loaded = list(self.executor.map(load_safely, images))
+
+        valid = [img for img in loaded if not isinstance(img, Exception)]
+        try:
+            faces_batch = iter(detection.extract_faces_batch(
+                img_paths=valid,
+                detector_backend=self.detector_backend,
+                enforce_detection=True,
+                align=True
+            ))
+            # igual que `represent`: se usa la primera cara de cada imagen
+            detections = []
+            for img in loaded:
+                faces = img if isinstance(img, Exception) else next(faces_batch)
+                if isinstance(faces, list) and not faces:
+                    faces = ValueError('No se detectó una cara en la imagen')
+                detections.append(faces if isinstance(faces, Exception) else faces[0])
+
+            faces = [d for d in detections if not isinstance(d, Exception)]
+            reps = iter(representation.represent_faces(faces, model_name=self.model_name))
+        except Exception as e:
+            return [img if isinstance(img, Exception) else e for img in loaded]
+        return [d if isinstance(d, Exception) else next(reps)['embedding'] for d in detections]
+
+    def embed(self, source):
+        """Devuelve el embedding de `source`, sea un embedding precalculado o una imagen"""
+        if self.is_embedding(source):
+            return self.to_vector(source)
+        return self.represent(source)
+
+    def embed_many(self, sources, resolver=None):
+        """Obtiene los embeddings de varias fuentes en paralelo usando el pool de workers.
+
+        `resolver` permite inyectar la lógica de caché del llamador; por defecto `embed`.
+        Las excepciones (p.ej. ValueError si no hay cara) se propagan al llamador.
+        """
+        resolver = resolver or self.embed
+        if self.executor is None or len(sources) < 2:
+            return [resolver(source) for source in sources]
+        futures = [self.executor.submit(resolver, source) for source in sources]
+        return [future.result() for future in futures]
+
+    def distance(self, emb1, emb2):
+        """Distancia entre dos embeddings según la métrica configurada (normas cacheadas, sin copias)"""
+        with stage_latency.time('distance'):
+            return float(verification.find_distance(
+                self.to_vector(emb1), self.to_vector(emb2), self.distance_metric
+            ))
+
+    def compare(self, emb1, emb2):
+        """Compara dos embeddings y devuelve el resultado de verificación"""
+        distance = self.distance(emb1, emb2)
+        verified = distance <= self.threshold
+        return {
+            'verified': bool(verified),
+            'distance': distance,
+            'threshold': self.threshold,
+            'confidence': float(1 - min(distance / self.threshold, 1.0)) if verified else 0.0
+        }
+
+    def verify(self, source1, source2, resolver=None):
+        """Verifica dos fuentes (embeddings o imágenes) procesándolas concurrentemente.
+
+        Retorna None si no se pudo obtener el embedding de alguna de ellas.
+        """
+        emb1, emb2 = self.embed_many([source1, source2], resolver=resolver)
+        if emb1 is None or emb2 is None or len(emb1) == 0 or len(emb2) == 0:
+            return None
+        return self.compare(emb1, emb2)
+
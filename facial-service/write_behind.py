@@ -0,0 +1,285 @@
+# Cola de escritura diferida (write-behind) para la persistencia en Redis de Facial-Service
+# Las peticiones encolan la escritura y responden; un hilo propio la vuelca a Redis por lotes
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from deepface.commons.latency_utils import LatencyRegistry, to_prometheus
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    __slots__ = ('payload', 'ttl', 'droppable', 'attempts', 'enqueued_at')
+
+    def __init__(self, payload, ttl, droppable, enqueued_at):
+        self.payload = payload
+        self.ttl = ttl
+        self.droppable = droppable
+        self.attempts = 0
+        self.enqueued_at = enqueued_at
+
+
+class WriteBehindQueue:
+    """Escrituras SET diferidas, agrupadas y con reintentos, en un hilo dedicado.
+
+    - `put` no toca la red: guarda el payload en memoria y vuelve. Varias escrituras de la misma
+      clave pendientes se fusionan en una (gana la última); `pending` las devuelve para que las
+      lecturas vean sus propias escrituras antes de que lleguen a Redis
+    - El hilo vuelca hasta `batch_size` claves por pipeline, esperando `flush_interval` para
+      juntar lote cuando hay pocas
+    - Un lote fallido vuelve a la cola y se reintenta con espera exponencial (con jitter). Las
+      escrituras prescindibles se descartan tras `max_retries` intentos; las demás (registros)
+      se reintentan sin límite, siempre dentro de `max_bytes`, y si al cerrar siguen sin
+      escribirse se registra un error con sus claves
+    - Memoria acotada a `max_bytes` de payloads: con la cola llena, las escrituras prescindibles
+      (caché por hash de imagen) se descartan al momento y las demás esperan como mucho
+      `block_timeout` segundos a que haya sitio. `put` retorna False si la escritura no se encoló
+    """
+
+    def __init__(self, write_many, max_bytes=16 * 1024 * 1024, batch_size=100, flush_interval=0.05,
+                 max_retries=5, backoff_base=0.1, backoff_max=5.0, block_timeout=1.0):
+        self.write_many = write_many
+        self.max_bytes = max_bytes
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.block_timeout = block_timeout
+
+        self.pending_bytes = 0
+        self.counters = defaultdict(int)
+        self.dropped = defaultdict(int)
+        self.flush_latency = LatencyRegistry()
+
+        self._pending = OrderedDict()
+        self._inflight = {}
+        self._failures = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._space = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, write_many):
+        """Configuración desde FACE_WRITE_BEHIND_*"""
+        return cls(
+            write_many,
+            max_bytes=int(float(os.getenv('FACE_WRITE_BEHIND_MAX_MB', '16')) * 1024 * 1024),
+            batch_size=int(os.getenv('FACE_WRITE_BEHIND_BATCH', '100')),
+            flush_interval=float(os.getenv('FACE_WRITE_BEHIND_INTERVAL_MS', '50')) / 1000,
+            max_retries=int(os.getenv('FACE_WRITE_BEHIND_RETRIES', '5')),
+            block_timeout=float(os.getenv('FACE_WRITE_BEHIND_BLOCK_MS', '1000')) / 1000
+        )
+
+    def start(self):
+        """Inicia el hilo de volcado (daemon)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='WriteBehind', daemon=True)
+            self._thread.start()
+        return self
+
+    def put(self, key, payload, ttl=None, droppable=False):
+        """Encola `SET key payload EX ttl`; retorna False si se descartó por cola llena o cerrada"""
+        size = len(payload)
+
+        def fits():
+            return self.pending_bytes - self._size(key) + size <= self.max_bytes
+
+        with self._lock:
+            if self._closed:
+                self.dropped['closed'] += 1
+                return False
+            if not fits() and (droppable or not self._space.wait_for(
+                    lambda: self._closed or fits(), self.block_timeout) or self._closed):
+                self.dropped['full'] += 1
+                return False
+
+            previous = self._pending.get(key)
+            freed = len(previous.payload) if previous else 0
+            self.pending_bytes += size - freed
+            if previous is not None:
+                # fusionada: conserva su turno en la cola, con el valor más reciente
+                previous.payload, previous.ttl = payload, ttl
+                previous.droppable = previous.droppable and droppable
+                previous.attempts = 0
+                self.counters['coalesced'] += 1
+            else:
+                self._pending[key] = _Pending(payload, ttl, droppable, time.monotonic())
+            self.counters['enqueued'] += 1
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._ready.notify()
+        return True
+
+    def pending(self, key):
+        """Payload aún no escrito en Redis para `key` (en cola o en vuelo), o None"""
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                return entry.payload
+            entry = self._inflight.get(key)
+            return entry.payload if entry is not None else None
+
+    def discard(self, key):
+        """Cancela la escritura pendiente de `key` (p. ej. antes de borrarla); True si había una.
+
+        Si la clave está en un lote en vuelo espera (como mucho `block_timeout`) a que termine,
+        para que esa escritura no llegue a Redis después del borrado.
+        """
+        with self._lock:
+            found = self._pop(key) or key in self._inflight
+            if key in self._inflight:
+                self._idle.wait_for(lambda: key not in self._inflight, self.block_timeout)
+                # un lote fallido devuelve la clave a la cola
+                self._pop(key)
+            self._space.notify_all()
+            return found
+
+    def flush(self, timeout=5.0):
+        """Espera a que la cola quede vacía (o a `timeout`); True si se vació"""
+        with self._lock:
+            self._ready.notify()
+            return self._idle.wait_for(lambda: not self._pending and not self._inflight, timeout)
+
+    def close(self, timeout=5.0):
+        """Vuelca lo pendiente y deja de aceptar escrituras (para atexit)"""
+        flushed = self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            self._ready.notify_all()
+            self._space.notify_all()
+            lost = list(self._pending) + list(self._inflight)
+        if lost:
+            logger.error("Write-behind closed with %d unwritten keys: %s", len(lost), ', '.join(lost))
+        return flushed
+
+    def _pop(self, key):
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return False
+        self.pending_bytes -= len(entry.payload)
+        return True
+
+    def _size(self, key):
+        entry = self._pending.get(key)
+        return len(entry.payload) if entry else 0
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                self._ready.wait_for(lambda: self._pending or self._closed)
+                if self._closed and not self._pending:
+                    return
+                oldest = next(iter(self._pending.values()))
+                # lote pequeño: se espera a que se junten más, sin retrasar la más antigua
+                delay = self.flush_interval - (time.monotonic() - oldest.enqueued_at)
+                if len(self._pending) < self.batch_size and delay > 0 and not self._closed:
+                    self._ready.wait(delay)
+                batch = []
+                while self._pending and len(batch) < self.batch_size:
+                    key, entry = self._pending.popitem(last=False)
+                    self.pending_bytes -= len(entry.payload)
+                    self._inflight[key] = entry
+                    batch.append((key, entry))
+                self._space.notify_all()
+
+            tic = time.perf_counter()
+            try:
+                self.write_many([(key, entry.payload, entry.ttl) for key, entry in batch])
+                error = None
+            except Exception as e:  # pylint: disable=broad-except
+                error = e
+            self.flush_latency.record('ok' if error is None else 'error', time.perf_counter() - tic)
+
+            with self._lock:
+                for key, _ in batch:
+                    self._inflight.pop(key, None)
+                if error is None:
+                    self._failures = 0
+                    self.counters['batches'] += 1
+                    self.counters['flushed'] += len(batch)
+                else:
+                    self._failures += 1
+                    self.counters['failed_batches'] += 1
+                    dropped = self._requeue(batch)
+                # flush() espera la cola vacía; discard(), que termine el lote de su clave
+                self._idle.notify_all()
+
+            if error is not None:
+                logger.warning("Write-behind flush error (%d keys, attempt %d): %s",
+                               len(batch), self._failures, error)
+                for key in dropped:
+                    logger.error("Write-behind dropped %s after %d attempts", key, self.max_retries + 1)
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** (self._failures - 1))
+                time.sleep(backoff * random.uniform(0.5, 1.0))
+
+    def _requeue(self, batch):
+        """Devuelve un lote fallido al frente de la cola (llamar con el lock tomado).
+
+        Retorna las claves prescindibles descartadas por agotar sus reintentos.
+        """
+        dropped = []
+        for key, entry in reversed(batch):
+            if key in self._pending:
+                # se escribió de nuevo mientras estaba en vuelo: el valor nuevo ya está en cola
+                continue
+            entry.attempts += 1
+            if entry.droppable and entry.attempts > self.max_retries:
+                self.dropped['retries'] += 1
+                dropped.append(key)
+                continue
+            self._pending[key] = entry
+            self._pending.move_to_end(key, last=False)
+            self.pending_bytes += len(entry.payload)
+            self.counters['retries'] += 1
+        return dropped
+
+    def get_stats(self):
+        with self._lock:
+            oldest = next(iter(self._pending.values()), None)
+            stats = {
+                'pending': len(self._pending),
+                'pending_bytes': self.pending_bytes,
+                'max_bytes': self.max_bytes,
+                'inflight': len(self._inflight),
+                'oldest_pending_ms': round((time.monotonic() - oldest.enqueued_at) * 1000, 1) if oldest else 0.0,
+                'consecutive_failures': self._failures,
+                **{name: self.counters[name] for name in
+                   ('enqueued', 'coalesced', 'flushed', 'batches', 'failed_batches', 'retries')},
+                'dropped': dict(self.dropped),
+            }
+        stats['flush_latency'] = self.flush_latency.get_stats()
+        return stats
+
+    def to_prometheus(self):
+        """Profundidad de la cola, escrituras y descartes en formato de exposición de Prometheus"""
+        stats = self.get_stats()
+        lines = [
+            '# HELP facial_write_behind_pending Redis writes waiting in the write-behind queue',
+            '# TYPE facial_write_behind_pending gauge',
+            f"facial_write_behind_pending {stats['pending'] + stats['inflight']}",
+            '# HELP facial_write_behind_pending_bytes Payload bytes waiting in the write-behind queue',
+            '# TYPE facial_write_behind_pending_bytes gauge',
+            f"facial_write_behind_pending_bytes {stats['pending_bytes']}",
+            '# HELP facial_write_behind_writes_total Redis writes by outcome',
+            '# TYPE facial_write_behind_writes_total counter',
+        ]
+        for outcome in ('enqueued', 'coalesced', 'flushed', 'retries'):
+            lines.append(f'facial_write_behind_writes_total{{outcome="{outcome}"}} {stats[outcome]}')
+        lines += [
+            '# HELP facial_write_behind_dropped_total Redis writes dropped',
+            '# TYPE facial_write_behind_dropped_total counter',
+        ]
+        for reason, count in sorted(stats['dropped'].items()):
+            lines.append(f'facial_write_behind_dropped_total{{reason="{reason}"}} {count}')
+        return '\n'.join(lines) + '\n' + to_prometheus(
+            self.flush_latency, 'facial_write_behind_flush_seconds', 'result',
+            'Latency of each pipelined flush to Redis'
+        )